@@ -7,6 +7,8 @@
 
 import arcade
 from gui.constants import WHITE
+from gui.utils.shapes import add_panel
+from gui.utils.text_layout import get_text
 
 class Button:
     """按钮类，用于创建交互式按钮"""
@@ -25,34 +27,38 @@ class Button:
         self.is_hovered = False
         self.pressed = False
         self.font_size = 16
+        self._shapes = {}  # (颜色, 位置, 大小) -> 预先生成的背景和边框
         
-    def draw(self):
-        """绘制按钮"""
-        # 绘制按钮背景
+    def current_color(self):
+        """按钮当前状态下的背景颜色"""
         color = self.hover_color if self.is_hovered else self.bg_color
         
-        # 如果按钮被按下，绘制稍暗的颜色
+        # 如果按钮被按下，使用稍暗的颜色
         if self.pressed:
             color = (max(0, color[0] - 30), max(0, color[1] - 30), max(0, color[2] - 30))
-        
-        arcade.draw_rectangle_filled(
-            self.center_x, self.center_y, self.width, self.height, color
-        )
-        
-        # 绘制按钮边框
-        arcade.draw_rectangle_outline(
-            self.center_x, self.center_y, self.width, self.height, WHITE, 2
-        )
+        return color
+    
+    def draw(self):
+        """绘制按钮"""
+        # 每种状态的背景和边框只生成一次
+        key = (self.current_color(), self.center_x, self.center_y, self.width, self.height)
+        shapes = self._shapes.get(key)
+        if shapes is None:
+            shapes = add_panel(
+                arcade.ShapeElementList(), self.center_x, self.center_y, self.width, self.height,
+                fill=key[0], outline=WHITE, border_width=2
+            )
+            self._shapes[key] = shapes
+        shapes.draw()
         
         # 绘制按钮文本
-        arcade.draw_text(
+        get_text(
             self.text,
             self.center_x, self.center_y,
             self.text_color,
             font_size=self.font_size,
-            font_name=("SimHei", "Microsoft YaHei"),
             anchor_x="center", anchor_y="center"
-        )
+        ).draw()
     
     def check_mouse_hover(self, x, y):
         """检查鼠标是否悬停在按钮上"""
@@ -76,4 +82,4 @@ class Button:
     
     def release_button(self, delta_time):
         """释放按钮按下状态"""
-        self.pressed = False 
\ No newline at end of file
+        self.pressed = False
@@ -2,5 +2,6 @@
 工具函数包
 """
 # 这里将来会导出动画相关功能
+from gui.utils.text_layout import build_text, draw_text, get_text, layout_text, make_text, wrap_text
 
-__all__ = [] 
\ No newline at end of file
+__all__ = ['build_text', 'draw_text', 'get_text', 'layout_text', 'make_text', 'wrap_text'] 
\ No newline at end of file
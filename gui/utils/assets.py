@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+资源管理模块
+贴图和音效在整个进程中只加载一次，按引用计数管理：
+界面通过AssetScope获取资源，界面隐藏时释放引用并用trim()回收不再有引用的资源
+（切换界面时新界面已经取得了自己的引用，共用的资源不会被回收）。
+resources/assets.json清单为资源命名（可列出多个备选路径），
+欢迎界面显示时在后台线程预加载清单中的资源，之后切换界面只读取内存中的缓存。
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import arcade
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MANIFEST_PATH = os.path.join(PROJECT_DIR, "resources", "assets.json")
+
+TEXTURE = "texture"
+SOUND = "sound"
+
+def _resolve(path):
+    """清单中的相对路径相对于项目目录，arcade内置资源保持原样"""
+    if path.startswith(":") or os.path.isabs(path):
+        return path
+    return os.path.join(PROJECT_DIR, path)
+
+def _load(kind, paths):
+    """依次尝试备选路径，全部失败时返回None"""
+    for path in paths:
+        try:
+            if kind == TEXTURE:
+                return arcade.load_texture(_resolve(path))
+            return arcade.load_sound(_resolve(path))
+        except Exception:
+            continue
+    return None
+
+class _Entry:
+    """一项资源的缓存状态"""
+
+    def __init__(self, kind, paths):
+        self.kind = kind
+        self.paths = paths
+        self.asset = None
+        self.loaded = False
+        self.future = None  # 后台加载任务
+        self.refs = 0
+        self.source = None  # 在后台线程中生成文件并返回其路径的函数，用于生成的资源
+
+class AssetManager:
+    """进程共享的贴图和音效缓存"""
+
+    def __init__(self, manifest=None):
+        manifest = manifest or {}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        for name, paths in manifest.get("textures", {}).items():
+            self._entries[name] = _Entry(TEXTURE, list(paths))
+        for name, paths in manifest.get("sounds", {}).items():
+            self._entries[name] = _Entry(SOUND, list(paths))
+        self.preload_names = list(manifest.get("preload", []))
+        self.hits = 0  # 命中缓存的次数
+        self.loads = 0  # 实际读取磁盘的次数
+
+    @classmethod
+    def from_manifest(cls, path=MANIFEST_PATH):
+        """从清单文件创建，清单不存在时为空"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                return cls(json.load(f))
+        except (OSError, ValueError):
+            return cls()
+
+    def _entry(self, name, kind):
+        """清单中没有的名称当作文件路径处理"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = _Entry(kind, [name])
+                self._entries[name] = entry
+            return entry
+
+    def _load_entry(self, entry):
+        if entry.source is not None:
+            try:
+                entry.paths = [entry.source()]
+            except Exception:
+                entry.paths = []
+        asset = _load(entry.kind, entry.paths)
+        with self._lock:
+            entry.asset = asset
+            entry.loaded = True
+            self.loads += 1
+        return asset
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="asset-preload")
+        return self._executor
+
+    def preload(self, names=None):
+        """在后台线程预加载资源，默认为清单中的preload列表，重复调用不会重复加载"""
+        names = self.preload_names if names is None else names
+        with self._lock:
+            self._ensure_executor()
+            pending = []
+            for name in names:
+                entry = self._entries.get(name)
+                if entry is not None and not entry.loaded and entry.future is None:
+                    entry.future = self._executor.submit(self._load_entry, entry)
+                    pending.append(entry.future)
+        return pending
+
+    def get(self, name, kind=TEXTURE):
+        """获取资源但不增加引用；正在后台加载时等待其完成，从未加载过时立即同步加载"""
+        entry = self._entry(name, kind)
+        if entry.loaded:
+            self.hits += 1
+            return entry.asset
+        if entry.future is not None:
+            return entry.future.result()
+        return self._load_entry(entry)
+
+    def request(self, name, source, kind=TEXTURE):
+        """不阻塞地获取生成的资源
+
+        第一次请求时在后台线程调用source()生成文件并加载，完成前返回None，界面可以先显示占位内容
+
+        Args:
+            name: 资源名，应当包含决定资源内容的全部参数
+            source: 生成文件并返回路径的函数
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = _Entry(kind, [])
+                entry.source = source
+                self._entries[name] = entry
+            if entry.loaded:
+                self.hits += 1
+                return entry.asset
+            if entry.future is None:
+                entry.future = self._ensure_executor().submit(self._load_entry, entry)
+        return None
+
+    def is_ready(self, name):
+        """资源是否已在内存中"""
+        entry = self._entries.get(name)
+        return entry is not None and entry.loaded
+
+    def acquire(self, name, kind=TEXTURE):
+        """获取资源并增加引用计数，加载失败时返回None"""
+        asset = self.get(name, kind)
+        with self._lock:
+            self._entries[name].refs += 1
+        return asset
+
+    def release(self, name):
+        """减少引用计数"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+
+    def refs(self, name):
+        """当前引用计数"""
+        entry = self._entries.get(name)
+        return entry.refs if entry is not None else 0
+
+    def trim(self, keep_preloaded=True):
+        """回收没有引用的资源，默认保留清单中预加载的资源，返回回收的数量"""
+        keep = set(self.preload_names) if keep_preloaded else set()
+        released = 0
+        with self._lock:
+            for name, entry in self._entries.items():
+                if entry.loaded and entry.refs == 0 and name not in keep:
+                    entry.asset = None
+                    entry.loaded = False
+                    entry.future = None
+                    released += 1
+        return released
+
+    def shutdown(self):
+        """停止后台加载线程"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+class AssetScope:
+    """界面持有的资源引用，界面隐藏时调用release()统一释放"""
+
+    def __init__(self, manager=None):
+        self.manager = manager or asset_manager()
+        self._names = []
+
+    def texture(self, name):
+        """获取贴图，没有时返回None"""
+        self._names.append(name)
+        return self.manager.acquire(name, TEXTURE)
+
+    def sound(self, name):
+        """获取音效，没有时返回None"""
+        self._names.append(name)
+        return self.manager.acquire(name, SOUND)
+
+    def release(self):
+        """释放本界面获取的所有资源，并回收已没有界面引用的资源"""
+        for name in self._names:
+            self.manager.release(name)
+        self._names = []
+        self.manager.trim()
+
+_manager = None  # 全局资源管理器
+
+def asset_manager():
+    """获取全局资源管理器"""
+    global _manager
+    if _manager is None:
+        _manager = AssetManager.from_manifest()
+    return _manager
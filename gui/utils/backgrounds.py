@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+生成背景模块
+没有背景图片时按当前窗口尺寸生成背景：生成和读取都在资源管理器的后台线程中进行，
+完成前先显示底色（窗口尺寸变化时先拉伸显示上一张），因此首次启动或调整窗口大小时界面不会卡顿。
+生成的图片按尺寸和参数缓存在磁盘上，见resources/default_background.py。
+"""
+
+from functools import partial
+
+import arcade
+
+from gui.utils.assets import asset_manager
+
+PLACEHOLDER_COLOR = (20, 20, 50)  # 背景生成完成前显示的底色，与默认背景底色相同
+
+def _generate(width, height, params):
+    # 在后台线程中导入，PIL只在需要生成背景时加载
+    from resources.default_background import ensure_background
+    return ensure_background(width, height, params)
+
+class GeneratedBackground:
+    """按窗口尺寸生成并显示的背景"""
+
+    def __init__(self, manager=None, **params):
+        from resources.default_background import background_key, background_params
+        self.manager = manager or asset_manager()
+        self.params = background_params(**params)
+        self._key = partial(background_key, params=self.params)
+        self.texture = None  # 最近一张可显示的背景
+        self.size = None  # self.texture对应的尺寸
+        self.pending = None  # 正在生成的尺寸
+
+    def request(self, width, height):
+        """请求指定尺寸的背景，没有生成好时返回None"""
+        name = f"generated-background:{self._key(width, height)}"
+        return self.manager.request(name, partial(_generate, width, height, self.params))
+
+    def update(self, width, height):
+        """切换到指定尺寸的背景
+
+        同一时间只生成一张，连续调整窗口大小时不会为中间经过的每个尺寸都生成背景
+        """
+        if self.pending is not None:
+            texture = self.request(*self.pending)
+            if texture is None:
+                return
+            self.texture, self.size, self.pending = texture, self.pending, None
+            if self.size == (width, height):
+                return
+        texture = self.request(width, height)
+        if texture is None:
+            self.pending = (width, height)
+        else:
+            self.texture, self.size = texture, (width, height)
+
+    def draw(self, width, height):
+        """铺满指定区域绘制背景，生成完成前显示底色或上一张背景"""
+        if self.size != (width, height):
+            self.update(width, height)
+        if self.texture is None:
+            arcade.draw_lrtb_rectangle_filled(0, width, height, 0, PLACEHOLDER_COLOR)
+        else:
+            arcade.draw_lrwh_rectangle_textured(0, 0, width, height, self.texture)
+
+_default = None  # 各界面共用的默认背景
+
+def default_background():
+    """获取各界面共用的生成背景"""
+    global _default
+    if _default is None:
+        _default = GeneratedBackground()
+    return _default
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+战场精灵模块
+每支军队的士兵图标放在一个SpriteList中，精灵坐标是相对军队中心的阵型偏移，只在建立
+阵型或减员时修改。军队移动时不逐个修改精灵，而是在绘制该军队前平移投影矩阵，
+因此每帧的更新开销只与军队数量有关，与士兵精灵数量无关。
+"""
+
+import math
+
+import arcade
+
+from models.army import TroopType
+from modules.battle import BattlePhase
+
+SOLDIERS_PER_SPRITE = 100  # 一个士兵图标代表的兵力
+MAX_SPRITES = 10000  # 整个战场的图标上限，兵力更多时每个图标代表更多士兵
+MOVE_SPEED = 2.5  # 军队向目标位置移动的速度（每秒完成剩余距离的比例）
+
+# 各方颜色和兵种颜色，图标颜色取两者的混合
+SIDE_COLORS = {True: (200, 50, 50), False: (50, 80, 200)}
+TROOP_COLORS = {
+    TroopType.INFANTRY: (220, 220, 220),
+    TroopType.CAVALRY: (240, 200, 80),
+    TroopType.ARCHER: (120, 220, 120),
+    TroopType.SPEARMAN: (200, 160, 220),
+    TroopType.CROSSBOWMAN: (80, 200, 160),
+    TroopType.SHIELDED: (160, 160, 160),
+    TroopType.NAVY: (80, 180, 240),
+    TroopType.SIEGE: (160, 110, 70),
+}
+RANGED_TYPES = (TroopType.ARCHER, TroopType.CROSSBOWMAN)
+
+_textures = {}  # (兵种, 是否进攻方, 直径) -> 图标贴图
+
+def soldier_texture(troop_type, is_attacker, diameter):
+    """士兵图标贴图，同一兵种和阵营共用一张"""
+    key = (troop_type, is_attacker, diameter)
+    texture = _textures.get(key)
+    if texture is None:
+        side, troop = SIDE_COLORS[is_attacker], TROOP_COLORS.get(troop_type, (200, 200, 200))
+        color = tuple((a * 2 + b) // 3 for a, b in zip(side, troop)) + (255,)
+        texture = arcade.make_circle_texture(diameter, color, name=f"soldier-{troop_type.name}-{is_attacker}-{diameter}")
+        _textures[key] = texture
+    return texture
+
+class ArmyFormation:
+    """一支军队在战场上的阵型"""
+
+    def __init__(self, army, is_attacker, home_x, home_y, width, height, soldiers_per_sprite):
+        self.army = army
+        self.is_attacker = is_attacker
+        self.home_x = home_x  # 部署位置
+        self.home_y = home_y
+        self.x = home_x  # 当前位置
+        self.y = home_y
+        self.target_x = home_x  # 目标位置
+        self.width = width  # 阵型占用的区域
+        self.height = height
+        self.soldiers_per_sprite = soldiers_per_sprite
+        self.sprites = None  # 以军队中心为原点的士兵图标
+        self.build()
+
+    def sprite_count(self):
+        """当前兵力对应的图标数"""
+        return math.ceil(self.army.size / self.soldiers_per_sprite) if self.army.size > 0 else 0
+
+    def build(self):
+        """按兵力排列图标：前排在先，减员时从后排移除"""
+        count = self.sprite_count()
+        self.sprites = arcade.SpriteList(use_spatial_hash=False, capacity=max(1, count))
+        if not count:
+            return
+        # 按区域的宽高比计算行列数和间距
+        columns = max(1, round(math.sqrt(count * self.width / self.height)))
+        rows = math.ceil(count / columns)
+        spacing = min(self.width / columns, self.height / rows)
+        diameter = max(2, int(spacing * 0.8))
+        texture = soldier_texture(self.army.primary_type, self.is_attacker, diameter)
+        facing = 1 if self.is_attacker else -1
+        for i in range(count):
+            column, row = divmod(i, rows)
+            sprite = arcade.Sprite(texture=texture)
+            # 第0列是面向敌军的前排
+            sprite.center_x = facing * ((columns - 1) / 2 - column) * spacing
+            sprite.center_y = ((rows - 1) / 2 - row) * spacing
+            self.sprites.append(sprite)
+
+    def sync_size(self):
+        """兵力减少后移除多余的图标"""
+        surplus = len(self.sprites) - self.sprite_count()
+        for _ in range(max(0, surplus)):
+            self.sprites.pop()
+        return surplus
+
+    def update(self, delta_time):
+        """向目标位置移动，只改变军队位置"""
+        step = min(1.0, delta_time * MOVE_SPEED)
+        self.x += (self.target_x - self.x) * step
+
+class Battlefield:
+    """战场上双方所有军队的阵型"""
+
+    def __init__(self, attacker_armies, defender_armies, center_x, center_y, width=800, height=400):
+        self.center_x = center_x
+        self.center_y = center_y
+        self.width = width
+        self.height = height
+        total = sum(army.size for army in attacker_armies + defender_armies)
+        self.soldiers_per_sprite = max(SOLDIERS_PER_SPRITE, math.ceil(total / MAX_SPRITES))
+        self.attackers = self.deploy(attacker_armies, True)
+        self.defenders = self.deploy(defender_armies, False)
+
+    @property
+    def formations(self):
+        return self.attackers + self.defenders
+
+    def deploy(self, armies, is_attacker):
+        """把一方的军队排成网格，进攻方在左、防守方在右"""
+        if not armies:
+            return []
+        side_width = self.width / 2 - 40
+        columns = math.ceil(math.sqrt(len(armies) * side_width / self.height))
+        rows = math.ceil(len(armies) / columns)
+        slot_width = side_width / columns
+        slot_height = self.height / rows
+        direction = -1 if is_attacker else 1
+        formations = []
+        for i, army in enumerate(armies):
+            column, row = divmod(i, rows)
+            # 第0列最靠近战场中线
+            x = self.center_x + direction * (40 + slot_width * (column + 0.5))
+            y = self.center_y + self.height / 2 - slot_height * (row + 0.5)
+            formations.append(ArmyFormation(army, is_attacker, x, y, slot_width * 0.85, slot_height * 0.85,
+                                            self.soldiers_per_sprite))
+        return formations
+
+    def sprite_count(self):
+        """战场上的图标总数"""
+        return sum(len(formation.sprites) for formation in self.formations)
+
+    def set_phase(self, phase, attacker_winning=True):
+        """根据战斗阶段设定各军队的目标位置"""
+        for formation in self.formations:
+            forward = 1 if formation.is_attacker else -1
+            winning = formation.is_attacker == attacker_winning
+            if phase == BattlePhase.RANGED:
+                # 远程部队原地放箭，其余部队前压
+                advance = 0 if formation.army.primary_type in RANGED_TYPES else 40
+            elif phase == BattlePhase.MELEE:
+                advance = 0 if formation.army.primary_type in RANGED_TYPES else 120
+            elif phase == BattlePhase.PURSUIT:
+                advance = 200 if winning else 0
+            elif phase == BattlePhase.RETREAT:
+                advance = 160 if winning else -self.width / 2
+            else:
+                advance = 0
+            formation.target_x = formation.home_x + forward * advance
+
+    def sync_sizes(self):
+        """战斗阶段结算后按兵力移除图标"""
+        return sum(formation.sync_size() for formation in self.formations)
+
+    def update(self, delta_time):
+        """每帧更新：只移动军队，不遍历士兵"""
+        for formation in self.formations:
+            formation.update(delta_time)
+
+    def draw(self, window):
+        """按军队位置平移投影后绘制各军队的图标"""
+        ctx = window.ctx
+        projection = ctx.projection_2d
+        left, right, bottom, top = projection
+        for formation in self.formations:
+            if formation.sprites:
+                ctx.projection_2d = (left - formation.x, right - formation.x,
+                                     bottom - formation.y, top - formation.y)
+                formation.sprites.draw()
+        ctx.projection_2d = projection
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+帧耗时分析模块
+记录每帧各视图on_draw/on_update的耗时、绘制调用次数和文字对象数量，
+按F3显示或隐藏叠加面板，并定期把最近的若干帧写入CSV或JSON轨迹文件，
+便于对比修改前后的表现。
+
+启用方式：设置环境变量SANGUO_PROFILE=1，或在游戏中按F3。
+对比两份轨迹：python -m gui.utils.profiler before.csv after.csv
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+
+import arcade
+
+from gui.utils.text_layout import draw_text
+
+TRACE_FIELDS = ("time", "view", "draw_ms", "update_ms", "draw_calls", "text_draws", "texts_created")
+DEFAULT_TRACE_PATH = os.path.join("profiles", "frame_trace.csv")
+HISTORY_FRAMES = 3600  # 轨迹中保留的最近帧数，约一分钟
+FLUSH_INTERVAL = 5.0  # 写入轨迹文件的间隔（秒）
+TOGGLE_KEY = arcade.key.F3
+
+# 计为一次绘制调用的arcade函数和方法
+DRAW_FUNCTIONS = (
+    "draw_text", "draw_rectangle_filled", "draw_rectangle_outline", "draw_lrtb_rectangle_filled",
+    "draw_texture_rectangle", "draw_lrwh_rectangle_textured", "draw_circle_filled", "draw_circle_outline",
+    "draw_line", "draw_lines", "draw_polygon_filled", "draw_polygon_outline", "draw_triangle_filled",
+)
+DRAW_METHODS = (("ShapeElementList", "draw"), ("SpriteList", "draw"), ("Sprite", "draw"))
+
+class FrameProfiler:
+    """收集帧数据并绘制叠加面板"""
+
+    def __init__(self, trace_path=DEFAULT_TRACE_PATH, history=HISTORY_FRAMES, flush_interval=FLUSH_INTERVAL):
+        self.trace_path = trace_path
+        self.frames = deque(maxlen=history)  # 已完成的帧记录
+        self.flush_interval = flush_interval
+        self.enabled = False  # 是否记录
+        self.overlay_visible = False  # 是否显示叠加面板
+        self.counters_installed = False
+        self._counts = {"draw_calls": 0, "text_draws": 0, "texts_created": 0}
+        self._pending_update_ms = 0.0  # 本帧之前累计的on_update耗时
+        self._last_flush = time.perf_counter()
+        self._originals = []  # 被替换的函数，用于卸载计数器
+
+    # ---- 计数 ----
+
+    def _wrap_counter(self, owner, attribute, counter):
+        original = getattr(owner, attribute)
+        profiler = self
+
+        def counted(*args, **kwargs):
+            if profiler.enabled:
+                profiler._counts[counter] += 1
+            return original(*args, **kwargs)
+
+        self._originals.append((owner, attribute, original))
+        setattr(owner, attribute, counted)
+
+    def install_counters(self):
+        """替换arcade的绘制函数以统计调用次数，只在首次启用时安装"""
+        if self.counters_installed:
+            return
+        for name in DRAW_FUNCTIONS:
+            if hasattr(arcade, name):
+                self._wrap_counter(arcade, name, "draw_calls")
+        for class_name, method in DRAW_METHODS:
+            owner = getattr(arcade, class_name, None)
+            if owner is not None and hasattr(owner, method):
+                self._wrap_counter(owner, method, "draw_calls")
+        if hasattr(arcade, "Text"):
+            self._wrap_counter(arcade.Text, "draw", "text_draws")
+            self._wrap_counter(arcade.Text, "__init__", "texts_created")
+        self.counters_installed = True
+
+    def uninstall_counters(self):
+        """恢复被替换的函数"""
+        for owner, attribute, original in reversed(self._originals):
+            setattr(owner, attribute, original)
+        self._originals = []
+        self.counters_installed = False
+
+    # ---- 记录 ----
+
+    def set_enabled(self, enabled):
+        """开始或停止记录"""
+        self.enabled = enabled
+        if enabled:
+            self.install_counters()
+
+    def toggle_overlay(self):
+        """切换叠加面板，显示面板时同时开始记录"""
+        self.overlay_visible = not self.overlay_visible
+        if self.overlay_visible:
+            self.set_enabled(True)
+
+    def record_update(self, elapsed):
+        """累计on_update耗时，计入下一帧"""
+        if self.enabled:
+            self._pending_update_ms += elapsed * 1000
+
+    def record_frame(self, view_name, draw_elapsed):
+        """on_draw结束时记录一帧"""
+        if not self.enabled:
+            return
+        frame = {
+            "time": round(time.time(), 3),
+            "view": view_name,
+            "draw_ms": round(draw_elapsed * 1000, 3),
+            "update_ms": round(self._pending_update_ms, 3),
+        }
+        frame.update(self._counts)
+        self.frames.append(frame)
+        self._pending_update_ms = 0.0
+        for name in self._counts:
+            self._counts[name] = 0
+
+        now = time.perf_counter()
+        if self.trace_path and now - self._last_flush >= self.flush_interval:
+            self._last_flush = now
+            self.write_trace()
+
+    def summary(self, count=60):
+        """最近count帧的统计"""
+        frames = list(self.frames)[-count:]
+        if not frames:
+            return None
+        draw_times = [frame["draw_ms"] for frame in frames]
+        span = frames[-1]["time"] - frames[0]["time"]
+        return {
+            "view": frames[-1]["view"],
+            "frames": len(frames),
+            "fps": (len(frames) - 1) / span if span > 0 else 0.0,
+            "draw_avg_ms": sum(draw_times) / len(draw_times),
+            "draw_max_ms": max(draw_times),
+            "update_avg_ms": sum(frame["update_ms"] for frame in frames) / len(frames),
+            "draw_calls": frames[-1]["draw_calls"],
+            "text_draws": frames[-1]["text_draws"],
+            "texts_created": sum(frame["texts_created"] for frame in frames),
+        }
+
+    def write_trace(self, path=None):
+        """把最近的帧写入轨迹文件，扩展名为.json时写JSON，否则写CSV"""
+        path = path or self.trace_path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        frames = list(self.frames)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            if path.endswith(".json"):
+                json.dump(frames, f, ensure_ascii=False)
+            else:
+                writer = csv.DictWriter(f, fieldnames=TRACE_FIELDS)
+                writer.writeheader()
+                writer.writerows(frames)
+        os.replace(tmp_path, path)
+        return path
+
+    # ---- 叠加面板 ----
+
+    def draw_overlay(self, window_height):
+        """在画面左上角绘制统计信息（面板自身的绘制不计入下一帧）"""
+        stats = self.summary()
+        if not stats:
+            return
+        counts = dict(self._counts)
+        lines = (
+            f"{stats['view']}  {stats['fps']:.0f} FPS",
+            f"draw {stats['draw_avg_ms']:.2f}ms (max {stats['draw_max_ms']:.2f})  update {stats['update_avg_ms']:.2f}ms",
+            f"draw calls {stats['draw_calls']}  text draws {stats['text_draws']}  new texts/60f {stats['texts_created']}",
+        )
+        arcade.draw_lrtb_rectangle_filled(8, 560, window_height - 8, window_height - 88, (0, 0, 0, 170))
+        for i, line in enumerate(lines):
+            draw_text(line, 16, window_height - 32 - i * 24, arcade.color.LIGHT_GREEN, font_size=13,
+                      font_name=("Consolas", "SimHei", "Microsoft YaHei"))
+        self._counts.update(counts)
+
+    # ---- 挂接视图 ----
+
+    def instrument_view(self, view):
+        """替换视图实例的on_draw/on_update为计时版本，每个视图只处理一次"""
+        if getattr(view, "_profiler_instrumented", False):
+            return view
+        profiler = self
+        view_name = type(view).__name__
+
+        original_draw = getattr(view, "on_draw", None)
+        if original_draw is not None:
+            def on_draw(*args, **kwargs):
+                start = time.perf_counter()
+                result = original_draw(*args, **kwargs)
+                profiler.record_frame(view_name, time.perf_counter() - start)
+                if profiler.overlay_visible:
+                    profiler.draw_overlay(view.window.height if view.window else 0)
+                return result
+            view.on_draw = on_draw
+
+        original_update = getattr(view, "on_update", None)
+        if original_update is not None:
+            def on_update(delta_time):
+                start = time.perf_counter()
+                result = original_update(delta_time)
+                profiler.record_update(time.perf_counter() - start)
+                return result
+            view.on_update = on_update
+
+        view._profiler_instrumented = True
+        return view
+
+    def install(self, window):
+        """挂接到窗口：之后show_view显示的视图都会被计时，F3切换叠加面板"""
+        profiler = self
+        original_show_view = window.show_view
+
+        def show_view(new_view):
+            # arcade在show_view时读取视图的事件处理函数，因此要在调用前替换
+            profiler.instrument_view(new_view)
+            return original_show_view(new_view)
+
+        def on_key_press(key, modifiers):
+            if key == TOGGLE_KEY:
+                profiler.toggle_overlay()
+                return True
+            return None
+
+        def on_close():
+            if profiler.enabled and profiler.frames and profiler.trace_path:
+                profiler.write_trace()
+            return None
+
+        window.show_view = show_view
+        window.push_handlers(on_key_press=on_key_press, on_close=on_close)
+        if os.environ.get("SANGUO_PROFILE"):
+            self.set_enabled(True)
+        return self
+
+def install_profiler(window, trace_path=DEFAULT_TRACE_PATH):
+    """为窗口创建并挂接帧分析器"""
+    return FrameProfiler(trace_path).install(window)
+
+def load_trace(path):
+    """读取轨迹文件"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        return [
+            {field: (value if field == "view" else float(value)) for field, value in row.items()}
+            for row in csv.DictReader(f)
+        ]
+
+def _percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+def summarize_trace(frames):
+    """按视图汇总轨迹：帧数、平均/P95绘制耗时、平均绘制调用数"""
+    views = {}
+    for frame in frames:
+        views.setdefault(frame["view"], []).append(frame)
+    return {
+        view: {
+            "frames": len(rows),
+            "draw_avg_ms": sum(row["draw_ms"] for row in rows) / len(rows),
+            "draw_p95_ms": _percentile([row["draw_ms"] for row in rows], 0.95),
+            "update_avg_ms": sum(row["update_ms"] for row in rows) / len(rows),
+            "draw_calls": sum(row["draw_calls"] for row in rows) / len(rows),
+            "text_draws": sum(row["text_draws"] for row in rows) / len(rows),
+        }
+        for view, rows in views.items()
+    }
+
+def compare_traces(before_path, after_path):
+    """打印两份轨迹按视图的对比"""
+    before = summarize_trace(load_trace(before_path))
+    after = summarize_trace(load_trace(after_path))
+    print(f"{'视图':<18}{'绘制均值ms':>16}{'绘制P95ms':>16}{'绘制调用':>14}")
+    for view in sorted(set(before) | set(after)):
+        old, new = before.get(view), after.get(view)
+
+        def cell(key, fmt):
+            values = [fmt.format(stats[key]) if stats else "-" for stats in (old, new)]
+            return " -> ".join(values)
+
+        print(f"{view:<18}{cell('draw_avg_ms', '{:.2f}'):>16}{cell('draw_p95_ms', '{:.2f}'):>16}"
+              f"{cell('draw_calls', '{:.0f}'):>14}")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("用法: python -m gui.utils.profiler 修改前轨迹 修改后轨迹")
+        sys.exit(1)
+    compare_traces(sys.argv[1], sys.argv[2])
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+保留模式绘制工具
+把静态的面板、边框预先放入arcade.ShapeElementList，贴图放入SpriteList，
+界面只在状态变化时重建这些对象，每帧只需一次批量绘制。
+"""
+
+import arcade
+
+def add_panel(shapes, center_x, center_y, width, height, fill=None, outline=None, border_width=2):
+    """向形状列表中添加一个带填充和/或边框的矩形面板"""
+    if fill is not None:
+        shapes.append(arcade.create_rectangle_filled(center_x, center_y, width, height, fill))
+    if outline is not None:
+        shapes.append(arcade.create_rectangle_outline(center_x, center_y, width, height, outline, border_width))
+    return shapes
+
+def texture_sprite(texture, center_x, center_y, width, height):
+    """创建按指定大小显示贴图的精灵"""
+    sprite = arcade.Sprite(texture=texture, center_x=center_x, center_y=center_y)
+    sprite.width = width
+    sprite.height = height
+    return sprite
+
+def texture_sprites(*items):
+    """把 (贴图, 中心x, 中心y, 宽, 高) 列表放入一个SpriteList，贴图为None的项会被跳过"""
+    sprites = arcade.SpriteList()
+    for texture, center_x, center_y, width, height in items:
+        if texture is not None:
+            sprites.append(texture_sprite(texture, center_x, center_y, width, height))
+    return sprites
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+文本排版模块
+按像素宽度为中日韩文本断行：使用字体的实际字宽，遵守标点禁则
+（句号、逗号等不出现在行首，左括号、左引号不出现在行尾，英文单词不从中间断开）。
+排版结果按(文本, 字体, 字号, 宽度)缓存，arcade.Text对象也会缓存复用，
+界面每帧绘制时不再重新排版。
+"""
+
+from collections import OrderedDict
+
+import arcade
+
+DEFAULT_FONT = ("SimHei", "Microsoft YaHei")
+LAYOUT_CACHE_SIZE = 512  # 缓存的排版结果数
+TEXT_CACHE_SIZE = 256  # 缓存的arcade.Text对象数
+
+# 不能出现在行首的字符
+NO_LINE_START = set("。！？，；：、…—）》」』】”’.!?,;:)]}%")
+# 不能出现在行尾的字符
+NO_LINE_END = set("（《「『【“‘([{")
+
+_advances = {}  # (字体, 字号) -> {字符: 字宽}
+_fonts = {}  # (字体, 字号) -> pyglet字体，无法加载时为None
+_layouts = OrderedDict()  # (文本, 字体, 字号, 宽度) -> 行列表
+_texts = OrderedDict()  # 排版参数 -> arcade.Text
+
+def _load_font(font_name, font_size):
+    """加载pyglet字体，用于读取字宽"""
+    key = (font_name, font_size)
+    if key not in _fonts:
+        try:
+            import pyglet
+            _fonts[key] = pyglet.font.load(font_name, font_size)
+        except Exception:
+            # 没有图形环境时退回到估算字宽
+            _fonts[key] = None
+    return _fonts[key]
+
+def char_width(char, font_name=DEFAULT_FONT, font_size=16):
+    """字符的像素宽度，每种字体和字号下每个字符只测量一次"""
+    advances = _advances.setdefault((font_name, font_size), {})
+    width = advances.get(char)
+    if width is None:
+        font = _load_font(font_name, font_size)
+        width = None
+        if font is not None:
+            try:
+                width = sum(glyph.advance for glyph in font.get_glyphs(char))
+            except Exception:
+                width = None
+        if width is None:
+            # 估算：全角字符按字号宽度，半角字符约为一半
+            pixel_size = font_size * 96 / 72
+            width = pixel_size if ord(char) > 0x2E7F else pixel_size * 0.55
+        advances[char] = width
+    return width
+
+def text_width(text, font_name=DEFAULT_FONT, font_size=16):
+    """文本单行显示时的像素宽度"""
+    return sum(char_width(char, font_name, font_size) for char in text)
+
+def _can_break_before(text, position):
+    """能否在text[position]之前换行"""
+    before, after = text[position - 1], text[position]
+    if after in NO_LINE_START or before in NO_LINE_END:
+        return False
+    if before.isspace():
+        return True
+    # 英文单词和数字不从中间断开
+    return not (before.isascii() and after.isascii() and before.isalnum() and after.isalnum())
+
+def _wrap_paragraph(text, max_width, font_name, font_size, lines):
+    widths = [char_width(char, font_name, font_size) for char in text]
+    start = 0
+    line_width = 0
+    opportunity = None  # 当前行最后一个可换行的位置
+    i = 0
+    while i < len(text):
+        if i > start and _can_break_before(text, i):
+            opportunity = i
+        if line_width + widths[i] > max_width and i > start:
+            if opportunity is not None and opportunity > start:
+                cut = opportunity
+            elif text[i] in NO_LINE_START:
+                cut = i + 1  # 行首禁则字符无处可断时悬挂在行尾
+            else:
+                cut = i  # 没有可换行的位置，强制断开
+            lines.append(text[start:cut].rstrip())
+            start = cut
+            while start < len(text) and text[start] == " ":
+                start += 1
+            line_width = 0
+            opportunity = None
+            i = start
+            continue
+        line_width += widths[i]
+        i += 1
+    if start < len(text) or not lines:
+        lines.append(text[start:])
+
+def wrap_text(text, width, font_name=DEFAULT_FONT, font_size=16):
+    """按像素宽度断行，返回行的元组（结果会被缓存）"""
+    key = (text, font_name, font_size, width)
+    lines = _layouts.get(key)
+    if lines is not None:
+        _layouts.move_to_end(key)
+        return lines
+
+    result = []
+    for paragraph in text.split("\n"):
+        if paragraph:
+            _wrap_paragraph(paragraph, width, font_name, font_size, result)
+        else:
+            result.append("")
+    lines = tuple(result)
+
+    _layouts[key] = lines
+    if len(_layouts) > LAYOUT_CACHE_SIZE:
+        _layouts.popitem(last=False)
+    return lines
+
+def layout_text(text, width, font_name=DEFAULT_FONT, font_size=16):
+    """断行后用换行符连接的文本"""
+    return "\n".join(wrap_text(text, width, font_name, font_size))
+
+def _wrap_width(width, font_size):
+    # 已经手动断行，给pyglet多留一个字的宽度，避免它再次断行
+    return int(width + font_size * 96 / 72)
+
+def build_text(text, x, y, color=arcade.color.WHITE, font_size=16, width=None, font_name=DEFAULT_FONT,
+               anchor_x="left", anchor_y="baseline", align="left", bold=False):
+    """创建排好版的arcade.Text对象，不进入缓存，适合由界面自己持有的静态文字"""
+    if width:
+        return arcade.Text(
+            layout_text(text, width, font_name, font_size), x, y, color,
+            font_size=font_size, width=_wrap_width(width, font_size), align=align, font_name=font_name,
+            bold=bold, anchor_x=anchor_x, anchor_y=anchor_y, multiline=True
+        )
+    return arcade.Text(
+        text, x, y, color, font_size=font_size, font_name=font_name,
+        bold=bold, anchor_x=anchor_x, anchor_y=anchor_y
+    )
+
+def get_text(text, x, y, color=arcade.color.WHITE, font_size=16, width=None, font_name=DEFAULT_FONT,
+             anchor_x="left", anchor_y="baseline", align="left", bold=False):
+    """获取排好版的arcade.Text对象
+
+    相同文本和样式的对象会被复用，每次获取时更新到指定位置，因此应当立即绘制而不要长期持有；
+    给出width时按该宽度自动断行
+
+    Returns:
+        arcade.Text: 可直接调用draw()的文本对象
+    """
+    key = (text, tuple(color), font_size, width, font_name, anchor_x, anchor_y, align, bold)
+    label = _texts.get(key)
+    if label is None:
+        label = build_text(text, x, y, color, font_size, width, font_name, anchor_x, anchor_y, align, bold)
+        _texts[key] = label
+        if len(_texts) > TEXT_CACHE_SIZE:
+            _texts.popitem(last=False)
+    else:
+        _texts.move_to_end(key)
+        if label.x != x:
+            label.x = x
+        if label.y != y:
+            label.y = y
+    return label
+
+def draw_text(text, x, y, color=arcade.color.WHITE, font_size=16, width=None, font_name=DEFAULT_FONT,
+              anchor_x="left", anchor_y="baseline", align="left", bold=False):
+    """代替arcade.draw_text，使用缓存的排版结果绘制文本"""
+    get_text(text, x, y, color, font_size, width, font_name, anchor_x, anchor_y, align, bold).draw()
+
+def make_text(x, y, color=arcade.color.WHITE, font_size=16, width=None, font_name=DEFAULT_FONT,
+              anchor_x="left", anchor_y="baseline", align="left"):
+    """创建内容会变化的文本对象（如逐字显示的剧情），不进入缓存"""
+    if width:
+        return arcade.Text("", x, y, color, font_size=font_size, width=_wrap_width(width, font_size),
+                           align=align, font_name=font_name, anchor_x=anchor_x, anchor_y=anchor_y,
+                           multiline=True)
+    return arcade.Text("", x, y, color, font_size=font_size, font_name=font_name,
+                       anchor_x=anchor_x, anchor_y=anchor_y)
+
+def clear_cache():
+    """清空排版和文本对象缓存"""
+    _layouts.clear()
+    _texts.clear()
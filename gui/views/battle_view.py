@@ -11,6 +11,15 @@ import math
 from models.army import TroopType, Terrain, Army
 from gui.constants import WHITE, BLACK, RED, GREEN, BLUE, GOLD, BACKGROUND_COLOR
 from gui.ui.button import Button
+from gui.utils.assets import AssetScope
+from gui.utils.battlefield import Battlefield
+from gui.utils.text_layout import draw_text, wrap_text
+from modules.battle import Battle, BattlePhase
+
+LOG_WIDTH = 320  # 战斗日志的文本宽度
+LOG_FONT_SIZE = 14
+PHASE_SECONDS = 2.0  # 每个战斗阶段的动画时长
+LABELED_ARMIES = 4  # 每方军队不超过该数量时显示兵力和兵种
 
 class BattleView(arcade.View):
     """战斗界面视图"""
@@ -22,14 +31,25 @@ class BattleView(arcade.View):
         self.window_size = window_size
         self.player = player
         self.battle_data = battle_data
-        self.attacker = battle_data.attacker
-        self.defender = battle_data.defender
+        # 每方可以有多支军队，battle_data.attacker/defender也可以是单支军队
+        self.attacker_armies = self.as_list(getattr(battle_data, "attacker_armies", None) or battle_data.attacker)
+        self.defender_armies = self.as_list(getattr(battle_data, "defender_armies", None) or battle_data.defender)
+        self.attacker = self.attacker_armies[0]
+        self.defender = self.defender_armies[0]
         self.attacker_general = battle_data.attacker_general
         self.defender_general = battle_data.defender_general
+        self.initial_sizes = (sum(army.size for army in self.attacker_armies),
+                              sum(army.size for army in self.defender_armies))
         
-        # 战场位置设置
-        self.attacker_positions = []  # 存储攻击方部队位置和引用
-        self.defender_positions = []  # 存储防御方部队位置和引用
+        # 战斗按阶段推进，军队位置由当前阶段决定
+        self.battle = Battle(
+            self.attacker_armies, self.defender_armies,
+            self.attacker_general, self.defender_general,
+            getattr(battle_data, "terrain", Terrain.PLAIN), dramatic_pauses=False
+        )
+        self.battlefield = None
+        self.phase_timer = 0.0
+        self.finished = False
         
         # 战斗状态
         self.battle_phase = "准备"  # 准备, 远程, 近战, 追击, 撤退
@@ -37,10 +57,8 @@ class BattleView(arcade.View):
         self.buttons = []
         
         # 加载背景图
-        try:
-            self.background_texture = arcade.load_texture("resources/battlefield.jpg")
-        except:
-            self.background_texture = None
+        self.assets = AssetScope()
+        self.background_texture = self.assets.texture("battlefield")
         
         # 创建返回按钮
         back_button = Button(
@@ -51,30 +69,62 @@ class BattleView(arcade.View):
         
         # 添加初始战斗日志
         self.battle_log.append("战斗开始！")
-        self.battle_log.append(f"进攻方: {self.attacker.size}兵力")
-        self.battle_log.append(f"防守方: {self.defender.size}兵力")
+        self.battle_log.append(f"进攻方: {self.initial_sizes[0]}兵力")
+        self.battle_log.append(f"防守方: {self.initial_sizes[1]}兵力")
         
         # 设置部队位置
         self.setup_armies()
     
+    @staticmethod
+    def as_list(armies):
+        """单支军队转换为列表"""
+        return list(armies) if isinstance(armies, (list, tuple)) else [armies]
+    
     def setup_armies(self):
-        """设置军队位置"""
-        # 战场中心位置
-        battlefield_center_x = self.window_size[0] / 2
-        battlefield_center_y = self.window_size[1] / 2
-        
-        # 部署进攻方军队
-        attacker_base_x = battlefield_center_x - 200  # 进攻方在左侧
-        self.attacker_positions.append((attacker_base_x, battlefield_center_y, self.attacker))
-        
-        # 部署防守方军队
-        defender_base_x = battlefield_center_x + 200  # 防守方在右侧
-        self.defender_positions.append((defender_base_x, battlefield_center_y, self.defender))
+        """设置军队位置：进攻方在左侧，防守方在右侧"""
+        self.battlefield = Battlefield(
+            self.attacker_armies, self.defender_armies,
+            self.window_size[0] / 2, self.window_size[1] / 2
+        )
+    
+    def attacker_winning(self):
+        """按双方伤亡比例判断进攻方是否占优"""
+        attacker_loss = self.battle.attacker_casualties / max(1, self.initial_sizes[0])
+        defender_loss = self.battle.defender_casualties / max(1, self.initial_sizes[1])
+        return defender_loss >= attacker_loss
+    
+    def advance_phase(self):
+        """结算一个战斗阶段，并让军队移动到下一阶段的位置"""
+        log_start = len(self.battle.battle_log)
+        ended = self.battle.conduct_battle_phase()
+        self.battle_log.extend(line for line in self.battle.battle_log[log_start:] if line)
+        self.battlefield.sync_sizes()
+        
+        phase = self.battle.current_phase
+        if ended or phase == BattlePhase.RETREAT:
+            phase = BattlePhase.RETREAT
+            self.finished = True
+            self.battle_log.append("进攻方获胜！" if self.attacker_winning() else "防守方获胜！")
+        self.battle_phase = phase
+        self.battlefield.set_phase(phase, self.attacker_winning())
+    
+    def on_update(self, delta_time):
+        """推进战斗阶段和军队移动"""
+        if not self.finished:
+            self.phase_timer += delta_time
+            if self.phase_timer >= PHASE_SECONDS:
+                self.phase_timer = 0.0
+                self.advance_phase()
+        self.battlefield.update(delta_time)
     
     def on_show(self):
         """显示视图时调用"""
         arcade.set_background_color(BACKGROUND_COLOR)
     
+    def on_hide_view(self):
+        """视图隐藏时释放资源引用"""
+        self.assets.release()
+    
     def on_draw(self):
         """绘制界面"""
         arcade.start_render()
@@ -140,67 +190,25 @@ class BattleView(arcade.View):
         )
     
     def draw_armies(self):
-        """绘制军队"""
-        # 绘制进攻方
-        for x, y, army in self.attacker_positions:
-            # 绘制军队圆形
-            arcade.draw_circle_filled(x, y, 50, (200, 50, 50, 180))
-            arcade.draw_circle_outline(x, y, 50, WHITE, 2)
-            
-            # 绘制兵力数量
-            arcade.draw_text(
-                f"{army.size}",
-                x, y,
-                WHITE, font_size=18, font_name=("SimHei", "Microsoft YaHei"),
-                anchor_x="center", anchor_y="center"
-            )
-            
-            # 绘制兵种
-            arcade.draw_text(
-                f"{army.primary_type.value}",
-                x, y - 25,
-                WHITE, font_size=14, font_name=("SimHei", "Microsoft YaHei"),
-                anchor_x="center"
-            )
+        """绘制军队：每支军队的士兵图标一次批量绘制"""
+        self.battlefield.draw(self.window)
         
-        # 绘制防守方
-        for x, y, army in self.defender_positions:
-            # 绘制军队圆形
-            arcade.draw_circle_filled(x, y, 50, (50, 50, 200, 180))
-            arcade.draw_circle_outline(x, y, 50, WHITE, 2)
-            
-            # 绘制兵力数量
-            arcade.draw_text(
-                f"{army.size}",
-                x, y,
-                WHITE, font_size=18, font_name=("SimHei", "Microsoft YaHei"),
-                anchor_x="center", anchor_y="center"
-            )
-            
-            # 绘制兵种
-            arcade.draw_text(
-                f"{army.primary_type.value}",
-                x, y - 25,
-                WHITE, font_size=14, font_name=("SimHei", "Microsoft YaHei"),
-                anchor_x="center"
-            )
+        # 军队较少时标注兵力和兵种
+        for formations in (self.battlefield.attackers, self.battlefield.defenders):
+            if len(formations) > LABELED_ARMIES:
+                continue
+            for formation in formations:
+                label_y = formation.y - formation.height / 2 - 18
+                draw_text(f"{formation.army.primary_type.value} {formation.army.size}",
+                          formation.x, label_y, WHITE, font_size=14, anchor_x="center")
         
         # 绘制将领信息
-        if self.attacker_general:
-            arcade.draw_text(
-                f"将领: {self.attacker_general.name}",
-                self.attacker_positions[0][0], self.attacker_positions[0][1] + 80,
-                GOLD, font_size=18, font_name=("SimHei", "Microsoft YaHei"),
-                anchor_x="center"
-            )
-        
-        if self.defender_general:
-            arcade.draw_text(
-                f"将领: {self.defender_general.name}",
-                self.defender_positions[0][0], self.defender_positions[0][1] + 80,
-                GOLD, font_size=18, font_name=("SimHei", "Microsoft YaHei"),
-                anchor_x="center"
-            )
+        for general, formations in ((self.attacker_general, self.battlefield.attackers),
+                                    (self.defender_general, self.battlefield.defenders)):
+            if general and formations:
+                formation = formations[0]
+                draw_text(f"将领: {general.name}", formation.x, formation.y + formation.height / 2 + 10,
+                          GOLD, font_size=18, anchor_x="center")
     
     def draw_battle_log(self):
         """绘制战斗日志"""
@@ -215,22 +223,17 @@ class BattleView(arcade.View):
         )
         
         # 绘制日志标题
-        arcade.draw_text(
+        draw_text(
             "战斗日志",
             self.window_size[0] - 200, self.window_size[1] // 2 + 180,
-            GOLD, font_size=24, font_name=("SimHei", "Microsoft YaHei"),
-            anchor_x="center"
+            GOLD, font_size=24, anchor_x="center"
         )
         
-        # 绘制日志内容 - 最多显示10条
+        # 绘制日志内容 - 最多显示10条，过长的日志按宽度折行
         log_y = self.window_size[1] // 2 + 150
         for log in self.battle_log[-10:]:
-            arcade.draw_text(
-                log,
-                self.window_size[0] - 350, log_y,
-                WHITE, font_size=14, font_name=("SimHei", "Microsoft YaHei"),
-            )
-            log_y -= 30
+            draw_text(log, self.window_size[0] - 350, log_y, WHITE, font_size=LOG_FONT_SIZE, width=LOG_WIDTH)
+            log_y -= 30 + 20 * (len(wrap_text(log, LOG_WIDTH, font_size=LOG_FONT_SIZE)) - 1)
     
     def on_mouse_motion(self, x, y, dx, dy):
         """处理鼠标移动"""
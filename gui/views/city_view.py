@@ -8,6 +8,7 @@
 import arcade
 from gui.constants import WHITE, BACKGROUND_COLOR
 from gui.ui.button import Button
+from gui.utils.assets import AssetScope
 
 class CityView(arcade.View):
     """
@@ -33,10 +34,8 @@ class CityView(arcade.View):
         self.city_data = city_data
         
         # 背景纹理
-        try:
-            self.background_texture = arcade.load_texture("assets/images/backgrounds/city.jpg")
-        except:
-            self.background_texture = None
+        self.assets = AssetScope()
+        self.background_texture = self.assets.texture("city")
             
         # UI元素
         self.buttons = []
@@ -57,6 +56,10 @@ class CityView(arcade.View):
         """当视图被显示时"""
         arcade.set_background_color(BACKGROUND_COLOR)
         
+    def on_hide_view(self):
+        """视图隐藏时释放资源引用"""
+        self.assets.release()
+        
     def on_draw(self, delta_time=0):
         """绘制城市界面"""
         arcade.start_render()
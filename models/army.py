@@ -3,6 +3,7 @@
 
 from enum import Enum, auto
 import random
+from models.observer import notify_change
 
 class TroopType(Enum):
     """兵种类型枚举"""
@@ -49,10 +50,24 @@ TERRAIN_EFFECTS = {
     TroopType.SIEGE: {Terrain.PLAIN: 0.9, Terrain.MOUNTAIN: 0.7, Terrain.FOREST: 0.7, Terrain.RIVER: 0.5, Terrain.MARSH: 0.6},
 }
 
+_last_army_id = 0  # 已分配的最大军队编号
+
+def _next_army_id():
+    """分配新的军队编号"""
+    global _last_army_id
+    _last_army_id += 1
+    return _last_army_id
+
+def reserve_army_id(army_id):
+    """登记已存在的军队编号（读档后调用），避免新军队编号重复"""
+    global _last_army_id
+    _last_army_id = max(_last_army_id, army_id)
+
 class Army:
     """军队类，代表一支部队"""
     
     def __init__(self, size, morale, training, primary_type, secondary_type=None):
+        self.army_id = _next_army_id()  # 军队编号，用于存档时标识军队
         self.size = size  # 兵力数量
         self.morale = morale  # 士气，影响战斗力
         self.training = training  # 训练度，影响战斗表现
@@ -108,6 +123,7 @@ class Army:
         """承受伤亡"""
         if amount >= self.size:
             self.size = 0
+            notify_change(self, "size")
             return True  # 军队被歼灭
         
         self.size -= amount
@@ -115,6 +131,7 @@ class Army:
         # 士气降低
         morale_drop = (amount / self.size) * 20
         self.morale = max(10, self.morale - morale_drop)
+        notify_change(self, "size", "morale")
         
         return False  # 军队仍存在
     
@@ -157,6 +174,9 @@ class Army:
         
         # 累积经验
         self.experience += other_army.experience
+        
+        notify_change(self, "size", "secondary_type", "secondary_ratio", "morale", "training",
+                      "food", "fatigue", "experience")
     
     def rest(self, days):
         """休整军队，恢复士气和减少疲劳"""
@@ -172,6 +192,8 @@ class Army:
             self.food = 0
         else:
             self.food -= food_consumption
+        
+        notify_change(self, "morale", "fatigue", "food")
     
     def train(self, days, general=None):
         """训练军队，提升训练度"""
@@ -196,6 +218,7 @@ class Army:
         
         # 提升训练度
         self.training = min(100, self.training + base_increase)
+        notify_change(self, "training", "food", "fatigue")
     
     def create_unit(self, unit_size):
         """创建一个相同类型但规模较小的军队单位
@@ -2,6 +2,25 @@
 # -*- coding: utf-8 -*-
 
 import random
+from models.observer import add_listener, notify_change, remove_listener
+
+# 城市加成：各建筑的同名加成累加到城市上
+BONUS_TYPES = ("防御", "商业收入", "征兵效率", "训练速度", "粮食储量")
+
+# 建筑类型：建造费用、维护费用和1级时提供的加成，以更高等级建成时加成按等级倍数计算
+BUILDING_TYPES = {
+    "城墙": {"cost": 500, "maintenance": 50, "benefits": {"防御": 100}},
+    "箭楼": {"cost": 400, "maintenance": 30, "benefits": {"防御": 60}},
+    "粮仓": {"cost": 300, "maintenance": 30, "benefits": {"粮食储量": 5000}},
+    "集市": {"cost": 400, "maintenance": 40, "benefits": {"商业收入": 100}},
+    "钱庄": {"cost": 600, "maintenance": 50, "benefits": {"商业收入": 150}},
+    "兵营": {"cost": 500, "maintenance": 50, "benefits": {"征兵效率": 10, "训练速度": 5}},
+    "校场": {"cost": 450, "maintenance": 40, "benefits": {"训练速度": 10}},
+    "马厩": {"cost": 500, "maintenance": 60, "benefits": {"征兵效率": 5}},
+}
+
+# 新城市自带的建筑
+DEFAULT_BUILDINGS = ("城墙", "粮仓", "集市", "兵营")
 
 class Building:
     """建筑类，代表城市中的各种建筑"""
@@ -13,6 +32,13 @@ class Building:
         self.maintenance = maintenance  # 维护成本
         self.benefits = benefits or {}  # 提供的加成
     
+    @classmethod
+    def from_type(cls, name, level=1):
+        """按BUILDING_TYPES中的定义创建建筑"""
+        spec = BUILDING_TYPES[name]
+        benefits = {benefit: value * level for benefit, value in spec["benefits"].items()}
+        return cls(name, level=level, cost=spec["cost"], maintenance=spec["maintenance"], benefits=benefits)
+    
     def upgrade(self):
         """升级建筑"""
         self.level += 1
@@ -25,6 +51,99 @@ class Building:
             
         return self.level
 
+# 影响驻军合计的军队字段
+GARRISON_FIELDS = frozenset((
+    "size", "morale", "training", "fatigue", "experience", "equipment_level",
+    "primary_type", "secondary_type", "secondary_ratio",
+))
+
+class GarrisonIndex:
+    """城市驻军的索引：成员集合、兵力和战斗力合计、各兵种兵力
+    
+    按军队订阅变更通知，军队伤亡、合并或训练后只重新计算这一支军队的贡献
+    """
+    
+    def __init__(self, armies):
+        self.armies = armies  # 城市的驻军列表，增删都经过索引
+        self.size = 0  # 总兵力
+        self.power = 0.0  # 平原、无将领时的总战斗力
+        self.by_type = {}  # 兵种 -> 兵力
+        self._entries = {}  # id(军队) -> [列表位置, 兵力, 战斗力, ((兵种, 兵力), ...)]
+        for position, army in enumerate(armies):
+            self._track(army, position)
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def __contains__(self, army):
+        entry = self._entries.get(id(army))
+        return entry is not None and self.armies[entry[0]] is army
+    
+    def _contribution(self, army):
+        size = army.size
+        if army.secondary_type:
+            secondary = size * army.secondary_ratio
+            types = ((army.primary_type, size - secondary), (army.secondary_type, secondary))
+        else:
+            types = ((army.primary_type, size),)
+        return size, army.get_battle_power(), types
+    
+    def _apply(self, size, power, types, sign):
+        self.size += sign * size
+        self.power += sign * power
+        by_type = self.by_type
+        for troop_type, amount in types:
+            left = by_type.get(troop_type, 0) + sign * amount
+            if left > 1e-9:
+                by_type[troop_type] = left
+            else:
+                by_type.pop(troop_type, None)
+    
+    def _track(self, army, position):
+        size, power, types = self._contribution(army)
+        self._entries[id(army)] = [position, size, power, types]
+        self._apply(size, power, types, 1)
+        add_listener(self.on_change, army)
+    
+    def add(self, army):
+        """加入驻军，已在驻军中时返回False"""
+        if army in self:
+            return False
+        self.armies.append(army)
+        self._track(army, len(self.armies) - 1)
+        return True
+    
+    def remove(self, army):
+        """移出驻军：与列表末尾的军队交换位置后删除，不在驻军中时返回False"""
+        if army not in self:
+            return False
+        position, size, power, types = self._entries.pop(id(army))
+        last = self.armies.pop()
+        if last is not army:
+            self.armies[position] = last
+            self._entries[id(last)][0] = position
+        self._apply(size, power, types, -1)
+        if not self._entries:
+            self.power = 0.0  # 清除浮点累计误差
+        remove_listener(self.on_change, army)
+        return True
+    
+    def on_change(self, army, fields):
+        """军队变化时（models.observer回调）更新它的贡献"""
+        if fields and GARRISON_FIELDS.isdisjoint(fields):
+            return
+        entry = self._entries.get(id(army))
+        if entry is None:
+            return
+        self._apply(entry[1], entry[2], entry[3], -1)
+        entry[1:] = self._contribution(army)
+        self._apply(entry[1], entry[2], entry[3], 1)
+    
+    def detach(self):
+        """取消全部订阅，索引不再使用时调用"""
+        for army in self.armies:
+            remove_listener(self.on_change, army)
+
 class City:
     """城市类，代表游戏中的一座城池"""
     
@@ -46,10 +165,7 @@ class City:
         
         # 建筑列表
         self.buildings = {
-            "城墙": Building("城墙", level=forts, cost=500, maintenance=50, benefits={"防御": 100 * forts}),
-            "粮仓": Building("粮仓", level=1, cost=300, maintenance=30, benefits={"粮食储量": 5000}),
-            "集市": Building("集市", level=1, cost=400, maintenance=40, benefits={"商业收入": 100}),
-            "兵营": Building("兵营", level=1, cost=500, maintenance=50, benefits={"征兵效率": 10, "训练速度": 5}),
+            name: Building.from_type(name, level=forts if name == "城墙" else 1) for name in DEFAULT_BUILDINGS
         }
         
         # 资源产出
@@ -63,6 +179,30 @@ class City:
     def __str__(self):
         return f"{self.name} - 人口: {self.population}, 繁荣度: {self.prosperity}"
     
+    @property
+    def bonuses(self):
+        """各项建筑加成的合计，建造和升级建筑时增量更新
+        
+        合计不随存档保存，读档或替换buildings后首次访问时重新计算
+        """
+        bonuses = self.__dict__.get("_bonuses")
+        if bonuses is None or self._bonus_source is not self.buildings:
+            bonuses = self._bonuses = dict.fromkeys(BONUS_TYPES, 0)
+            self._bonus_source = self.buildings
+            for building in self.buildings.values():
+                for benefit, value in building.benefits.items():
+                    bonuses[benefit] = bonuses.get(benefit, 0) + value
+        return bonuses
+    
+    def _add_benefits(self, benefits, sign):
+        bonuses = self.bonuses
+        for benefit, value in benefits.items():
+            bonuses[benefit] = bonuses.get(benefit, 0) + sign * value
+    
+    def bonus(self, benefit):
+        """某项建筑加成的合计"""
+        return self.bonuses.get(benefit, 0)
+    
     def set_owner(self, kingdom):
         """设置城市归属"""
         if self.owner:
@@ -71,6 +211,7 @@ class City:
         self.owner = kingdom
         kingdom.add_city(self)
         self.loyalty = max(50, self.loyalty - 20)  # 易主后忠诚度下降
+        notify_change(self, "owner", "loyalty")
         
         return True
     
@@ -83,26 +224,52 @@ class City:
         self.prosperity = min(100, self.prosperity + 5)
         self.loyalty = min(100, self.loyalty + 10)
         self.growth_rate = max(0.01, self.growth_rate + politics_bonus * 0.005)
+        notify_change(self, "governor", "prosperity", "loyalty", "growth_rate")
         
         return True
     
+    @property
+    def garrison_index(self):
+        """驻军索引，见GarrisonIndex
+        
+        索引不随存档保存，读档或替换garrison后首次访问时重新建立
+        """
+        index = self.__dict__.get("_garrison_index")
+        if index is None or index.armies is not self.garrison:
+            if index is not None:
+                index.detach()
+            index = self._garrison_index = GarrisonIndex(self.garrison)
+        return index
+    
     def add_garrison(self, army):
         """添加驻军"""
-        if army not in self.garrison:
-            self.garrison.append(army)
+        if self.garrison_index.add(army):
+            notify_change(self, "garrison")
             return True
         return False
     
     def remove_garrison(self, army):
         """移除驻军"""
-        if army in self.garrison:
-            self.garrison.remove(army)
+        if self.garrison_index.remove(army):
+            notify_change(self, "garrison")
             return True
         return False
     
+    def has_garrison(self, army):
+        """军队是否驻守在本城"""
+        return army in self.garrison_index
+    
     def total_garrison_size(self):
         """获取总驻军数量"""
-        return sum(army.size for army in self.garrison)
+        return self.garrison_index.size
+    
+    def garrison_power(self):
+        """驻军的总战斗力（平原、无将领）"""
+        return self.garrison_index.power
+    
+    def garrison_by_type(self):
+        """各兵种的驻军兵力"""
+        return dict(self.garrison_index.by_type)
     
     def set_tax_rate(self, rate):
         """设置税率"""
@@ -116,6 +283,7 @@ class City:
         elif self.tax_rate < old_rate:
             self.loyalty = min(100, self.loyalty + (old_rate - self.tax_rate) * 50)
             self.prosperity = min(100, self.prosperity + (old_rate - self.tax_rate) * 50)
+        notify_change(self, "tax_rate", "loyalty", "prosperity")
         
         # 更新金钱产出
         self.update_production()
@@ -126,13 +294,13 @@ class City:
         """扩建农田"""
         cost = amount * 200  # 每个农田200金
         
-        if self.owner and self.owner.resources["gold"] >= cost:
-            self.owner.resources["gold"] -= cost
+        if self.owner and self.owner.ledger.debit("gold", cost, "扩建农田"):
             self.farms += amount
             
             # 更新粮食产出
             self.production["food"] = self.farms * 100
             
+            notify_change(self, "farms", "production")
             return True
         return False
     
@@ -140,13 +308,32 @@ class City:
         """扩建矿山"""
         cost = amount * 300  # 每个矿山300金
         
-        if self.owner and self.owner.resources["gold"] >= cost:
-            self.owner.resources["gold"] -= cost
+        if self.owner and self.owner.ledger.debit("gold", cost, "扩建矿山"):
             self.mines += amount
             
             # 更新矿物产出
             self.production["iron"] = self.mines * 20
             
+            notify_change(self, "mines", "production")
+            return True
+        return False
+    
+    def build(self, building_name):
+        """建造新建筑，类型见BUILDING_TYPES"""
+        if building_name in self.buildings or building_name not in BUILDING_TYPES:
+            return False
+        
+        building = Building.from_type(building_name)
+        if self.owner and self.owner.ledger.debit("gold", building.cost, f"建造{building_name}"):
+            self._add_benefits(building.benefits, 1)
+            self.buildings[building_name] = building
+            
+            if building_name == "城墙":
+                self.forts = building.level
+            
+            notify_change(self, "buildings", "forts")
+            if "商业收入" in building.benefits:
+                self.update_production()
             return True
         return False
     
@@ -158,42 +345,51 @@ class City:
         building = self.buildings[building_name]
         cost = building.cost
         
-        if self.owner and self.owner.resources["gold"] >= cost:
-            self.owner.resources["gold"] -= cost
+        if self.owner and self.owner.ledger.debit("gold", cost, f"升级{building_name}"):
+            self._add_benefits(building.benefits, -1)
             building.upgrade()
+            self._add_benefits(building.benefits, 1)
             
             # 特殊建筑效果
             if building_name == "城墙":
                 self.forts = building.level
             
+            notify_change(self, "buildings", "forts")
+            if "商业收入" in building.benefits:
+                self.update_production()
             return True
         return False
     
+    def tax_income(self):
+        """每月税收，势力收税和城市产出都按此计算"""
+        return int(self.population * self.tax_rate * self.prosperity / 100)
+    
     def collect_taxes(self):
         """收税"""
-        tax_income = int(self.population * self.tax_rate * self.prosperity / 100)
+        tax_income = self.tax_income()
         
         if self.owner:
-            self.owner.resources["gold"] += tax_income
+            self.owner.ledger.credit("gold", tax_income, f"{self.name}税收")
         
         # 税收可能降低忠诚度
         self.loyalty = max(10, self.loyalty - self.tax_rate * 10)
+        notify_change(self, "loyalty")
         
         return tax_income
     
     def update_production(self):
         """更新资源产出"""
         self.production = {
-            "gold": int(self.population * self.tax_rate * self.prosperity / 100),
+            "gold": self.tax_income(),
             "food": self.farms * 100,
             "iron": self.mines * 20,
             "wood": int((self.region == "益州" or self.region == "荆州") * self.farms * 10),
         }
         
         # 建筑加成
-        if "集市" in self.buildings:
-            self.production["gold"] += self.buildings["集市"].benefits.get("商业收入", 0)
+        self.production["gold"] += self.bonus("商业收入")
         
+        notify_change(self, "production")
         return self.production
     
     def monthly_update(self):
@@ -250,6 +446,7 @@ class City:
         
         # 应用繁荣度变化
         self.prosperity = max(10, min(100, self.prosperity + prosperity_change))
+        notify_change(self, "population", "loyalty", "prosperity")
         
         # 检查叛乱风险
         if self.loyalty < 30 and random.random() < 0.2:
@@ -273,6 +470,7 @@ class City:
                 
                 # 征兵影响忠诚度
                 self.loyalty = max(10, self.loyalty - amount / self.population * 50)
+                notify_change(self, "population", "loyalty")
                 
                 return new_army
         
@@ -292,7 +490,7 @@ class City:
     
     def get_defense_bonus(self):
         """获取城市防御加成"""
-        base_defense = self.buildings.get("城墙").benefits.get("防御", 0)
+        base_defense = self.bonus("防御")
         terrain_bonus = 1.0
         
         # 地区特殊加成
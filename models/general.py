@@ -3,6 +3,7 @@
 
 import random
 from enum import Enum
+from models.observer import notify_change
 
 class Skill(Enum):
     """将领可拥有的技能枚举"""
@@ -46,6 +47,7 @@ class General:
         """添加技能"""
         if skill not in self.skills and isinstance(skill, Skill):
             self.skills.append(skill)
+            notify_change(self, "skills")
             return True
         return False
         
@@ -53,12 +55,14 @@ class General:
         """移除技能"""
         if skill in self.skills:
             self.skills.remove(skill)
+            notify_change(self, "skills")
             return True
         return False
     
     def gain_experience(self, amount):
         """获得经验值"""
         self.experience += amount
+        notify_change(self, "experience")
         # 检查是否可以升级
         exp_needed = self.level * 100
         if self.experience >= exp_needed:
@@ -74,6 +78,7 @@ class General:
         for _ in range(3):  # 每次升级提升3个随机属性
             attr = random.choice(attributes)
             setattr(self, attr, getattr(self, attr) + random.randint(1, 3))
+        notify_change(self, "level", "experience", *attributes)
         
         # 检查是否学习新技能
         if self.level % 5 == 0:  # 每5级有机会学习新技能
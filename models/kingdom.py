@@ -3,6 +3,16 @@
 
 import random
 from models.army import Army, TroopType
+from models.ledger import ResourceLedger
+from models.observer import notify_change
+
+RANDOM_EVENT_CHANCE = 0.05  # 每月发生随机事件的概率
+
+# 月度经济参数
+FARM_FOOD = 100  # 每块农田每月产粮
+SOLDIER_UPKEEP = 0.1  # 每名士兵每月军饷
+SOLDIER_FOOD = 0.5  # 每名士兵每月口粮
+CITIZEN_FOOD = 0.1  # 每名百姓每月口粮
 
 class Kingdom:
     """势力类，代表游戏中的一个势力/国家"""
@@ -36,11 +46,24 @@ class Kingdom:
     def __str__(self):
         return f"{self.name} - 统治者: {self.leader_name}"
     
+    @property
+    def ledger(self):
+        """资源账本，资源的增减都经过它（见models/ledger.py）
+        
+        账本不随存档保存，读档或替换resources后首次访问时以当前余额重新建账
+        """
+        ledger = self.__dict__.get("_ledger")
+        if ledger is None or ledger.balances is not self.resources:
+            ledger = self._ledger = ResourceLedger(self.resources, self)
+        return ledger
+    
     def add_general(self, general):
         """添加将领"""
         if general not in self.generals:
             self.generals.append(general)
             general.kingdom_name = self.name
+            notify_change(self, "generals")
+            notify_change(general, "kingdom_name")
             return True
         return False
     
@@ -48,6 +71,7 @@ class Kingdom:
         """移除将领"""
         if general in self.generals:
             self.generals.remove(general)
+            notify_change(self, "generals")
             return True
         return False
     
@@ -57,6 +81,8 @@ class Kingdom:
             self.cities.append(city)
             city.owner = self
             self.population += city.population
+            notify_change(self, "cities", "population")
+            notify_change(city, "owner")
             return True
         return False
     
@@ -65,6 +91,7 @@ class Kingdom:
         if city in self.cities:
             self.cities.remove(city)
             self.population -= city.population
+            notify_change(self, "cities", "population")
             return True
         return False
     
@@ -72,6 +99,15 @@ class Kingdom:
         """添加军队"""
         if army not in self.armies:
             self.armies.append(army)
+            notify_change(self, "armies")
+            return True
+        return False
+    
+    def remove_army(self, army):
+        """移除军队"""
+        if army in self.armies:
+            self.armies.remove(army)
+            notify_change(self, "armies")
             return True
         return False
     
@@ -100,6 +136,8 @@ class Kingdom:
             if self not in other_kingdom.wars:
                 other_kingdom.wars.append(self)
             
+            notify_change(self, "wars", "alliances", "relations")
+            notify_change(other_kingdom, "wars", "alliances", "relations")
             return True
         return False
     
@@ -113,6 +151,8 @@ class Kingdom:
             self.relations[other_kingdom.name] = max(-20, self.relations.get(other_kingdom.name, 0))
             other_kingdom.relations[self.name] = max(-20, other_kingdom.relations.get(self.name, 0))
             
+            notify_change(self, "wars", "relations")
+            notify_change(other_kingdom, "wars", "relations")
             return True
         return False
     
@@ -126,6 +166,8 @@ class Kingdom:
             self.relations[other_kingdom.name] = min(100, (self.relations.get(other_kingdom.name, 0) + 50))
             other_kingdom.relations[self.name] = min(100, (other_kingdom.relations.get(self.name, 0) + 50))
             
+            notify_change(self, "alliances", "relations")
+            notify_change(other_kingdom, "alliances", "relations")
             return True
         return False
     
@@ -139,37 +181,37 @@ class Kingdom:
             self.relations[other_kingdom.name] = max(-20, (self.relations.get(other_kingdom.name, 0) - 30))
             other_kingdom.relations[self.name] = max(-20, (other_kingdom.relations.get(self.name, 0) - 30))
             
+            notify_change(self, "alliances", "relations")
+            notify_change(other_kingdom, "alliances", "relations")
             return True
         return False
     
     def collect_tax(self):
-        """收税，获取金钱"""
-        base_tax = sum(city.population * 0.1 for city in self.cities)
-        prosperity_bonus = sum(city.prosperity * 0.01 for city in self.cities)
-        
-        tax_collected = int(base_tax * (1 + prosperity_bonus))
-        self.resources["gold"] += tax_collected
+        """收税，获取金钱（各城按自己的税率和繁荣度计算，见City.tax_income）"""
+        tax_collected = sum(city.tax_income() for city in self.cities)
+        self.ledger.credit("gold", tax_collected, "收税")
         
         # 税收可能影响声望
         self.reputation -= 1
+        notify_change(self, "reputation")
         
         return tax_collected
     
     def harvest_food(self):
         """收集粮食"""
-        base_food = sum(city.farms * 100 for city in self.cities)
+        base_food = sum(city.farms for city in self.cities) * FARM_FOOD
         weather_factor = random.uniform(0.8, 1.2)  # 天气因素
         
         food_collected = int(base_food * weather_factor)
-        self.resources["food"] += food_collected
+        self.ledger.credit("food", food_collected, "收粮")
         
         return food_collected
     
     def research_tech(self):
         """研究新技术"""
-        if self.resources["gold"] >= self.tech_level * 500:
-            self.resources["gold"] -= self.tech_level * 500
+        if self.ledger.debit("gold", self.tech_level * 500, "研究技术"):
             self.tech_level += 1
+            notify_change(self, "tech_level")
             return True
         return False
     
@@ -200,17 +242,12 @@ class Kingdom:
             special_resource = "wood"
             special_amount = amount // 3
         
-        # 检查资源是否足够
-        if (self.resources["gold"] >= gold_cost and 
-            self.resources["food"] >= food_cost and 
-            (not special_resource or self.resources[special_resource] >= special_amount)):
-            
-            # 扣除资源
-            self.resources["gold"] -= gold_cost
-            self.resources["food"] -= food_cost
-            if special_resource:
-                self.resources[special_resource] -= special_amount
-            
+        costs = {"gold": -gold_cost, "food": -food_cost}
+        if special_resource:
+            costs[special_resource] = -special_amount
+        
+        # 资源全部足够时一并扣除
+        if self.ledger.apply(costs, "招募"):
             # 创建新军队
             new_army = Army(
                 size=amount,
@@ -224,65 +261,120 @@ class Kingdom:
         
         return None
     
-    def monthly_update(self):
-        """每月更新，处理常规事务"""
-        # 收税
-        tax = self.collect_tax()
+    def monthly_totals(self):
+        """一次遍历城市和军队，得到本月的税收、粮食产出、总兵力和百姓口粮"""
+        tax = farms = population = 0
+        for city in self.cities:
+            tax += city.tax_income()
+            farms += city.farms
+            population += city.population
+        army_size = sum(army.size for army in self.armies)
+        return tax, farms * FARM_FOOD, army_size, population * CITIZEN_FOOD
+    
+    def settle_month(self, tax, base_food, army_size, city_food, weather):
+        """按本月的收支结算资源，处理欠饷和饥荒
+        
+        Args:
+            tax: 税收
+            base_food: 天气影响前的粮食产出
+            army_size: 总兵力
+            city_food: 百姓口粮
+            weather: 天气因素，乘在粮食产出上
+        
+        Returns:
+            dict: 本月账目
+        """
+        resources = self.resources
+        ledger = self.ledger
+        food = int(base_food * weather)
+        # 税收可能影响声望
+        self.reputation -= 1
         
-        # 收获粮食
-        food = self.harvest_food()
+        # 军队维护成本和粮食消耗，余额不足时扣到0为止
+        upkeep = army_size * SOLDIER_UPKEEP
+        food_consumption = army_size * SOLDIER_FOOD + city_food
+        gold_paid = min(upkeep, max(0, resources["gold"] + tax))
+        food_paid = min(food_consumption, max(0, resources["food"] + food))
+        ledger.post((
+            ("gold", tax, "月度收入"),
+            ("food", food, "月度收入"),
+            ("gold", -gold_paid, "军饷"),
+            ("food", -food_paid, "粮食消耗"),
+        ))
         
-        # 军队维护成本
-        military_upkeep = sum(army.size * 0.1 for army in self.armies)
-        if self.resources["gold"] >= military_upkeep:
-            self.resources["gold"] -= military_upkeep
-        else:
+        gold_deficit = upkeep - gold_paid
+        if gold_deficit:
             # 金钱不足，军队士气降低
-            deficit = military_upkeep - self.resources["gold"]
-            self.resources["gold"] = 0
-            morale_drop = min(20, deficit / 100)
+            morale_drop = min(20, gold_deficit / 100)
             for army in self.armies:
                 army.morale = max(10, army.morale - morale_drop)
+                notify_change(army, "morale")
         
-        # 粮食消耗
-        food_consumption = sum(army.size * 0.5 for army in self.armies)
-        food_consumption += sum(city.population * 0.1 for city in self.cities)
-        
-        if self.resources["food"] >= food_consumption:
-            self.resources["food"] -= food_consumption
-        else:
+        food_deficit = food_consumption - food_paid
+        population_loss = 0
+        if food_deficit:
             # 粮食不足，人口和军队都受影响
-            deficit = food_consumption - self.resources["food"]
-            self.resources["food"] = 0
             
             # 军队士气大幅下降
             for army in self.armies:
                 army.morale = max(10, army.morale - 20)
+                notify_change(army, "morale")
             
             # 城市繁荣度下降
-            starvation_factor = deficit / food_consumption
+            starvation_factor = food_deficit / food_consumption
             for city in self.cities:
                 city.prosperity = max(10, city.prosperity - starvation_factor * 10)
                 
                 # 人口减少
-                population_loss = int(city.population * starvation_factor * 0.05)
-                city.population = max(100, city.population - population_loss)
-                self.population -= population_loss
+                loss = int(city.population * starvation_factor * 0.05)
+                city.population = max(100, city.population - loss)
+                population_loss += loss
+                notify_change(city, "prosperity", "population")
+            self.population -= population_loss
+        
+        ledger.close_month()
+        notify_change(self, "reputation", "population")
+        return {
+            "tax": tax,
+            "food": food,
+            "upkeep": upkeep,
+            "food_consumption": food_consumption,
+            "gold_deficit": gold_deficit,
+            "food_deficit": food_deficit,
+            "population_loss": population_loss,
+        }
+    
+    def monthly_update(self, with_events=True):
+        """每月更新，处理常规事务
+        
+        Args:
+            with_events: 是否掷骰决定随机事件；由调度器另行安排随机事件时传False
+        
+        Returns:
+            dict: 本月账目，见settle_month
+        """
+        tax, base_food, army_size, city_food = self.monthly_totals()
+        ledger = self.settle_month(tax, base_food, army_size, city_food, random.uniform(0.8, 1.2))  # 天气因素
         
         # 城市发展
         for city in self.cities:
             city.monthly_update()
             
         # 随机事件
-        self.random_events()
+        if with_events:
+            self.random_events()
         
-        return {"tax": tax, "food": food}
+        return ledger
     
-    def random_events(self):
-        """随机事件处理"""
+    def random_events(self, chance=RANDOM_EVENT_CHANCE):
+        """随机事件处理
+        
+        Args:
+            chance: 发生事件的概率，调度器已按概率抽出事件时间时传1
+        """
         # 可能发生的随机事件，如灾害、叛乱、人才出现等
         event_chance = random.random()
-        if event_chance < 0.05:  # 5%概率发生事件
+        if event_chance < chance:
             event_type = random.choice(["disaster", "rebellion", "talent", "windfall"])
             
             if event_type == "disaster":
@@ -293,6 +385,8 @@ class Kingdom:
                     affected_city.population = int(affected_city.population * (1 - severity))
                     affected_city.prosperity = max(10, affected_city.prosperity - 20)
                     self.population = sum(city.population for city in self.cities)
+                    notify_change(affected_city, "population", "prosperity")
+                    notify_change(self, "population")
                     return f"{affected_city.name}遭遇自然灾害，人口减少，繁荣度下降。"
                     
             elif event_type == "rebellion":
@@ -311,7 +405,7 @@ class Kingdom:
                 # 意外收获
                 resource_type = random.choice(["gold", "food", "iron", "wood", "horses"])
                 amount = random.randint(100, 500)
-                self.resources[resource_type] += amount
+                self.ledger.credit(resource_type, amount, "意外收获")
                 return f"您的势力发现了{amount}单位的{resource_type}。"
         
         return None 
\ No newline at end of file
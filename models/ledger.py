@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+资源账本模块
+势力的资源(Kingdom.resources)统一经账本增减：一批收支要么全部生效，要么在余额不足时全部不生效；
+每笔收支追加到按列存储的流水（array），每月结账时记下各资源的月末余额，
+因此"第T月末的余额"只需二分查找。AI规划可以用evaluate()试算多步开支计划而不修改资源。
+"""
+
+from array import array
+from bisect import bisect_right
+
+from models.observer import notify_change
+
+class ResourceLedger:
+    """一个势力的资源账本
+
+    balances就是势力的resources字典，账本直接修改它，其他代码照常读取。
+    """
+
+    def __init__(self, balances, owner=None, month=0):
+        self.balances = balances  # 资源 -> 当前余额
+        self.owner = owner  # 余额变化时通知的实体
+        self.month = month  # 当前记账月份，结账后加1
+        # 流水，各列一一对应
+        self._entry_months = array("l")
+        self._entry_resources = array("B")  # 资源名在self._resources中的位置
+        self._entry_amounts = array("d")
+        self._entry_reasons = array("H")  # 事由在self._reasons中的位置
+        self._resources = []
+        self._resource_index = {}
+        self._reasons = []
+        self._reason_index = {}
+        # 月末余额：各资源一列，与self._closed_months一一对应
+        self._opening = dict(balances)  # 建账时的余额
+        self._closed_months = array("l")
+        self._closing = {}
+
+    def __len__(self):
+        """流水条数"""
+        return len(self._entry_amounts)
+
+    def _intern(self, names, index, name):
+        position = index.get(name)
+        if position is None:
+            position = index[name] = len(names)
+            names.append(name)
+        return position
+
+    def shortfall(self, changes, balances=None):
+        """检查一批收支，返回余额不足的资源及缺口，全部足够时返回空字典"""
+        balances = self.balances if balances is None else balances
+        missing = {}
+        for resource, amount in changes.items():
+            if amount < 0:
+                left = balances.get(resource, 0) + amount
+                if left < 0:
+                    missing[resource] = -left
+        return missing
+
+    def apply(self, changes, reason=""):
+        """原子地执行一批收支（正数为收入，负数为支出）
+
+        Args:
+            changes: 资源 -> 变化量
+            reason: 事由，记入流水
+
+        Returns:
+            bool: 任一资源余额不足时不做任何修改并返回False
+        """
+        if self.shortfall(changes):
+            return False
+        self._record([(resource, amount, reason) for resource, amount in changes.items()])
+        return True
+
+    def post(self, entries):
+        """原子地按顺序记入多笔不同事由的收支
+
+        Args:
+            entries: [(资源, 变化量, 事由)]，每笔支出按前面各笔记入后的余额检查
+
+        Returns:
+            bool: 任一笔支出余额不足时不做任何修改并返回False
+        """
+        balances = self.balances
+        running = {}
+        for resource, amount, _ in entries:
+            left = running.get(resource, balances.get(resource, 0)) + amount
+            if amount < 0 and left < 0:
+                return False
+            running[resource] = left
+        self._record(entries)
+        return True
+
+    def _record(self, entries):
+        # 已检查过余额，修改余额并追加流水
+        balances = self.balances
+        month = self.month
+        resource_index = self._resource_index
+        reason_index = self._reason_index
+        changed = False
+        for resource, amount, reason in entries:
+            if not amount:
+                continue
+            balances[resource] = balances.get(resource, 0) + amount
+            resource_id = resource_index.get(resource)
+            if resource_id is None:
+                resource_id = self._intern(self._resources, resource_index, resource)
+            reason_id = reason_index.get(reason)
+            if reason_id is None:
+                reason_id = self._intern(self._reasons, reason_index, reason)
+            self._entry_months.append(month)
+            self._entry_resources.append(resource_id)
+            self._entry_amounts.append(amount)
+            self._entry_reasons.append(reason_id)
+            changed = True
+        if changed and self.owner is not None:
+            notify_change(self.owner, "resources")
+
+    def credit(self, resource, amount, reason=""):
+        """收入"""
+        return self.apply({resource: amount}, reason)
+
+    def debit(self, resource, amount, reason=""):
+        """支出，余额不足时返回False"""
+        return self.apply({resource: -amount}, reason)
+
+    # ---- 计划 ----
+
+    def evaluate(self, plan):
+        """试算多步计划，不修改余额
+
+        Args:
+            plan: 每步为一批收支的字典，按顺序执行，前面步骤的收入可供后面使用
+
+        Returns:
+            tuple: (可以完成的步数, 完成这些步骤后的余额, 第一个失败步骤的缺口)
+        """
+        balances = dict(self.balances)
+        for step, changes in enumerate(plan):
+            missing = self.shortfall(changes, balances)
+            if missing:
+                return step, balances, missing
+            for resource, amount in changes.items():
+                balances[resource] = balances.get(resource, 0) + amount
+        return len(plan), balances, {}
+
+    def apply_plan(self, plan, reason=""):
+        """原子地执行多步计划：全部步骤都能完成时才执行"""
+        done, _, _ = self.evaluate(plan)
+        if done < len(plan):
+            return False
+        for changes in plan:
+            self.apply(changes, reason)
+        return True
+
+    # ---- 结账和查询 ----
+
+    def close_month(self):
+        """结账：记下各资源的月末余额，进入下一个月"""
+        position = len(self._closed_months)
+        closing = self._closing
+        for resource, amount in self.balances.items():
+            column = closing.get(resource)
+            if column is None:
+                # 新出现的资源，此前各月按建账时的余额（通常为0）补齐
+                column = closing[resource] = array("d", [self._opening.get(resource, 0)]) * position
+            column.append(amount)
+        if len(closing) > len(self.balances):
+            # 有资源从字典中删除，余额记为0
+            for column in closing.values():
+                if len(column) == position:
+                    column.append(0)
+        self._closed_months.append(self.month)
+        self.month += 1
+
+    def balance_at(self, month, resource=None):
+        """第month月月末的余额；尚未结账的月份返回当前余额
+
+        Args:
+            resource: 资源名，不指定时返回所有资源的字典
+        """
+        if month >= self.month:
+            return dict(self.balances) if resource is None else self.balances.get(resource, 0)
+        position = bisect_right(self._closed_months, month) - 1
+        if position < 0:
+            snapshot = self._opening
+            return dict(snapshot) if resource is None else snapshot.get(resource, 0)
+        if resource is not None:
+            column = self._closing.get(resource)
+            return column[position] if column is not None else 0
+        return {name: column[position] for name, column in self._closing.items()}
+
+    def history(self, resource=None, since=0):
+        """产出流水 (月份, 资源, 变化量, 事由)，可按资源和起始月份筛选"""
+        start = bisect_right(self._entry_months, since - 1)
+        wanted = None if resource is None else self._resource_index.get(resource, -1)
+        for i in range(start, len(self._entry_amounts)):
+            if wanted is None or self._entry_resources[i] == wanted:
+                yield (self._entry_months[i], self._resources[self._entry_resources[i]],
+                       self._entry_amounts[i], self._reasons[self._entry_reasons[i]])
+
+    def totals(self, month, resource):
+        """某月某项资源的收入合计和支出合计"""
+        start = bisect_right(self._entry_months, month - 1)
+        end = bisect_right(self._entry_months, month)
+        wanted = self._resource_index.get(resource)
+        income = spending = 0
+        for i in range(start, end):
+            if self._entry_resources[i] == wanted:
+                amount = self._entry_amounts[i]
+                if amount > 0:
+                    income += amount
+                else:
+                    spending -= amount
+        return income, spending
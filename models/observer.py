@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+模型变更通知模块
+各模型在修改自身状态后调用notify_change，存档日志等订阅者据此只处理发生变化的实体
+"""
+
+_listeners = []  # 订阅者列表，回调签名为 listener(entity, fields)
+_entity_listeners = {}  # id(实体) -> 只关心该实体的订阅者列表
+
+
+def add_listener(listener, entity=None):
+    """注册变更订阅者
+
+    Args:
+        listener: 回调函数
+        entity: 只订阅该实体的变化，不传表示订阅所有实体。
+            大量订阅者各自只关心少数实体时（如每名在线玩家的任务跟踪），
+            按实体订阅使一次通知只调用相关的订阅者。订阅者应持有实体的引用，
+            实体被回收后其id可能被复用
+    """
+    listeners = _listeners if entity is None else _entity_listeners.setdefault(id(entity), [])
+    if listener not in listeners:
+        listeners.append(listener)
+        return True
+    return False
+
+
+def remove_listener(listener, entity=None):
+    """移除变更订阅者"""
+    if entity is None:
+        listeners = _listeners
+    else:
+        listeners = _entity_listeners.get(id(entity))
+        if listeners is None:
+            return False
+    if listener in listeners:
+        listeners.remove(listener)
+        if entity is not None and not listeners:
+            del _entity_listeners[id(entity)]
+        return True
+    return False
+
+
+def notify_change(entity, *fields):
+    """通知实体的指定字段发生了变化
+
+    Args:
+        entity: 发生变化的模型对象
+        fields: 变化的字段名，不传表示整个实体都可能发生了变化
+    """
+    # 没有订阅者时直接返回，保证可变操作的开销几乎为零
+    if _listeners:
+        for listener in tuple(_listeners):
+            listener(entity, fields)
+    if _entity_listeners:
+        listeners = _entity_listeners.get(id(entity))
+        if listeners:
+            for listener in tuple(listeners):
+                listener(entity, fields)
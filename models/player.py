@@ -2,12 +2,13 @@
 # -*- coding: utf-8 -*-
 
 from models.general import General
+from models.observer import notify_change
 
 class Player(General):
     """玩家类，继承自将领，拥有特殊能力和属性"""
     
     def __init__(self, name, kingdom, leadership, strength, intelligence, politics, charisma):
-        super().__init__(name, kingdom.name, leadership, strength, intelligence, politics, charisma)
+        super().__init__(name, leadership, strength, intelligence, politics, charisma, kingdom_name=kingdom.name)
         self.kingdom = kingdom  # 玩家所属势力
         self.armies = []  # 直接控制的军队
         self.fame = 10  # 声望，影响招募和事件
@@ -16,6 +17,7 @@ class Player(General):
         self.completed_quests = []  # 已完成任务
         self.title = "普通将领"  # 头衔
         self.items = []  # 持有的物品
+        self.battle_victories = 0  # 战斗胜利次数
     
     def gain_fame(self, amount):
         """获得声望"""
@@ -31,15 +33,23 @@ class Player(General):
         elif self.fame >= 2000 and self.title == "雄霸一方":
             self.title = "战神"
         
+        notify_change(self, "fame", "title")
         return self.title if self.title != "普通将领" else None
     
     def add_army(self, army):
         """添加军队到玩家的直接控制下"""
         if army not in self.armies:
             self.armies.append(army)
+            notify_change(self, "armies")
             return True
         return False
     
+    def record_victory(self):
+        """记录一次战斗胜利"""
+        self.battle_victories += 1
+        notify_change(self, "battle_victories")
+        return self.battle_victories
+    
     def total_army_size(self):
         """获取玩家直接控制的总兵力"""
         return sum(army.size for army in self.armies)
@@ -66,6 +76,7 @@ class Player(General):
             if quest.item_reward:
                 self.items.append(quest.item_reward)
             
+            notify_change(self, "achievement_points", "items")
             return True
         return False
     
@@ -112,6 +123,8 @@ class Player(General):
             self.politics += 3
             self.charisma += 5
             
+            notify_change(self, "achievement_points", "title", "leadership", "strength",
+                          "intelligence", "politics", "charisma")
             return True
         return False
     
@@ -136,6 +149,7 @@ class Player(General):
             "armies": [str(army) for army in self.armies],
             "active_quests": len(self.quests),
             "completed_quests": len(self.completed_quests),
+            "battle_victories": self.battle_victories,
             "items": len(self.items)
         }
         
@@ -4,6 +4,10 @@
 import random
 import time
 from models.army import Army, TroopType, Terrain, TROOP_COUNTERS
+from models.observer import notify_change
+
+FORT_DEFENSE_FACTOR = 1.25  # 防守关隘或未指定城市的城池时的战斗力加成
+CITY_DEFENSE_SCALE = 1200  # 城市防御值每达到这么多，守军战斗力增加100%（3级城墙为1.25倍）
 
 class BattlePhase:
     """战斗阶段枚举"""
@@ -27,14 +31,21 @@ class BattleResult:
 class Battle:
     """战斗系统类"""
     
-    def __init__(self, attacker_armies, defender_armies, attacker_generals=None, defender_generals=None, terrain=Terrain.PLAIN):
+    def __init__(self, attacker_armies, defender_armies, attacker_generals=None, defender_generals=None, terrain=Terrain.PLAIN,
+                 dramatic_pauses=True, city=None, defense_bonus=None):
         self.attacker_armies = attacker_armies if isinstance(attacker_armies, list) else [attacker_armies]
         self.defender_armies = defender_armies if isinstance(defender_armies, list) else [defender_armies]
         
         self.attacker_generals = attacker_generals if isinstance(attacker_generals, list) else ([attacker_generals] if attacker_generals else [])
         self.defender_generals = defender_generals if isinstance(defender_generals, list) else ([defender_generals] if defender_generals else [])
         
-        self.terrain = terrain
+        self.terrain = Terrain.CITY if city is not None else terrain
+        # 守城时按城市的防御值（城墙等建筑和地区）计算加成，攻城战可传入城墙受损后的防御值
+        if defense_bonus is None and city is not None:
+            defense_bonus = city.get_defense_bonus()
+        self.city = city
+        self.defense_factor = FORT_DEFENSE_FACTOR if defense_bonus is None else 1 + defense_bonus / CITY_DEFENSE_SCALE
+        self.dramatic_pauses = dramatic_pauses  # 是否在阶段之间停顿，批量模拟和测试时关闭
         self.battle_log = []
         self.current_phase = BattlePhase.DEPLOYMENT
         
@@ -51,6 +62,11 @@ class Battle:
     def log(self, message):
         """添加战斗日志"""
         self.battle_log.append(message)
+    
+    def pause(self, seconds):
+        """阶段之间的停顿，关闭dramatic_pauses时立即返回"""
+        if self.dramatic_pauses:
+            time.sleep(seconds)
         
     def calculate_army_power(self, armies, generals, is_attacker):
         """计算军队战斗力"""
@@ -80,7 +96,7 @@ class Battle:
                 if self.current_phase == BattlePhase.RANGED and army.primary_type == TroopType.SHIELDED:
                     army_power *= 1.3  # 远程阶段盾兵加成
                 elif self.terrain == Terrain.FORT or self.terrain == Terrain.CITY:
-                    army_power *= 1.25  # 防守关隘或城池加成
+                    army_power *= self.defense_factor  # 防守关隘或城池加成
                 
             # 战术加成
             tactics = self.attacker_tactics if is_attacker else self.defender_tactics
@@ -116,7 +132,12 @@ class Battle:
         self.log(f"防守方战斗力: {int(defender_power)}")
         
         # 计算伤亡率
-        power_ratio = attacker_power / defender_power if defender_power > 0 else 10
+        if defender_power <= 0:
+            power_ratio = 10
+        elif attacker_power <= 0:
+            power_ratio = 0.1  # 进攻方已无战斗力（如过度疲劳），按悬殊劣势计算
+        else:
+            power_ratio = attacker_power / defender_power
         
         # 设定基础伤亡率
         base_attacker_casualty_rate = 0.05  # 5%基础伤亡
@@ -182,8 +203,10 @@ class Battle:
         
         for army in self.attacker_armies:
             army.morale = max(10, min(100, army.morale + int(attacker_morale_change / 2)))
+            notify_change(army, "morale")
         for army in self.defender_armies:
             army.morale = max(10, min(100, army.morale + int(defender_morale_change / 2)))
+            notify_change(army, "morale")
         
         # 推进到下一阶段
         if self.current_phase == BattlePhase.DEPLOYMENT:
@@ -198,8 +221,10 @@ class Battle:
         # 经验获得
         for army in self.attacker_armies:
             army.experience += 1
+            notify_change(army, "experience")
         for army in self.defender_armies:
             army.experience += 1
+            notify_change(army, "experience")
         
         # 将领获得经验
         exp_gain = max(1, int((attacker_phase_casualties + defender_phase_casualties) / 200))
@@ -273,7 +298,7 @@ class Battle:
         self.log(f"防守方将领: {', '.join([general.name for general in self.defender_generals])}" if self.defender_generals else "防守方将领: 无")
         
         self.log("\n战斗开始...\n")
-        time.sleep(1)  # 增加戏剧性
+        self.pause(1)  # 增加戏剧性
         
         # 战前准备：单挑
         if self.attacker_generals and self.defender_generals:
@@ -289,17 +314,21 @@ class Battle:
                     # 进攻方士气提升，防守方士气降低
                     for army in self.attacker_armies:
                         army.morale = min(100, army.morale + 10)
+                        notify_change(army, "morale")
                     for army in self.defender_armies:
                         army.morale = max(10, army.morale - 10)
+                        notify_change(army, "morale")
                 else:
                     self.log(f"{defender_champion.name}在单挑中战胜了{attacker_champion.name}！")
                     # 防守方士气提升，进攻方士气降低
                     for army in self.defender_armies:
                         army.morale = min(100, army.morale + 10)
+                        notify_change(army, "morale")
                     for army in self.attacker_armies:
                         army.morale = max(10, army.morale - 10)
+                        notify_change(army, "morale")
                 
-                time.sleep(1)
+                self.pause(1)
         
         # 模拟战斗阶段
         battle_ended = False
@@ -308,7 +337,7 @@ class Battle:
         while not battle_ended and rounds < max_rounds:
             battle_ended = self.conduct_battle_phase()
             rounds += 1
-            time.sleep(0.5)  # 增加戏剧性
+            self.pause(0.5)  # 增加戏剧性
         
         # 判断胜负
         attacker_remaining = sum(army.size for army in self.attacker_armies)
@@ -329,6 +358,7 @@ class Battle:
             # 增加疲劳度
             for army in self.defender_armies:
                 army.fatigue = min(100, army.fatigue + 30)
+                notify_change(army, "fatigue")
             
             return BattleResult(
                 winner="defender",
@@ -349,6 +379,7 @@ class Battle:
             # 增加疲劳度
             for army in self.attacker_armies:
                 army.fatigue = min(100, army.fatigue + 30)
+                notify_change(army, "fatigue")
             
             return BattleResult(
                 winner="attacker",
@@ -368,8 +399,10 @@ class Battle:
             # 增加疲劳度
             for army in self.attacker_armies:
                 army.fatigue = min(100, army.fatigue + 20)
+                notify_change(army, "fatigue")
             for army in self.defender_armies:
                 army.fatigue = min(100, army.fatigue + 20)
+                notify_change(army, "fatigue")
             
             return BattleResult(
                 winner=None,
@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+只读游戏数据表模块
+把将领、城市等静态数据编译为按列存储的二进制文件，运行时通过mmap只读映射：
+- 数值属性为定宽整数列，技能为位掩码列
+- 所有字符串（姓名、势力、地区）存入去重后的字符串表，列中只保存编号
+- General/City对象只在需要时才由行数据创建
+因此启动时间和常驻内存不随剧本数据规模增长。
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from models.army import TroopType
+from models.city import City
+from models.general import General, Skill
+
+MAGIC = b"SGTB"
+VERSION = 1
+NO_VALUE = 0xFFFFFFFF  # 可选字符串为空
+NO_TROOP = 0xFF  # 没有兵种加成
+
+# 文件头: 标识, 版本, 字节序, 将领数, 城市数, 字符串数, 数据段数
+HEADER = struct.Struct("<4sHcxIIII")
+# 数据段目录项: 偏移, 字节长度, 类型码
+SECTION = struct.Struct("<II1s3x")
+
+SKILLS = list(Skill)  # 技能在位掩码中的位置
+TROOP_TYPES = list(TroopType)
+STATS = ("leadership", "strength", "intelligence", "politics", "charisma")
+
+# 数据段定义: (段名, array类型码)，编译和加载都按此顺序
+GENERAL_COLUMNS = (
+    ("general_name", "I"),
+    ("general_kingdom", "I"),
+    ("general_image", "I"),
+    ("leadership", "H"),
+    ("strength", "H"),
+    ("intelligence", "H"),
+    ("politics", "H"),
+    ("charisma", "H"),
+    ("skills", "I"),
+    ("bonus_troop", "B"),
+    ("bonus_value", "H"),  # 兵种加成，千分比
+    ("general_name_order", "I"),  # 按姓名排序的行号，用于二分查找
+)
+CITY_COLUMNS = (
+    ("city_name", "I"),
+    ("city_region", "I"),
+    ("population", "I"),
+    ("prosperity", "H"),
+    ("farms", "H"),
+    ("mines", "H"),
+    ("forts", "H"),
+    ("city_name_order", "I"),
+)
+STRING_COLUMNS = (
+    ("string_offsets", "I"),
+    ("string_data", "B"),
+)
+SECTIONS = GENERAL_COLUMNS + CITY_COLUMNS + STRING_COLUMNS
+
+
+def skills_to_mask(skills):
+    """技能列表转为位掩码"""
+    mask = 0
+    for skill in skills:
+        mask |= 1 << SKILLS.index(skill)
+    return mask
+
+
+def mask_to_skills(mask):
+    """位掩码转为技能列表"""
+    return [skill for i, skill in enumerate(SKILLS) if mask & (1 << i)]
+
+
+class _StringPool:
+    """编译期使用的字符串驻留表"""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def intern(self, text):
+        if text is None:
+            return NO_VALUE
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.ids[text] = string_id
+            self.strings.append(text)
+        return string_id
+
+
+def compile_tables(generals, cities, path):
+    """把将领和城市数据编译为二进制数据表
+
+    Args:
+        generals: 将领数据字典列表，技能和兵种使用中文名
+        cities: 城市数据字典列表，字段与City构造参数一致
+        path: 输出文件路径，先写入临时文件再替换，其他进程读到的总是完整的数据表
+    """
+    pool = _StringPool()
+    columns = {name: array(code) for name, code in SECTIONS}
+
+    for data in generals:
+        columns["general_name"].append(pool.intern(data["name"]))
+        columns["general_kingdom"].append(pool.intern(data.get("kingdom", "未知")))
+        columns["general_image"].append(pool.intern(data.get("image_path")))
+        for stat in STATS:
+            columns[stat].append(data[stat])
+        columns["skills"].append(skills_to_mask(Skill(name) for name in data.get("skills", [])))
+
+        troops_bonus = data.get("troops_bonus") or {}
+        if len(troops_bonus) > 1:
+            raise ValueError(f"将领{data['name']}的兵种加成超过一项，数据表只支持一项")
+        if troops_bonus:
+            troop_name, bonus = next(iter(troops_bonus.items()))
+            columns["bonus_troop"].append(TROOP_TYPES.index(TroopType(troop_name)))
+            columns["bonus_value"].append(int(round(bonus * 1000)))
+        else:
+            columns["bonus_troop"].append(NO_TROOP)
+            columns["bonus_value"].append(0)
+
+    for data in cities:
+        columns["city_name"].append(pool.intern(data["name"]))
+        columns["city_region"].append(pool.intern(data["region"]))
+        for field in ("population", "prosperity", "farms", "mines", "forts"):
+            columns[field].append(data[field])
+
+    names = [data["name"] for data in generals]
+    columns["general_name_order"].extend(sorted(range(len(names)), key=names.__getitem__))
+    names = [data["name"] for data in cities]
+    columns["city_name_order"].extend(sorted(range(len(names)), key=names.__getitem__))
+
+    offset = 0
+    columns["string_offsets"].append(0)
+    for text in pool.strings:
+        encoded = text.encode("utf-8")
+        columns["string_data"].extend(encoded)
+        offset += len(encoded)
+        columns["string_offsets"].append(offset)
+
+    # 依次排列各数据段，每段按8字节对齐，便于直接映射为定宽列
+    position = HEADER.size + SECTION.size * len(SECTIONS)
+    directory = []
+    blobs = []
+    for name, code in SECTIONS:
+        position += -position % 8
+        blob = columns[name].tobytes()
+        directory.append(SECTION.pack(position, len(blob), code.encode("ascii")))
+        blobs.append((position, blob))
+        position += len(blob)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(
+            MAGIC, VERSION, sys.byteorder[0].encode("ascii"),
+            len(generals), len(cities), len(pool.strings), len(SECTIONS)
+        ))
+        f.write(b"".join(directory))
+        for position, blob in blobs:
+            f.write(b"\0" * (position - f.tell()))
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+
+class _RowSequence:
+    """按需创建对象的只读序列"""
+
+    def __init__(self, factory, count):
+        self._factory = factory
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._factory(i) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return self._factory(index)
+
+
+class GameDataTables:
+    """内存映射的只读数据表"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+        magic, version, byteorder, self.general_count, self.city_count, self.string_count, section_count = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or section_count != len(SECTIONS):
+            self.close()
+            raise ValueError(f"数据表格式不匹配: {path}")
+        if byteorder != sys.byteorder[0].encode("ascii"):
+            self.close()
+            raise ValueError(f"数据表字节序与本机不同，需要重新编译: {path}")
+
+        # 各列直接映射为定宽整数视图，不复制数据
+        self.columns = {}
+        for i, (name, code) in enumerate(SECTIONS):
+            offset, length, _ = SECTION.unpack_from(self._map, HEADER.size + SECTION.size * i)
+            self.columns[name] = self._view[offset:offset + length].cast(code)
+
+        self.generals = _RowSequence(self.general, self.general_count)
+        self.cities = _RowSequence(self.city, self.city_count)
+
+    def close(self):
+        """释放内存映射"""
+        self.columns = {}
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def string(self, string_id):
+        """读取字符串表中的字符串"""
+        if string_id == NO_VALUE:
+            return None
+        offsets = self.columns["string_offsets"]
+        return bytes(self.columns["string_data"][offsets[string_id]:offsets[string_id + 1]]).decode("utf-8")
+
+    def string_id(self, text):
+        """查找字符串编号，不存在返回None（线性扫描，用于一次性的筛选条件）"""
+        encoded = text.encode("utf-8")
+        offsets = self.columns["string_offsets"]
+        data = self.columns["string_data"]
+        for i in range(self.string_count):
+            if offsets[i + 1] - offsets[i] == len(encoded) and bytes(data[offsets[i]:offsets[i + 1]]) == encoded:
+                return i
+        return None
+
+    def general(self, index):
+        """根据行号创建将领对象"""
+        columns = self.columns
+        general = General(
+            name=self.string(columns["general_name"][index]),
+            leadership=columns["leadership"][index],
+            strength=columns["strength"][index],
+            intelligence=columns["intelligence"][index],
+            politics=columns["politics"][index],
+            charisma=columns["charisma"][index],
+            kingdom_name=self.string(columns["general_kingdom"][index]),
+            image_path=self.string(columns["general_image"][index])
+        )
+        for skill in mask_to_skills(columns["skills"][index]):
+            general.add_skill(skill)
+        troop = columns["bonus_troop"][index]
+        if troop != NO_TROOP:
+            general.troops_bonus = {TROOP_TYPES[troop]: columns["bonus_value"][index] / 1000}
+        return general
+
+    def city_data(self, index):
+        """读取城市行数据，返回与City构造参数一致的字典"""
+        columns = self.columns
+        return {
+            "name": self.string(columns["city_name"][index]),
+            "population": columns["population"][index],
+            "prosperity": columns["prosperity"][index],
+            "farms": columns["farms"][index],
+            "mines": columns["mines"][index],
+            "forts": columns["forts"][index],
+            "region": self.string(columns["city_region"][index]),
+        }
+
+    def city(self, index):
+        """根据行号创建城市对象"""
+        return City(**self.city_data(index))
+
+    def _find(self, name, name_column, order_column):
+        """按姓名二分查找行号"""
+        order = self.columns[order_column]
+        names = self.columns[name_column]
+        key = lambda row: self.string(names[row])
+        position = bisect_left(_KeyedView(order, key), name)
+        if position < len(order) and key(order[position]) == name:
+            return order[position]
+        return None
+
+    def find_general(self, name):
+        """按姓名查找将领，返回新建的将领对象或None"""
+        index = self._find(name, "general_name", "general_name_order")
+        return None if index is None else self.general(index)
+
+    def find_city(self, name):
+        """按名称查找城市，返回新建的城市对象或None"""
+        index = self._find(name, "city_name", "city_name_order")
+        return None if index is None else self.city(index)
+
+    def general_indices_of_kingdom(self, kingdom_name):
+        """返回属于指定势力的将领行号（只扫描整数列，不创建对象）"""
+        kingdom_id = self.string_id(kingdom_name)
+        if kingdom_id is None:
+            return []
+        column = self.columns["general_kingdom"]
+        return [i for i in range(self.general_count) if column[i] == kingdom_id]
+
+    def generals_of_kingdom(self, kingdom_name):
+        """创建属于指定势力的将领对象"""
+        return [self.general(i) for i in self.general_indices_of_kingdom(kingdom_name)]
+
+
+class _KeyedView:
+    """让bisect在行号列上按姓名比较的轻量视图"""
+
+    def __init__(self, rows, key):
+        self._rows = rows
+        self._key = key
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        return self._key(self._rows[index])
+
+
+def load_source(path):
+    """读取JSON格式的源数据"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+经济结算模块
+一次结算所有势力本月的经济：每个势力只遍历一次自己的城市和军队（Kingdom.monthly_totals），
+得到税收、粮食产出、兵力和百姓口粮，再按总额结算军饷、粮食消耗、欠饷和饥荒（Kingdom.settle_month），
+返回每个势力的账目。税收统一按各城的税率计算（City.tax_income）。
+
+命令行:
+    python -m modules.economy --kingdoms 10 100 1000   # 测量不同势力数下每月结算的耗时
+"""
+
+import argparse
+import random
+import time
+
+LEDGER_FIELDS = ("tax", "food", "upkeep", "food_consumption", "gold_deficit", "food_deficit", "population_loss")
+WEATHER_RANGE = (0.8, 1.2)  # 天气对粮食产出的影响
+
+def settle_economy(kingdoms, rng=random):
+    """结算所有势力本月的经济，不含城市发展和随机事件
+
+    Returns:
+        list: 与kingdoms一一对应的账目
+    """
+    uniform = rng.uniform
+    low, high = WEATHER_RANGE
+    return [kingdom.settle_month(*kingdom.monthly_totals(), uniform(low, high)) for kingdom in kingdoms]
+
+def run_month(kingdoms, with_events=True, rng=random):
+    """所有势力的月度更新，与逐个调用Kingdom.monthly_update的效果相同
+
+    Args:
+        with_events: 是否掷骰决定随机事件；由调度器另行安排随机事件时传False
+    """
+    ledgers = settle_economy(kingdoms, rng)
+    for kingdom in kingdoms:
+        for city in kingdom.cities:
+            city.monthly_update()
+    if with_events:
+        for kingdom in kingdoms:
+            kingdom.random_events()
+    return ledgers
+
+def summarize_ledgers(ledgers):
+    """汇总账目：各项合计，以及欠饷、缺粮的势力数"""
+    summary = {field: sum(ledger[field] for ledger in ledgers) for field in LEDGER_FIELDS}
+    summary["kingdoms"] = len(ledgers)
+    summary["unpaid"] = sum(1 for ledger in ledgers if ledger["gold_deficit"])
+    summary["starving"] = sum(1 for ledger in ledgers if ledger["food_deficit"])
+    return summary
+
+def benchmark_economy(kingdom_counts=(10, 100, 1000), months=12, seed=0):
+    """在合成世界上测量每月结算的耗时，城市和军队数按基础世界的比例随势力数增长"""
+    from modules.world_generator import BASE_WORLD, generate_world
+
+    rows = []
+    for count in kingdom_counts:
+        ratio = count / BASE_WORLD["kingdoms"]
+        world = generate_world(count, int(BASE_WORLD["cities"] * ratio), int(BASE_WORLD["generals"] * ratio),
+                               int(BASE_WORLD["armies"] * ratio), seed=seed)
+        kingdoms = world["kingdoms"]
+        random.seed(seed)
+        start = time.perf_counter()
+        for _ in range(months):
+            ledgers = settle_economy(kingdoms)
+        economy = (time.perf_counter() - start) / months
+        start = time.perf_counter()
+        for _ in range(months):
+            run_month(kingdoms, with_events=False)
+        full = (time.perf_counter() - start) / months
+        rows.append({
+            "kingdoms": count,
+            "cities": len(world["cities"]),
+            "armies": len(world["armies"]),
+            "economy_ms": economy * 1000,
+            "month_ms": full * 1000,
+            "summary": summarize_ledgers(ledgers),
+        })
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="月度经济结算性能测试")
+    parser.add_argument("--kingdoms", type=int, nargs="+", default=[10, 100, 1000], help="势力数")
+    parser.add_argument("--months", type=int, default=12, help="测量的月数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    print(f"{'势力':>6} {'城市':>7} {'军队':>7} {'经济结算':>10} {'含城市发展':>10} {'缺粮势力':>8}")
+    for row in benchmark_economy(args.kingdoms, args.months, args.seed):
+        print(f"{row['kingdoms']:>6} {row['cities']:>7} {row['armies']:>7} {row['economy_ms']:>8.2f}ms "
+              f"{row['month_ms']:>8.2f}ms {row['summary']['starving']:>8}")
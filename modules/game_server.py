@@ -0,0 +1,475 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多人游戏服务器模块
+基于asyncio的JSON行协议服务器：每个连接是一名玩家，在一个事件循环中同时服务数千个会话。
+
+协议：客户端每行发送一个请求 {"id": 1, "cmd": "hello", ...}，服务器回复 {"id": 1, "ok": true, "data": ...}
+或 {"id": 1, "ok": false, "error": "..."}；剧情事件由服务器主动推送 {"push": "story", "events": [...]}。
+请求违反游戏规则（如资源不足）时只返回error，服务器内部异常时另带 "internal": true。
+
+- 剧情由一个StoryRuntime驱动，定时取出到时间的事件推送给各玩家，不为每名玩家创建任务或线程
+- 战斗结算在进程池中进行，事件循环只负责复制参数和写回结果，不会被战斗计算阻塞
+- 每个会话记录请求的处理延迟，stats命令和服务器关闭时输出各会话的延迟百分位
+
+命令行:
+    python -m modules.game_server --port 8765
+
+负载测试的机器人客户端见modules/load_test.py。
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from models.army import TroopType
+from modules.game_session import GameSession, create_world, resolve_battle
+from modules.story import StoryRuntime
+from modules.world_store import WorldStore
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+STORY_TICK = 0.05  # 剧情事件的推送间隔（秒）
+LATENCY_SAMPLES = 1000  # 每个会话保留的最近延迟样本数
+PERCENTILES = (50, 95, 99)
+LINE_LIMIT = 64 * 1024  # 单个请求的最大长度
+
+class RequestError(RuntimeError):
+    """服务器拒绝了请求"""
+
+    def __init__(self, message, internal=False):
+        super().__init__(message)
+        self.internal = internal  # True表示服务器内部异常，而不是游戏规则的拒绝
+
+    @classmethod
+    def from_reply(cls, message):
+        return cls(message["error"], message.get("internal", False))
+
+def percentiles(values, points=PERCENTILES):
+    """计算百分位（最近秩法），values为空时返回空字典"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {f"p{point}": ordered[min(last, int(len(ordered) * point / 100))] for point in points}
+
+def encode(message):
+    """编码一行消息"""
+    return (json.dumps(message, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+class ClientConnection:
+    """服务器端的一个客户端连接"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.session = None
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # 请求处理延迟（毫秒）
+
+    def send(self, message):
+        """写入消息，不等待发送完成"""
+        if not self.writer.is_closing():
+            self.writer.write(encode(message))
+
+    def close(self):
+        self.writer.close()
+
+class GameServer:
+    """多人游戏服务器"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, shared_world=True, workers=None, story_speed=1.0,
+                 world_path=None):
+        self.host = host
+        self.port = port
+        self.shared_world = shared_world  # 所有玩家共用一个世界，否则每名玩家单独创建
+        self.store = None  # 共享世界的数据库，见modules/world_store.py
+        self.world = None
+        if shared_world and world_path:
+            self.store = WorldStore(world_path)
+            self.world = self.store.load_world()
+            self.store.attach()
+            if self.world is None:
+                self.world = create_world()
+                self.store.save_world(self.world)
+        elif shared_world:
+            self.world = create_world()
+        self.online_players = {}  # 使用数据库时：玩家存档键 -> 会话编号，同一玩家不能重复登录
+        self.workers = workers  # 战斗进程数，None为CPU核数，0为在事件循环的默认线程池中结算
+        self.story_speed = story_speed  # 剧情时钟的倍速，负载测试中加快以免等待事件的显示间隔
+        self.pool = None
+        self.server = None
+        self.runtime = StoryRuntime()
+        self.connections = {}  # 会话编号 -> ClientConnection
+        self.closed_latencies = {}  # 已断开会话的延迟样本
+        self._handlers = set()  # 各连接的请求循环任务
+        self._ids = itertools.count(1)
+        self._pump = None
+        self._started = time.monotonic()
+        self.commands = {
+            "hello": self.cmd_hello,
+            "status": self.cmd_status,
+            "chapters": self.cmd_chapters,
+            "story": self.cmd_story,
+            "choose": self.cmd_choose,
+            "quests": self.cmd_quests,
+            "accept_quest": self.cmd_accept_quest,
+            "recruit": self.cmd_recruit,
+            "train": self.cmd_train,
+            "rest": self.cmd_rest,
+            "battle": self.cmd_battle,
+            "stats": self.cmd_stats,
+        }
+
+    def now(self):
+        """剧情时间线使用的时钟"""
+        return (time.monotonic() - self._started) * self.story_speed
+
+    # ---- 启动和关闭 ----
+
+    async def start(self, listen=True):
+        """开始服务，port为0时由系统分配端口；listen为False时不监听，只供同一进程内的客户端调用dispatch"""
+        if self.workers != 0:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        if listen:
+            self.server = await asyncio.start_server(self.handle_client, self.host, self.port, limit=LINE_LIMIT,
+                                                     backlog=4096)
+            self.port = self.server.sockets[0].getsockname()[1]
+        self._pump = asyncio.ensure_future(self.pump_story())
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"服务器已启动: {self.host}:{self.port}")
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        """停止服务器并关闭进程池"""
+        if self._pump is not None:
+            self._pump.cancel()
+            self._pump = None
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for connection in list(self.connections.values()):
+            connection.close()
+        if self._handlers:
+            # 等待各连接读到断开后退出，避免事件循环关闭时取消它们
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    # ---- 连接 ----
+
+    async def handle_client(self, reader, writer):
+        """一个连接的请求循环"""
+        connection = ClientConnection(reader, writer)
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                received = time.perf_counter()
+                reply = await self.dispatch(connection, line)
+                connection.send(reply)
+                if writer.transport.get_write_buffer_size() > LINE_LIMIT:
+                    await writer.drain()  # 客户端读取太慢时才等待
+                connection.latencies.append((time.perf_counter() - received) * 1000)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self.disconnect(connection)
+            writer.close()
+            self._handlers.discard(task)
+
+    def disconnect(self, connection):
+        session = connection.session
+        if session is None:
+            return
+        self.connections.pop(session.session_id, None)
+        self.online_players.pop(f"Player:{session.player.name}", None)
+        self.runtime.stop(session.session_id)
+        tracker = session.story.trackers.get(session.player.name)
+        if tracker is not None:
+            tracker.detach()
+        self.closed_latencies[session.session_id] = list(connection.latencies)
+
+    async def dispatch(self, connection, line):
+        """解析并执行一个请求"""
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+        except (ValueError, AttributeError):
+            return {"id": None, "ok": False, "error": "请求格式错误"}
+        handler = self.commands.get(request.get("cmd"))
+        if handler is None:
+            return {"id": request_id, "ok": False, "error": f"未知命令: {request.get('cmd')}"}
+        if connection.session is None and request.get("cmd") != "hello":
+            return {"id": request_id, "ok": False, "error": "请先发送hello"}
+        try:
+            data = handler(connection, request)
+            if asyncio.iscoroutine(data):
+                data = await data
+        except ValueError as e:
+            # 各命令以ValueError拒绝不符合游戏规则的请求
+            return {"id": request_id, "ok": False, "error": str(e)}
+        except Exception as e:
+            return {"id": request_id, "ok": False, "error": f"{type(e).__name__}: {e}", "internal": True}
+        return {"id": request_id, "ok": True, "data": data}
+
+    # ---- 命令 ----
+
+    def cmd_hello(self, connection, request):
+        """登录：创建玩家"""
+        if connection.session is not None:
+            raise ValueError("已经登录")
+        session_id = next(self._ids)
+        kingdoms = self.world if self.shared_world else create_world()
+        name = str(request.get("name") or f"玩家{session_id}")
+        player = None
+        if self.store is not None:
+            key = f"Player:{name}"
+            if key in self.online_players:
+                raise ValueError("该玩家已经在线")
+            player = self.store.get(key)  # 老玩家读出上次的角色
+        session = GameSession(session_id, name, kingdoms, request.get("kingdom"), request.get("new_kingdom"),
+                              player=player)
+        if self.store is not None:
+            self.store.add(session.player)
+            self.online_players[key] = session_id
+        connection.session = session
+        self.connections[session_id] = connection
+        return {"session": session_id, "status": session.status()}
+
+    def cmd_status(self, connection, request):
+        return connection.session.status()
+
+    def cmd_chapters(self, connection, request):
+        return connection.session.available_chapters()
+
+    def cmd_story(self, connection, request):
+        """开始章节，事件稍后推送"""
+        session = connection.session
+        index = request.get("chapter")
+        if index is None:
+            index = session.story.get_next_chapter(session.player)
+        if index is None:
+            raise ValueError("没有可进行的章节")
+        reason = session.story.check_chapter(index, session.player)
+        if reason:
+            raise ValueError(reason)
+        self.runtime.start(session.session_id, session.story, index, session.player, self.now())
+        return {"chapter": index, "title": session.story.chapters.title(index)}
+
+    def cmd_choose(self, connection, request):
+        """送入剧情选择"""
+        if not self.runtime.choose(connection.session.session_id, int(request.get("choice", 0)), self.now()):
+            raise ValueError("当前不需要选择或选择无效")
+        return {"accepted": True}
+
+    def cmd_quests(self, connection, request):
+        session = connection.session
+        return {"available": session.available_quests(), "completed": session.completed_quests()}
+
+    def cmd_accept_quest(self, connection, request):
+        name = connection.session.accept_quest(int(request.get("quest", 0)))
+        if name is None:
+            raise ValueError("无效的任务")
+        return {"quest": name}
+
+    def cmd_recruit(self, connection, request):
+        """招募新兵：amount人数，troop兵种名（如INFANTRY）"""
+        amount = int(request.get("amount", 0))
+        troop_type = TroopType.__members__.get(request.get("troop", "INFANTRY"))
+        if troop_type is None:
+            raise ValueError(f"未知兵种: {request.get('troop')}")
+        if amount <= 0:
+            raise ValueError("招募人数必须大于0")
+        army = connection.session.recruit(amount, troop_type)
+        if army is None:
+            raise ValueError("资源不足")
+        return {"army": army.army_id, "size": army.size, "resources": connection.session.player.kingdom.resources}
+
+    def cmd_train(self, connection, request):
+        """训练所有军队：days天数"""
+        days = int(request.get("days", 1))
+        if not 1 <= days <= 30:
+            raise ValueError("训练天数应在1到30之间")
+        return {"training": connection.session.train(days)}
+
+    def cmd_rest(self, connection, request):
+        """休整所有军队：days天数"""
+        days = int(request.get("days", 1))
+        if not 1 <= days <= 30:
+            raise ValueError("休整天数应在1到30之间")
+        return {"fatigue": connection.session.rest(days)}
+
+    async def cmd_battle(self, connection, request):
+        """与随机敌军作战，在进程池中结算"""
+        session = connection.session
+        prepared = session.prepare_battle()
+        if prepared is None:
+            raise ValueError("没有可出战的军队（过度疲劳的军队需要休整）或上一场战斗尚未结束")
+        payload, armies, enemy = prepared
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.pool, resolve_battle, payload)
+        except Exception:
+            session.battle_pending = False
+            raise
+        if connection.session is not session or session.session_id not in self.connections:
+            return None  # 结算期间玩家已断开
+        return session.finish_battle(result, armies, enemy)
+
+    def cmd_stats(self, connection, request):
+        return self.latency_report(per_session=bool(request.get("sessions")))
+
+    # ---- 剧情推送 ----
+
+    async def pump_story(self):
+        """定时把到时间的剧情事件推送给玩家，并把本tick的世界变更写入数据库"""
+        while True:
+            await asyncio.sleep(STORY_TICK)
+            if self.store is not None:
+                self.store.flush()
+            for session_id, events in self.runtime.poll(self.now()).items():
+                connection = self.connections.get(session_id)
+                if connection is not None:
+                    connection.send({"push": "story", "events": events})
+
+    # ---- 统计 ----
+
+    def latency_report(self, per_session=False):
+        """请求处理延迟的百分位（毫秒）：全部请求的汇总，以及各会话p95的分布"""
+        samples = {session_id: list(connection.latencies) for session_id, connection in self.connections.items()}
+        samples.update(self.closed_latencies)
+        everything = [value for values in samples.values() for value in values]
+        session_p95 = [percentiles(values)["p95"] for values in samples.values() if values]
+        report = {
+            "sessions": len(samples),
+            "online": len(self.connections),
+            "requests": len(everything),
+            "overall_ms": {key: round(value, 3) for key, value in percentiles(everything).items()},
+            "session_p95_ms": {key: round(value, 3) for key, value in percentiles(session_p95).items()},
+        }
+        if per_session:
+            report["by_session"] = {
+                session_id: {key: round(value, 3) for key, value in percentiles(values).items()}
+                for session_id, values in samples.items() if values
+            }
+        return report
+
+class GameClient:
+    """服务器的客户端，负载测试的机器人也通过它连接"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.events = asyncio.Queue()  # 服务器推送的剧情事件
+        self.round_trips = []  # 请求往返时间（毫秒）
+        self._pending = {}  # 请求编号 -> Future
+        self._ids = itertools.count(1)
+        self._reader_task = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, limit=LINE_LIMIT)
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+        return self
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if "push" in message:
+                    for event in message["events"]:
+                        self.events.put_nowait(event)
+                    continue
+                future = self._pending.pop(message.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("连接已断开"))
+            self._pending.clear()
+
+    async def request(self, cmd, **args):
+        """发送请求并等待回复，失败时抛出RequestError"""
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        started = time.perf_counter()
+        self.writer.write(encode(dict(args, id=request_id, cmd=cmd)))
+        message = await future
+        self.round_trips.append((time.perf_counter() - started) * 1000)
+        if not message["ok"]:
+            raise RequestError.from_reply(message)
+        return message["data"]
+
+    async def next_event(self, event_type=None, timeout=30):
+        """等待下一个剧情事件，指定类型时跳过其他事件"""
+        while True:
+            event = await asyncio.wait_for(self.events.get(), timeout)
+            if event_type is None or event["type"] == event_type:
+                return event
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+
+def raise_file_limit():
+    """提高可打开的文件数上限，以便在一台机器上建立数千个连接"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+def main():
+    parser = argparse.ArgumentParser(description="三国霸业多人游戏服务器")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="战斗进程数，0表示不使用进程池")
+    parser.add_argument("--separate-worlds", action="store_true", help="每名玩家单独创建世界")
+    parser.add_argument("--world", default=None, help="共享世界的数据库路径，不指定时世界只保存在内存中")
+    args = parser.parse_args()
+
+    raise_file_limit()
+    server = GameServer(args.host, args.port, shared_world=not args.separate_worlds, workers=args.workers,
+                        world_path=args.world)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print(json.dumps(server.latency_report(), ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
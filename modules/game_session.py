@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+游戏会话模块
+一个GameSession对应一名在线玩家：自己的Player、剧情进度和任务，势力可以来自共享的世界，
+也可以为每名玩家单独创建。会话只处理立即完成的命令，剧情推进和战斗由服务器调度。
+
+战斗在进程池中结算：battle_payload把双方军队和将领复制成可序列化的快照，
+resolve_battle在工作进程中运行Battle，apply_battle把结果写回原来的对象。
+"""
+
+import random
+
+from models.army import Army, TroopType, Terrain
+from models.general import General
+from models.kingdom import Kingdom
+from models.observer import notify_change
+from models.player import Player
+from modules.battle import Battle
+from modules.story import Story
+
+# 默认世界的势力: (名称, 领袖, 颜色)
+DEFAULT_KINGDOMS = (
+    ("魏国", "曹操", "蓝色"),
+    ("蜀国", "刘备", "绿色"),
+    ("吴国", "孙权", "红色"),
+)
+BATTLE_LOG_LINES = 12  # 返回给客户端的战斗日志行数
+
+def create_world():
+    """创建默认的三个势力"""
+    return [Kingdom(name, leader, color) for name, leader, color in DEFAULT_KINGDOMS]
+
+def snapshot_general(general):
+    """复制将领的战斗相关属性，不包含所属势力等引用，便于发送到工作进程"""
+    copy = General(general.name, general.leadership, general.strength, general.intelligence,
+                   general.politics, general.charisma, kingdom_name=general.kingdom_name)
+    copy.level = general.level
+    copy.experience = general.experience
+    copy.skills = list(general.skills)
+    copy.troops_bonus = dict(general.troops_bonus)
+    return copy
+
+def battle_payload(attacker_armies, defender_armies, attacker_generals=(), defender_generals=(),
+                   terrain=Terrain.PLAIN, seed=None):
+    """打包战斗参数（军队本身没有外部引用，直接随进程间通信复制）"""
+    return {
+        "attackers": list(attacker_armies),
+        "defenders": list(defender_armies),
+        "attacker_generals": [snapshot_general(general) for general in attacker_generals],
+        "defender_generals": [snapshot_general(general) for general in defender_generals],
+        "terrain": terrain,
+        "seed": seed,
+    }
+
+def resolve_battle(payload):
+    """在工作进程中结算战斗
+
+    Returns:
+        dict: 胜负、伤亡、日志末尾几行，以及战后的军队和将领状态
+    """
+    if payload["seed"] is not None:
+        random.seed(payload["seed"])
+    battle = Battle(payload["attackers"], payload["defenders"],
+                    payload["attacker_generals"], payload["defender_generals"],
+                    payload["terrain"], dramatic_pauses=False)
+    result = battle.simulate_battle()
+    return {
+        "winner": result.winner,
+        "is_decisive": result.is_decisive,
+        "attacker_casualties": result.attacker_casualties,
+        "defender_casualties": result.defender_casualties,
+        "log": [line for line in result.battle_log if line.strip()][-BATTLE_LOG_LINES:],
+        "attackers": [vars(army) for army in battle.attacker_armies],
+        "defenders": [vars(army) for army in battle.defender_armies],
+        "attacker_generals": [_general_state(general) for general in battle.attacker_generals],
+        "defender_generals": [_general_state(general) for general in battle.defender_generals],
+    }
+
+def _general_state(general):
+    return {
+        "level": general.level,
+        "experience": general.experience,
+        "leadership": general.leadership,
+        "strength": general.strength,
+        "intelligence": general.intelligence,
+        "politics": general.politics,
+        "charisma": general.charisma,
+        "skills": list(general.skills),
+    }
+
+def apply_battle(result, attacker_armies, defender_armies, attacker_generals=(), defender_generals=()):
+    """把工作进程返回的战后状态写回原来的军队和将领，并发出变更通知"""
+    for armies, states in ((attacker_armies, result["attackers"]), (defender_armies, result["defenders"])):
+        for army, state in zip(armies, states):
+            vars(army).update(state)
+            notify_change(army)
+    for generals, states in ((attacker_generals, result["attacker_generals"]),
+                             (defender_generals, result["defender_generals"])):
+        for general, state in zip(generals, states):
+            vars(general).update(state)
+            notify_change(general, *state)
+
+class GameSession:
+    """一名在线玩家的游戏状态"""
+
+    def __init__(self, session_id, name, kingdoms, kingdom_index=None, kingdom_name=None, player=None):
+        """与ThreeKingdomsGame.create_player相同：效忠已有势力，或给出kingdom_name自立门户；
+        给出player时继续使用已有的角色（如从世界数据库读出的老玩家）"""
+        self.session_id = session_id
+        self.story = Story()  # 任务带有完成状态，每名玩家一份，章节内容在所有会话间共享
+        self.battles = 0
+        self.battle_pending = False  # 同一时间只结算一场战斗
+        if player is not None:
+            self.player = player
+            return
+        if kingdom_name:
+            kingdom = Kingdom(kingdom_name, name, "紫色")  # 自立的势力只属于本会话，不加入共享世界
+        else:
+            if kingdom_index is None or not 0 <= kingdom_index < len(kingdoms):
+                kingdom_index = session_id % len(kingdoms)
+            kingdom = kingdoms[kingdom_index]
+        self.player = Player(
+            name=name,
+            kingdom=kingdom,
+            leadership=random.randint(70, 95),
+            strength=random.randint(70, 95),
+            intelligence=random.randint(70, 95),
+            politics=random.randint(70, 95),
+            charisma=random.randint(70, 95)
+        )
+        self.player.add_army(Army(
+            size=5000,
+            morale=80,
+            training=70,
+            primary_type=TroopType.INFANTRY,
+            secondary_type=TroopType.CAVALRY
+        ))
+
+    def status(self):
+        """玩家状态摘要"""
+        player = self.player
+        return {
+            "name": player.name,
+            "kingdom": player.kingdom.name,
+            "level": player.level,
+            "fame": player.fame,
+            "title": player.title,
+            "army_size": player.total_army_size(),
+            "battle_victories": player.battle_victories,
+            "chapter": self.story.current_chapter,
+            "quests": [quest.name for quest in player.quests],
+        }
+
+    def available_chapters(self):
+        """可进行的章节"""
+        return [{"index": index, "title": title} for index, title in self.story.get_available_chapters(self.player)]
+
+    def available_quests(self):
+        """可接取的任务"""
+        return [quest.name for quest in self.story.get_available_quests(self.player)]
+
+    def accept_quest(self, quest_index):
+        """接取任务，返回任务名"""
+        quest = self.story.assign_quest(self.player, quest_index)
+        return quest.name if quest else None
+
+    def completed_quests(self):
+        """检查并返回新完成的任务名"""
+        return [quest.name for quest in self.story.check_quest_completion(self.player)]
+
+    def recruit(self, amount, troop_type=TroopType.INFANTRY):
+        """用势力的资源招募新兵，新军队归玩家直接指挥
+
+        Returns:
+            Army: 新军队，资源不足时返回None
+        """
+        kingdom = self.player.kingdom
+        army = kingdom.recruit_troops(amount, troop_type)
+        if army is not None:
+            # 新军队只归玩家所有，不再留在势力的军队列表中
+            kingdom.remove_army(army)
+            self.player.add_army(army)
+        return army
+
+    def train(self, days):
+        """由玩家亲自训练所有军队，返回训练后的训练度"""
+        for army in self.player.armies:
+            army.train(days, self.player)
+        return [round(army.training, 1) for army in self.player.armies]
+
+    def rest(self, days):
+        """所有军队休整，返回休整后的疲劳度"""
+        for army in self.player.armies:
+            army.rest(days)
+        return [army.fatigue for army in self.player.armies]
+
+    def enemy_army(self):
+        """生成一支与玩家兵力相当的敌军"""
+        size = max(1000, int(self.player.total_army_size() * random.uniform(0.6, 1.1)))
+        return Army(size=size, morale=random.randint(60, 80), training=random.randint(50, 75),
+                    primary_type=random.choice(list(TroopType)[:6]))
+
+    def prepare_battle(self):
+        """准备一场与随机敌军的战斗，返回(载荷, 出战军队, 敌军)；没有可用军队时返回None
+
+        过度疲劳（战斗力为0）的军队不出战，需要先休整
+        """
+        armies = [army for army in self.player.armies if army.size > 0 and army.get_battle_power() > 0]
+        if not armies or self.battle_pending:
+            return None
+        enemy = self.enemy_army()
+        self.battle_pending = True
+        return battle_payload(armies, [enemy], [self.player]), armies, enemy
+
+    def finish_battle(self, result, armies, enemy):
+        """写回战斗结果并发放奖励，返回给客户端的摘要
+
+        Args:
+            armies: prepare_battle()返回的出战军队，与结果中的军队状态一一对应
+        """
+        apply_battle(result, armies, [enemy], [self.player])
+        self.battle_pending = False
+        self.battles += 1
+        won = result["winner"] == "attacker"
+        if won:
+            self.player.record_victory()
+            self.player.gain_fame(20 if result["is_decisive"] else 10)
+        return {
+            "won": won,
+            "draw": result["winner"] is None,
+            "casualties": result["attacker_casualties"],
+            "enemy_casualties": result["defender_casualties"],
+            "army_size": self.player.total_army_size(),
+            "log": result["log"],
+            "completed_quests": self.completed_quests(),
+        }
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+负载测试模块
+启动N个按脚本行动的机器人玩家：创建角色（与ThreeKingdomsGame.create_player相同，效忠三国之一或自立门户），
+然后每轮查看状态、推进一章剧情、招募、训练、休整和作战，按动作类型统计次数、每秒吞吐量和p50/p99延迟。
+被游戏规则拒绝的请求（如资源不足）计为拒绝，服务器内部异常计为错误并记录错误信息，两者分开统计，
+有错误时报告视为失败。
+
+机器人可以在本进程内直接调用服务器（local，不经过网络，只测游戏逻辑），
+也可以经本地TCP连接（socket，包含协议和网络开销）。每次运行的报告保存为JSON，
+--compare比较两份报告，用于评估修改前后的差异。
+
+命令行:
+    python -m modules.load_test --bots 1000 --rounds 3 --transport socket
+    python -m modules.load_test --compare profiles/load_test/修改前.json profiles/load_test/修改后.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter
+
+from modules.game_server import (ClientConnection, GameClient, GameServer, RequestError, encode, percentiles,
+                                 raise_file_limit)
+
+REPORT_DIR = os.path.join("profiles", "load_test")
+ACTIONS = ("create", "status", "chapter", "choose", "recruit", "train", "rest", "battle")
+ERROR_SAMPLES = 10  # 报告中保留的最常见错误信息数
+LOAD_STORY_SPEED = 50.0  # 剧情时钟倍速，机器人不必等待事件的显示间隔
+RECRUIT_TYPES = ("INFANTRY", "ARCHER", "SPEARMAN", "CAVALRY")
+RECRUIT_SIZES = (100, 200, 300)
+CONNECT_BATCH = 200  # 每批建立的连接数
+
+class LocalConnection(ClientConnection):
+    """进程内客户端在服务器一侧的连接，推送的剧情事件直接放入客户端的队列"""
+
+    def __init__(self, events):
+        super().__init__(None, None)
+        self.events = events
+
+    def send(self, message):
+        for event in message.get("events", ()):
+            self.events.put_nowait(event)
+
+    def close(self):
+        pass
+
+class LocalClient(GameClient):
+    """在本进程内直接调用服务器的客户端，请求和回复仍经过JSON编码"""
+
+    def __init__(self, server):
+        super().__init__()
+        self.server = server
+        self.connection = LocalConnection(self.events)
+
+    async def connect(self):
+        return self
+
+    async def request(self, cmd, **args):
+        started = time.perf_counter()
+        reply = await self.server.dispatch(self.connection, encode(dict(args, id=next(self._ids), cmd=cmd)))
+        message = json.loads(encode(reply))
+        elapsed = (time.perf_counter() - started) * 1000
+        self.connection.latencies.append(elapsed)
+        self.round_trips.append(elapsed)
+        if not message["ok"]:
+            raise RequestError.from_reply(message)
+        return message["data"]
+
+    async def close(self):
+        self.server.disconnect(self.connection)
+
+class Bot:
+    """按脚本行动的机器人玩家"""
+
+    def __init__(self, client, index, seed=0):
+        self.client = client
+        self.name = f"机器人{index}"
+        self.rng = random.Random(seed * 1000003 + index)
+        self.timings = {action: [] for action in ACTIONS}  # 动作 -> 延迟（毫秒）
+        self.rejected = dict.fromkeys(ACTIONS, 0)  # 被游戏规则拒绝的次数，如资源不足
+        self.errors = dict.fromkeys(ACTIONS, 0)  # 服务器内部异常的次数
+        self.error_messages = Counter()  # (动作, 错误信息) -> 次数
+
+    async def act(self, action, cmd, **args):
+        """发送一个请求并按动作类型计时，被拒绝或出错时返回None"""
+        started = time.perf_counter()
+        try:
+            return await self.client.request(cmd, **args)
+        except RequestError as e:
+            if e.internal:
+                self.errors[action] += 1
+                self.error_messages[(action, str(e))] += 1
+            else:
+                self.rejected[action] += 1
+            return None
+        finally:
+            self.timings[action].append((time.perf_counter() - started) * 1000)
+
+    async def create(self):
+        """创建角色：效忠三国之一，或自立门户"""
+        choice = self.rng.randint(1, 4)
+        if choice == 4:
+            return await self.act("create", "hello", name=self.name, new_kingdom=f"{self.name}军")
+        return await self.act("create", "hello", name=self.name, kingdom=choice - 1)
+
+    async def play_chapter(self):
+        """推进下一章剧情，遇到选项时随机选择，直到章节结束"""
+        if await self.act("chapter", "story") is None:
+            return False  # 没有可进行的章节
+        while True:
+            event = await self.client.next_event()
+            if event["type"] == "choices":
+                await self.act("choose", "choose", choice=self.rng.randint(1, len(event["choices"])))
+            elif event["type"] == "end":
+                return True
+
+    async def run(self, rounds):
+        await self.create()
+        for _ in range(rounds):
+            await self.act("status", "status")
+            await self.play_chapter()
+            await self.act("recruit", "recruit", amount=self.rng.choice(RECRUIT_SIZES),
+                           troop=self.rng.choice(RECRUIT_TYPES))
+            await self.act("train", "train", days=self.rng.randint(1, 10))
+            await self.act("rest", "rest", days=self.rng.randint(1, 5))
+            await self.act("battle", "battle")
+        return self
+
+def build_report(bots, seconds, config, failures):
+    """按动作类型汇总各机器人的计时"""
+    actions = {}
+    for action in ACTIONS:
+        values = [value for bot in bots for value in bot.timings[action]]
+        if not values:
+            continue
+        stats = percentiles(values, (50, 99))
+        actions[action] = {
+            "count": len(values),
+            "rejected": sum(bot.rejected[action] for bot in bots),
+            "errors": sum(bot.errors[action] for bot in bots),
+            "per_second": round(len(values) / seconds, 1) if seconds else 0.0,
+            "p50_ms": round(stats["p50"], 3),
+            "p99_ms": round(stats["p99"], 3),
+        }
+    requests = sum(stats["count"] for stats in actions.values())
+    messages = sum((bot.error_messages for bot in bots), Counter())
+    return {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "config": config,
+        "seconds": round(seconds, 2),
+        "requests": requests,
+        "per_second": round(requests / seconds, 1) if seconds else 0.0,
+        "failed_bots": failures,
+        "errors": sum(messages.values()),
+        "error_messages": [{"action": action, "error": error, "count": count}
+                           for (action, error), count in messages.most_common(ERROR_SAMPLES)],
+        "actions": actions,
+    }
+
+async def run_load(bots=100, rounds=3, transport="local", workers=None, seed=0, story_speed=LOAD_STORY_SPEED,
+                   world_path=None):
+    """启动服务器和机器人，全部机器人完成后返回报告
+
+    Args:
+        transport: local在本进程内直接调用服务器，socket经本地TCP连接
+        workers: 战斗进程数，None为CPU核数，0为不使用进程池
+        seed: 随机种子，相同种子时机器人的行动相同，便于比较多次运行
+        world_path: 共享世界的数据库路径，用于测量持久化的开销
+    """
+    random.seed(seed)  # 角色属性和敌军由服务器随机生成
+    server = GameServer(port=0, workers=workers, story_speed=story_speed, world_path=world_path)
+    await server.start(listen=transport == "socket")
+    try:
+        clients = []
+        for start in range(0, bots, CONNECT_BATCH):
+            if transport == "socket":
+                batch = [GameClient(server.host, server.port) for _ in range(start, min(bots, start + CONNECT_BATCH))]
+            else:
+                batch = [LocalClient(server) for _ in range(start, min(bots, start + CONNECT_BATCH))]
+            clients.extend(await asyncio.gather(*(client.connect() for client in batch)))
+        players = [Bot(client, index, seed) for index, client in enumerate(clients)]
+        started = time.perf_counter()
+        results = await asyncio.gather(*(bot.run(rounds) for bot in players), return_exceptions=True)
+        seconds = time.perf_counter() - started
+        await asyncio.gather(*(client.close() for client in clients))
+    finally:
+        await server.stop()
+    config = {"bots": bots, "rounds": rounds, "transport": transport, "workers": workers, "seed": seed,
+              "story_speed": story_speed, "world": bool(world_path)}
+    report = build_report(players, seconds, config, sum(1 for result in results if isinstance(result, Exception)))
+    report["server"] = server.latency_report()
+    return report
+
+def save_report(report, path=None):
+    """保存报告，默认按时间命名保存在profiles/load_test"""
+    if path is None:
+        path = os.path.join(REPORT_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+def load_report(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def format_report(report):
+    """报告的表格文字"""
+    config = report["config"]
+    lines = [
+        f"{config['bots']}个机器人 × {config['rounds']}轮 ({config['transport']})  "
+        f"耗时{report['seconds']}s  {report['per_second']}请求/s  失败机器人{report['failed_bots']}  "
+        f"服务器错误{report['errors']}",
+        f"{'动作':<10}{'次数':>8}{'拒绝':>8}{'错误':>8}{'每秒':>10}{'p50ms':>10}{'p99ms':>10}",
+    ]
+    for action, stats in report["actions"].items():
+        lines.append(f"{action:<10}{stats['count']:>8}{stats['rejected']:>8}{stats['errors']:>8}"
+                     f"{stats['per_second']:>10}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+    if report["error_messages"]:
+        lines.append("服务器错误:")
+        for sample in report["error_messages"]:
+            lines.append(f"  {sample['action']} ×{sample['count']}: {sample['error']}")
+    return "\n".join(lines)
+
+def compare_reports(before_path, after_path):
+    """打印两份报告按动作类型的对比"""
+    before, after = load_report(before_path), load_report(after_path)
+    if before["config"] != after["config"]:
+        print(f"注意: 两次运行的配置不同\n  {before['config']}\n  {after['config']}")
+    print(f"总吞吐量: {before['per_second']} -> {after['per_second']} 请求/s")
+    # 旧版报告没有区分拒绝和错误
+    print(f"服务器错误: {before.get('errors', '-')} -> {after.get('errors', '-')}  "
+          f"失败机器人: {before['failed_bots']} -> {after['failed_bots']}")
+    print(f"{'动作':<10}{'每秒':>20}{'p50ms':>20}{'p99ms':>20}")
+    for action in ACTIONS:
+        old, new = before["actions"].get(action), after["actions"].get(action)
+        if not old and not new:
+            continue
+
+        def cell(key, fmt):
+            values = [fmt.format(stats[key]) if stats else "-" for stats in (old, new)]
+            return " -> ".join(values)
+
+        print(f"{action:<10}{cell('per_second', '{:.1f}'):>20}{cell('p50_ms', '{:.2f}'):>20}"
+              f"{cell('p99_ms', '{:.2f}'):>20}")
+
+def main():
+    parser = argparse.ArgumentParser(description="三国霸业负载测试")
+    parser.add_argument("--bots", type=int, default=100, help="机器人数量")
+    parser.add_argument("--rounds", type=int, default=3, help="每个机器人进行的轮数")
+    parser.add_argument("--transport", choices=("local", "socket"), default="local")
+    parser.add_argument("--workers", type=int, default=None, help="战斗进程数，0表示不使用进程池")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--world", default=None, help="使用指定路径的世界数据库")
+    parser.add_argument("--out", default=None, help="报告保存路径")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="比较两份报告")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+    if args.transport == "socket":
+        raise_file_limit()
+    report = asyncio.run(run_load(args.bots, args.rounds, args.transport, args.workers, args.seed,
+                                  world_path=args.world))
+    print(format_report(report))
+    print(f"报告已保存: {save_report(report, args.out)}")
+    if report["failed_bots"] or report["errors"]:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+大规模会战模块
+Battle把每一方的军队合成一个战斗力，按兵力比例分摊伤亡，上千支军队的会战中没有哪支军队真正与特定的敌军交手，
+而且守方逐一检查与所有攻方军队的相克关系，耗时随军队数平方增长。
+
+这里每支军队部署在某条战线上的一个位置，每回合找离自己最近的敌军：远了就向它行进，
+进入射程（弓兵、弩兵更远）就按自身战斗力和兵种相克(TROOP_COUNTERS)对它造成伤亡。
+每回合把各战线的敌军按位置排序，每支军队用二分查找选定目标，一回合的耗时为O(n log n)。
+某条战线的敌军被肃清后，那里的军队转到最近的仍有敌军的战线。
+
+命令行:
+    python -m modules.mass_battle --armies 10 100 1000   # 与Battle比较不同规模下的耗时
+"""
+
+import argparse
+import math
+import random
+import time
+from bisect import bisect_left
+
+from models.army import Army, Terrain, TroopType, TROOP_COUNTERS
+from models.observer import notify_change
+from modules.battle import FORT_DEFENSE_FACTOR, Battle, BattleResult
+
+ARMIES_PER_FRONT = 50  # 未指定战线数时，每条战线部署的军队数
+ARMY_SPACING = 10  # 同一战线上相邻军队的间距
+LETHALITY = 0.1  # 每回合的伤亡 = 战斗力 × LETHALITY × 相克系数（战斗力约为兵力的一半）
+ROUT_MORALE = 20  # 士气低于此值的军队溃散，退出战斗
+
+# 各兵种每回合的行进距离和射程
+MARCH_SPEED = {TroopType.CAVALRY: 20}
+DEFAULT_SPEED = 10
+ATTACK_RANGE = {TroopType.ARCHER: 25, TroopType.CROSSBOWMAN: 30, TroopType.SIEGE: 30}
+DEFAULT_RANGE = 5
+
+# 兵种相克表，按兵种序号索引，避免交战时反复以枚举为键查字典
+TROOP_KINDS = {troop_type: kind for kind, troop_type in enumerate(TroopType)}
+COUNTER_TABLE = [[TROOP_COUNTERS.get(attacker, {}).get(defender, 1.0) for defender in TroopType]
+                 for attacker in TroopType]
+
+class BattleUnit:
+    """参战军队在会战中的状态"""
+
+    __slots__ = ("army", "general", "attacker", "front", "x", "kind", "speed", "reach", "power", "active", "rounds")
+
+    def __init__(self, army, general, attacker, front, x):
+        self.army = army
+        self.general = general  # 指挥该军的将领，可为None
+        self.attacker = attacker  # 是否属于进攻方
+        self.front = front  # 所在战线
+        self.x = x  # 在战线上的位置
+        self.kind = TROOP_KINDS[army.primary_type]  # 兵种序号，见COUNTER_TABLE
+        self.speed = MARCH_SPEED.get(army.primary_type, DEFAULT_SPEED)
+        self.reach = ATTACK_RANGE.get(army.primary_type, DEFAULT_RANGE)
+        self.power = 0.0  # 战斗力，受到伤亡后重新计算
+        self.active = army.size > 0  # 是否仍在战斗
+        self.rounds = 0  # 交战的回合数
+
+class MassBattle:
+    """多战线会战，每支军队与特定的敌军交战"""
+
+    def __init__(self, attacker_armies, defender_armies, attacker_generals=None, defender_generals=None,
+                 terrain=Terrain.PLAIN, fronts=None):
+        """
+        Args:
+            attacker_generals: 将领按顺序分配给各支军队，与Battle相同
+            fronts: 战线数，默认每ARMIES_PER_FRONT支军队一条战线；双方的军队按顺序均分到各条战线
+        """
+        self.attacker_armies = list(attacker_armies)
+        self.defender_armies = list(defender_armies)
+        self.attacker_generals = list(attacker_generals or [])
+        self.defender_generals = list(defender_generals or [])
+        self.terrain = terrain
+        if fronts is None:
+            fronts = max(1, math.ceil(max(len(self.attacker_armies), len(self.defender_armies)) / ARMIES_PER_FRONT))
+        self.fronts = fronts
+        self.battle_log = []
+        self.rounds = 0
+        self.attacker_casualties = 0
+        self.defender_casualties = 0
+        self.units = self._deploy(self.attacker_armies, self.attacker_generals, True)
+        self.units += self._deploy(self.defender_armies, self.defender_generals, False)
+        self.defense_factor = FORT_DEFENSE_FACTOR if terrain in (Terrain.FORT, Terrain.CITY) else 1.0
+        for unit in self.units:
+            self._update_power(unit)
+
+    def log(self, message):
+        """添加战斗日志"""
+        self.battle_log.append(message)
+
+    def _deploy(self, armies, generals, attacker):
+        """把军队按顺序均分到各条战线，同一战线上等距排开，双方的阵线宽度相同"""
+        units = []
+        count = len(armies)
+        for i, army in enumerate(armies):
+            front = i * self.fronts // count
+            first = -(-front * count // self.fronts)  # 该战线第一支军队的序号
+            last = -(-(front + 1) * count // self.fronts)
+            width = math.ceil(max(len(self.attacker_armies), len(self.defender_armies)) / self.fronts) * ARMY_SPACING
+            x = (i - first + 0.5) * width / (last - first)
+            general = generals[i] if i < len(generals) else None
+            units.append(BattleUnit(army, general, attacker, front, x))
+        return units
+
+    def _update_power(self, unit):
+        # 会战中只有兵力和士气会变化，战斗力只在受到伤亡后重新计算
+        unit.power = unit.army.get_battle_power(self.terrain, unit.general)
+        if not unit.attacker:
+            unit.power *= self.defense_factor
+
+    # ---- 回合 ----
+
+    def _index(self, attacker):
+        """某一方仍在战斗的军队，按战线分桶并按位置排序：战线 -> (位置列表, 军队列表)"""
+        buckets = {}
+        for unit in self.units:
+            if unit.active and unit.attacker == attacker:
+                buckets.setdefault(unit.front, []).append(unit)
+        index = {}
+        for front, units in buckets.items():
+            units.sort(key=lambda unit: unit.x)
+            index[front] = ([unit.x for unit in units], units)
+        return index
+
+    def _nearest(self, unit, index, fronts):
+        """离unit最近的敌军；本战线没有敌军时转到最近的有敌军的战线"""
+        if unit.front not in index:
+            position = bisect_left(fronts, unit.front)
+            candidates = fronts[max(0, position - 1):position + 1]
+            unit.front = min(candidates, key=lambda front: abs(front - unit.front))
+            return None  # 转移战线用去本回合
+        xs, units = index[unit.front]
+        position = bisect_left(xs, unit.x)
+        if position == len(xs) or (position > 0 and unit.x - xs[position - 1] <= xs[position] - unit.x):
+            position -= 1
+        return units[position]
+
+    def conduct_round(self):
+        """进行一个回合：选定目标、行进或交战，伤亡在回合结束时一起结算
+
+        Returns:
+            bool: 一方已没有可战斗的军队时返回True
+        """
+        indexes = {True: self._index(True), False: self._index(False)}
+        if not indexes[True] or not indexes[False]:
+            return True
+        fronts = {side: sorted(index) for side, index in indexes.items()}
+
+        damage = {}  # 目标 -> 本回合受到的伤亡
+        engagements = 0
+        for unit in self.units:
+            if not unit.active:
+                continue
+            enemy = not unit.attacker
+            target = self._nearest(unit, indexes[enemy], fronts[enemy])
+            if target is None:
+                continue
+            distance = target.x - unit.x
+            if abs(distance) > unit.reach:
+                # 向目标行进，进入射程后停下
+                step = min(unit.speed, abs(distance) - unit.reach)
+                unit.x += step if distance > 0 else -step
+                continue
+            damage[target] = damage.get(target, 0) + unit.power * LETHALITY * COUNTER_TABLE[unit.kind][target.kind]
+            unit.rounds += 1
+            engagements += 1
+
+        losses = {True: 0, False: 0}
+        for target, amount in damage.items():
+            army = target.army
+            casualties = min(army.size, max(1, round(amount)))
+            losses[target.attacker] += casualties
+            army.take_casualties(casualties)
+            if army.size <= 0 or army.morale < ROUT_MORALE:
+                target.active = False
+            else:
+                self._update_power(target)
+        self.attacker_casualties += losses[True]
+        self.defender_casualties += losses[False]
+        self.rounds += 1
+        self.log(f"第{self.rounds}回合: 交战{engagements}处，进攻方伤亡{losses[True]}，防守方伤亡{losses[False]}")
+        return not any(unit.active for unit in self.units if unit.attacker) or \
+            not any(unit.active for unit in self.units if not unit.attacker)
+
+    def simulate_battle(self, max_rounds=200):
+        """模拟整场会战，返回与Battle相同的BattleResult"""
+        attacker_size = sum(army.size for army in self.attacker_armies)
+        defender_size = sum(army.size for army in self.defender_armies)
+        self.log("===== 会战开始 =====")
+        self.log(f"地形: {self.terrain.value}，战线{self.fronts}条")
+        self.log(f"进攻方: {len(self.attacker_armies)}支军队，{attacker_size}人")
+        self.log(f"防守方: {len(self.defender_armies)}支军队，{defender_size}人")
+
+        while self.rounds < max_rounds:
+            if self.conduct_round():
+                break
+
+        attacker_active = sum(unit.army.size for unit in self.units if unit.attacker and unit.active)
+        defender_active = sum(unit.army.size for unit in self.units if not unit.attacker and unit.active)
+        if not attacker_active and defender_active:
+            winner, loser = "defender", "attacker"
+            is_decisive = defender_active >= defender_size * 0.6
+            fatigue = {False: 30}
+        elif not defender_active and attacker_active:
+            winner, loser = "attacker", "defender"
+            is_decisive = attacker_active >= attacker_size * 0.6
+            fatigue = {True: 30}
+        else:
+            winner = loser = None
+            is_decisive = False
+            fatigue = {True: 20, False: 20}
+
+        for unit in self.units:
+            army = unit.army
+            army.fatigue = min(100, army.fatigue + fatigue.get(unit.attacker, 0))
+            army.experience += unit.rounds
+            notify_change(army, "fatigue", "experience")
+        exp_gain = max(1, int((self.attacker_casualties + self.defender_casualties) / 200))
+        for general in self.attacker_generals + self.defender_generals:
+            general.gain_experience(exp_gain)
+
+        self.log("===== 会战结束 =====")
+        self.log({"attacker": "进攻方获胜！", "defender": "防守方获胜！"}.get(winner, "会战以平局结束！"))
+        self.log(f"进攻方伤亡: {self.attacker_casualties}")
+        self.log(f"防守方伤亡: {self.defender_casualties}")
+        return BattleResult(winner, loser, is_decisive, self.attacker_casualties, self.defender_casualties,
+                            self.battle_log)
+
+def _random_armies(count, rng):
+    types = list(TroopType)
+    return [Army(rng.randint(500, 5000), rng.randint(60, 90), rng.randint(40, 80), rng.choice(types))
+            for _ in range(count)]
+
+def benchmark_mass_battle(army_counts=(10, 100, 1000), seed=0):
+    """每方count支随机军队，分别用Battle和MassBattle结算，比较耗时"""
+    rows = []
+    for count in army_counts:
+        row = {"armies": count}
+        for label, engine in (("battle", Battle), ("mass_battle", MassBattle)):
+            rng = random.Random(seed)
+            attackers, defenders = _random_armies(count, rng), _random_armies(count, rng)
+            random.seed(seed)
+            if engine is Battle:
+                battle = Battle(attackers, defenders, dramatic_pauses=False)
+            else:
+                battle = MassBattle(attackers, defenders)
+            start = time.perf_counter()
+            result = battle.simulate_battle()
+            row[label] = {
+                "seconds": time.perf_counter() - start,
+                "winner": result.winner,
+                "attacker_casualties": result.attacker_casualties,
+                "defender_casualties": result.defender_casualties,
+            }
+        rows.append(row)
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="大规模会战性能测试")
+    parser.add_argument("--armies", type=int, nargs="+", default=[10, 100, 1000], help="每方军队数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'每方军队':>8} {'Battle':>10} {'MassBattle':>12} {'MassBattle胜方':>14} {'伤亡(攻/守)':>16}")
+    for row in benchmark_mass_battle(args.armies, args.seed):
+        old, new = row["battle"], row["mass_battle"]
+        print(f"{row['armies']:>8} {old['seconds'] * 1000:>8.1f}ms {new['seconds'] * 1000:>10.1f}ms "
+              f"{str(new['winner']):>14} {new['attacker_casualties']:>8}/{new['defender_casualties']}")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+任务触发模块
+任务用QuestTrigger声明完成条件（某项数值 >= 阈值），QuestTracker按监视的数值分组，
+每组按阈值排序保存。模型变化经observer通知后只把受影响的数值标记为待检查，
+检查时每个数值只读取一次，再用二分查找取出所有已达到阈值的任务，
+因此检查开销只与发生变化的数值和完成的任务数有关，而与任务总数无关。
+"""
+
+from bisect import bisect_right
+
+from models.army import Army
+from models.observer import add_listener, remove_listener
+
+# 可监视的数值及其读取方式
+STAT_READERS = {
+    "army_size": lambda player: player.total_army_size(),
+    "max_training": lambda player: max((army.training for army in player.armies), default=0),
+    "battle_victories": lambda player: player.battle_victories,
+    "fame": lambda player: player.fame,
+    "city_count": lambda player: len(player.kingdom.cities) if player.kingdom else 0,
+    "general_count": lambda player: len(player.kingdom.generals) if player.kingdom else 0,
+    "alliance_count": lambda player: len(player.kingdom.alliances) if player.kingdom else 0,
+}
+
+# 实体类型 -> {变化的字段: 受影响的数值}
+WATCHED_FIELDS = {
+    "Player": {
+        "armies": ("army_size", "max_training"),
+        "battle_victories": ("battle_victories",),
+        "fame": ("fame",),
+    },
+    "Army": {
+        "size": ("army_size",),
+        "training": ("max_training",),
+    },
+    "Kingdom": {
+        "cities": ("city_count",),
+        "generals": ("general_count",),
+        "alliances": ("alliance_count",),
+    },
+}
+
+class QuestTrigger:
+    """任务条件：指定数值达到阈值"""
+
+    def __init__(self, stat, threshold):
+        if stat not in STAT_READERS:
+            raise ValueError(f"未知的任务条件: {stat}")
+        self.stat = stat  # 监视的数值
+        self.threshold = threshold  # 阈值
+
+    def __repr__(self):
+        return f"QuestTrigger({self.stat!r}, {self.threshold!r})"
+
+    def value(self, player):
+        """读取玩家当前的数值"""
+        return STAT_READERS[self.stat](player)
+
+    def is_met(self, player):
+        """条件是否已满足"""
+        return self.value(player) >= self.threshold
+
+class QuestTracker:
+    """跟踪一名玩家的进行中任务，按变化通知检查完成情况"""
+
+    def __init__(self, player):
+        self.player = player
+        self._thresholds = {}  # 数值 -> 升序的阈值列表
+        self._quests = {}  # 数值 -> 与阈值列表一一对应的任务
+        self._dirty = set()  # 发生变化、待检查的数值
+        self._attached = False
+        self._subscribed = []  # 已订阅的实体：玩家、所属势力和各支军队
+
+    def attach(self):
+        """订阅玩家、所属势力和军队的变化通知
+
+        只按实体订阅，其他玩家的变化不会调用本跟踪器，在线玩家很多时通知开销不随玩家数增长
+        """
+        if not self._attached:
+            self._attached = True
+            self._subscribe()
+
+    def detach(self):
+        """取消订阅"""
+        if self._attached:
+            for entity in self._subscribed:
+                remove_listener(self.on_change, entity)
+            self._subscribed = []
+            self._attached = False
+
+    def _subscribe(self):
+        """按玩家当前的势力和军队更新订阅"""
+        player = self.player
+        entities = [player] + ([player.kingdom] if player.kingdom else []) + list(player.armies)
+        for entity in self._subscribed:
+            if not any(entity is current for current in entities):
+                remove_listener(self.on_change, entity)
+        for entity in entities:
+            add_listener(self.on_change, entity)
+        self._subscribed = entities
+
+    def add_quest(self, quest):
+        """开始跟踪任务，没有触发条件的任务需要手动完成"""
+        trigger = quest.trigger
+        if trigger is None:
+            return False
+        thresholds = self._thresholds.setdefault(trigger.stat, [])
+        position = bisect_right(thresholds, trigger.threshold)
+        thresholds.insert(position, trigger.threshold)
+        self._quests.setdefault(trigger.stat, []).insert(position, quest)
+        # 接受任务时条件可能已经满足
+        self._dirty.add(trigger.stat)
+        return True
+
+    def remove_quest(self, quest):
+        """停止跟踪任务"""
+        trigger = quest.trigger
+        quests = self._quests.get(trigger.stat, []) if trigger else []
+        if quest not in quests:
+            return False
+        position = quests.index(quest)
+        del quests[position]
+        del self._thresholds[trigger.stat][position]
+        return True
+
+    def tracked_count(self):
+        """正在跟踪的任务数"""
+        return sum(len(quests) for quests in self._quests.values())
+
+    def _is_relevant(self, entity):
+        player = self.player
+        if entity is player or entity is player.kingdom:
+            return True
+        return isinstance(entity, Army) and entity in player.armies
+
+    def on_change(self, entity, fields):
+        """observer回调：只标记受影响且有任务在等待的数值"""
+        watched = WATCHED_FIELDS.get(type(entity).__name__)
+        if not watched or not self._is_relevant(entity):
+            return
+        if entity is self.player and (not fields or "armies" in fields):
+            self._subscribe()  # 军队或势力有变化
+        if fields:
+            stats = [stat for field in fields for stat in watched.get(field, ())]
+        else:
+            stats = [stat for field_stats in watched.values() for stat in field_stats]
+        for stat in stats:
+            if self._thresholds.get(stat):
+                self._dirty.add(stat)
+
+    def collect_completed(self):
+        """完成所有已达成条件的任务
+
+        完成任务获得的声望等奖励会再次触发通知，循环直到没有待检查的数值
+
+        Returns:
+            list: 本次完成的任务
+        """
+        completed = []
+        while self._dirty:
+            stat = self._dirty.pop()
+            thresholds = self._thresholds.get(stat)
+            if not thresholds:
+                continue
+            count = bisect_right(thresholds, STAT_READERS[stat](self.player))
+            if not count:
+                continue
+            ready = self._quests[stat][:count]
+            del self._quests[stat][:count]
+            del thresholds[:count]
+            for quest in ready:
+                if self.player.complete_quest(quest):
+                    quest.completed = True
+                    completed.append(quest)
+        return completed
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+将领名册模块
+为将领列表界面提供虚拟化的列表模型：按各项属性维护有序索引，按势力和技能维护分组，
+翻页时只取出当前页的将领。将领属性变化经observer通知后只调整该将领在索引中的位置，
+不必每帧重新排序整个名册。
+"""
+
+from bisect import bisect_left
+from itertools import count
+from operator import attrgetter
+
+from models.general import General
+from models.observer import add_listener, remove_listener
+
+# 可排序的字段及其取值方式
+SORT_KEYS = {
+    "leadership": attrgetter("leadership"),
+    "strength": attrgetter("strength"),
+    "intelligence": attrgetter("intelligence"),
+    "politics": attrgetter("politics"),
+    "charisma": attrgetter("charisma"),
+    "battle_power": General.calculate_battle_power,
+}
+
+SORT_NAMES = {
+    "leadership": "统率",
+    "strength": "武力",
+    "intelligence": "智力",
+    "politics": "政治",
+    "charisma": "魅力",
+    "battle_power": "战斗力",
+}
+
+# 将领的字段变化 -> 受影响的排序
+AFFECTED_SORTS = {
+    "leadership": ("leadership", "battle_power"),
+    "strength": ("strength", "battle_power"),
+    "intelligence": ("intelligence", "battle_power"),
+    "politics": ("politics", "battle_power"),
+    "charisma": ("charisma", "battle_power"),
+    "level": ("battle_power",),
+    "skills": ("battle_power",),
+}
+FILTER_FIELDS = ("kingdom_name", "skills")
+ORDER_SPAN = 1 << 32  # 索引键中加入顺序所占的范围
+
+class GeneralRoster:
+    """将领名册，按需建立排序索引，只物化可见的行"""
+
+    def __init__(self, generals=()):
+        self._sequence = count()
+        self._members = {}  # id -> 将领
+        self._order = {}  # id -> 加入名册的序号，用于相同属性值时保持稳定顺序
+        self._indexes = {}  # 排序字段 -> (升序的索引键列表, 对应的将领列表)
+        self._keys = {}  # 排序字段 -> {id: 当前索引键}
+        self._by_kingdom = {}  # 势力名 -> 将领id集合
+        self._by_skill = {}  # 技能 -> 将领id集合
+        self._filed = {}  # id -> (势力名, 技能元组)，用于从旧分组中移除
+        self._stale = {}  # id -> 需要调整位置的排序字段集合
+        self._views = {}  # (排序字段, 势力, 技能) -> 过滤后的将领列表
+        self._source = None  # 最近一次同步的列表
+        self._source_size = 0
+        self._attached = False
+        self.version = 0  # 名册内容或顺序变化时递增
+        for general in generals:
+            self.add(general)
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, general):
+        return id(general) in self._members
+
+    def attach(self):
+        """订阅模型变化通知"""
+        if not self._attached:
+            add_listener(self.on_change)
+            self._attached = True
+
+    def detach(self):
+        """取消订阅"""
+        if self._attached:
+            remove_listener(self.on_change)
+            self._attached = False
+
+    # ---- 成员 ----
+
+    def add(self, general):
+        """加入将领"""
+        key = id(general)
+        if key in self._members:
+            return False
+        self._members[key] = general
+        self._order[key] = next(self._sequence)
+        for sort_key in self._indexes:
+            self._insert(sort_key, general, self._index_key(sort_key, general))
+        self._file(general)
+        self._changed()
+        return True
+
+    def remove(self, general):
+        """移出将领"""
+        key = id(general)
+        if key not in self._members:
+            return False
+        for sort_key in self._indexes:
+            self._delete(sort_key, self._keys[sort_key].pop(key))
+        self._unfile(key)
+        self._stale.pop(key, None)
+        del self._members[key]
+        del self._order[key]
+        self._changed()
+        return True
+
+    def sync(self, generals):
+        """与将领列表同步成员
+
+        列表对象和长度都没变时直接返回，因此可以每帧调用
+        """
+        if generals is self._source and len(generals) == self._source_size:
+            return False
+        self._source = generals
+        self._source_size = len(generals)
+        current = {id(general): general for general in generals}
+        if current.keys() == self._members.keys():
+            return False
+        for key in [key for key in self._members if key not in current]:
+            self.remove(self._members[key])
+        for general in generals:
+            self.add(general)
+        return True
+
+    # ---- 索引 ----
+
+    def _index_key(self, sort_key, general):
+        # 降序排列：属性取负，相同时按加入顺序；合成一个整数，排序时比元组快得多
+        return -int(SORT_KEYS[sort_key](general)) * ORDER_SPAN + self._order[id(general)]
+
+    def _build_index(self, sort_key):
+        value, order = SORT_KEYS[sort_key], self._order
+        keys = {key: -int(value(general)) * ORDER_SPAN + order[key] for key, general in self._members.items()}
+        ordered = sorted(keys, key=keys.__getitem__)
+        self._keys[sort_key] = keys
+        self._indexes[sort_key] = ([keys[key] for key in ordered], [self._members[key] for key in ordered])
+
+    def _insert(self, sort_key, general, entry):
+        keys, generals = self._indexes[sort_key]
+        position = bisect_left(keys, entry)
+        keys.insert(position, entry)
+        generals.insert(position, general)
+        self._keys[sort_key][id(general)] = entry
+
+    def _delete(self, sort_key, entry):
+        keys, generals = self._indexes[sort_key]
+        position = bisect_left(keys, entry)
+        del keys[position]
+        del generals[position]
+
+    def _file(self, general):
+        key = id(general)
+        skills = tuple(general.skills)
+        self._filed[key] = (general.kingdom_name, skills)
+        self._by_kingdom.setdefault(general.kingdom_name, set()).add(key)
+        for skill in skills:
+            self._by_skill.setdefault(skill, set()).add(key)
+
+    def _unfile(self, key):
+        kingdom_name, skills = self._filed.pop(key)
+        self._by_kingdom[kingdom_name].discard(key)
+        for skill in skills:
+            self._by_skill[skill].discard(key)
+
+    def _changed(self):
+        self.version += 1
+        self._views.clear()
+
+    def on_change(self, entity, fields):
+        """observer回调：记录需要调整位置的将领，在下次查询时处理"""
+        if not isinstance(entity, General) or id(entity) not in self._members:
+            return
+        key = id(entity)
+        if not fields:
+            fields = tuple(AFFECTED_SORTS) + FILTER_FIELDS
+        stale = self._stale.setdefault(key, set())
+        for field in fields:
+            stale.update(AFFECTED_SORTS.get(field, ()))
+            if field in FILTER_FIELDS:
+                stale.add(field)
+        if not stale:
+            del self._stale[key]
+
+    def refresh(self):
+        """调整发生变化的将领在索引和分组中的位置"""
+        if not self._stale:
+            return False
+        for key, fields in self._stale.items():
+            general = self._members[key]
+            for sort_key in fields & self._indexes.keys():
+                entry = self._index_key(sort_key, general)
+                old_entry = self._keys[sort_key][key]
+                if entry == old_entry:
+                    continue
+                self._delete(sort_key, old_entry)
+                self._insert(sort_key, general, entry)
+            if fields.intersection(FILTER_FIELDS):
+                self._unfile(key)
+                self._file(general)
+        self._stale.clear()
+        self._changed()
+        return True
+
+    # ---- 查询 ----
+
+    def ordered(self, sort_key="battle_power", kingdom_name=None, skill=None):
+        """按属性降序、经过过滤的将领列表（结果会被缓存到名册再次变化为止）"""
+        if sort_key not in SORT_KEYS:
+            raise ValueError(f"未知的排序字段: {sort_key}")
+        self.refresh()
+        view_key = (sort_key, kingdom_name, skill)
+        view = self._views.get(view_key)
+        if view is not None:
+            return view
+
+        if sort_key not in self._indexes:
+            self._build_index(sort_key)
+        generals = self._indexes[sort_key][1]
+        if kingdom_name is None and skill is None:
+            view = list(generals)
+        else:
+            # 先求过滤条件的交集，再按索引顺序单次扫描
+            allowed = None
+            if kingdom_name is not None:
+                allowed = self._by_kingdom.get(kingdom_name, set())
+            if skill is not None:
+                skilled = self._by_skill.get(skill, set())
+                allowed = skilled if allowed is None else allowed & skilled
+            if len(allowed) * 8 < len(generals):
+                # 匹配很少时直接排序匹配项，不扫描整个索引
+                keys = self._keys[sort_key]
+                view = [self._members[key] for key in sorted(allowed, key=keys.__getitem__)]
+            else:
+                view = [general for general in generals if id(general) in allowed]
+        self._views[view_key] = view
+        return view
+
+    def count(self, sort_key="battle_power", kingdom_name=None, skill=None):
+        """满足过滤条件的将领数"""
+        if kingdom_name is None and skill is None:
+            return len(self._members)
+        return len(self.ordered(sort_key, kingdom_name, skill))
+
+    def page(self, page, per_page, sort_key="battle_power", kingdom_name=None, skill=None):
+        """取出指定页的将领，只物化这一页"""
+        start = page * per_page
+        if kingdom_name is None and skill is None:
+            self.refresh()
+            if sort_key not in self._indexes:
+                self._build_index(sort_key)
+            return self._indexes[sort_key][1][start:start + per_page]
+        return self.ordered(sort_key, kingdom_name, skill)[start:start + per_page]
+
+    def page_count(self, per_page, sort_key="battle_power", kingdom_name=None, skill=None):
+        """总页数，至少为1"""
+        total = self.count(sort_key, kingdom_name, skill)
+        return max(1, (total + per_page - 1) // per_page)
+
+    def kingdoms(self):
+        """名册中出现的势力名"""
+        return sorted(name for name, members in self._by_kingdom.items() if members)
+
+    def skills(self):
+        """名册中出现的技能"""
+        return [skill for skill, members in self._by_skill.items() if members]
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+增量存档日志模块
+以"完整快照 + 追加式变更日志"的方式保存游戏世界：
+模型通过models.observer通知变更，日志只记录发生变化的实体字段，
+自动存档时批量写入并fsync一次，日志过长时压缩为新的快照。
+读档时先加载快照，再按顺序回放日志。
+"""
+
+import json
+import os
+from enum import Enum
+
+from models.army import Army, TroopType, Terrain, reserve_army_id
+from models.city import City, Building
+from models.general import General, Skill
+from models.kingdom import Kingdom
+from models.player import Player
+from models.observer import add_listener, remove_listener
+
+SNAPSHOT_FILE = "snapshot.json"  # 快照文件名
+JOURNAL_FILE = "journal-{}.log"  # 日志文件名，按快照代数区分
+
+# 各类实体需要存档的字段
+GENERAL_FIELDS = (
+    "name", "kingdom_name", "leadership", "strength", "intelligence", "politics", "charisma",
+    "image_path", "level", "experience", "loyalty", "skills", "equipment", "troops_bonus",
+)
+
+SAVE_FIELDS = {
+    "General": GENERAL_FIELDS,
+    "Player": GENERAL_FIELDS + ("kingdom", "armies", "fame", "achievement_points", "title", "items",
+                                 "battle_victories"),
+    "Army": (
+        "army_id", "size", "morale", "training", "primary_type", "secondary_type", "secondary_ratio",
+        "food", "equipment_level", "fatigue", "experience",
+    ),
+    "City": (
+        "name", "population", "prosperity", "farms", "mines", "forts", "region", "owner", "governor",
+        "garrison", "loyalty", "tax_rate", "growth_rate", "buildings", "production",
+    ),
+    "Kingdom": (
+        "name", "leader_name", "color", "cities", "generals", "armies", "resources", "relations",
+        "alliances", "wars", "tech_level", "population", "reputation",
+    ),
+}
+
+ENTITY_CLASSES = {
+    "General": General,
+    "Player": Player,
+    "Army": Army,
+    "City": City,
+    "Kingdom": Kingdom,
+}
+
+ENUM_CLASSES = {
+    "TroopType": TroopType,
+    "Terrain": Terrain,
+    "Skill": Skill,
+}
+
+# 不参与存档或旧存档中没有、读档时需要补齐默认值的字段
+RESTORE_DEFAULTS = {
+    "Player": {"quests": list, "completed_quests": list, "battle_victories": int},
+}
+
+
+def entity_key(entity):
+    """返回实体的存档键，非存档实体返回None"""
+    cls_name = type(entity).__name__
+    if ENTITY_CLASSES.get(cls_name) is not type(entity):
+        return None
+    if cls_name == "Army":
+        return f"Army:{entity.army_id}"
+    return f"{cls_name}:{entity.name}"
+
+
+def encode_value(value, on_ref=None):
+    """把字段值编码为可JSON序列化的数据，引用的实体编码为存档键"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Enum):
+        return {"$enum": type(value).__name__, "v": value.name}
+    key = entity_key(value)
+    if key is not None:
+        if on_ref:
+            on_ref(value)
+        return {"$ref": key}
+    if isinstance(value, Building):
+        return {"$building": {name: encode_value(v, on_ref) for name, v in vars(value).items()}}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(v, on_ref) for v in value]
+    if isinstance(value, dict):
+        return {"$dict": [[encode_value(k, on_ref), encode_value(v, on_ref)] for k, v in value.items()]}
+    raise TypeError(f"无法存档的数据类型: {type(value).__name__}")
+
+
+def decode_value(data, resolve):
+    """解码encode_value的结果，resolve负责把存档键还原为实体"""
+    if isinstance(data, list):
+        return [decode_value(v, resolve) for v in data]
+    if isinstance(data, dict):
+        if "$ref" in data:
+            return resolve(data["$ref"])
+        if "$enum" in data:
+            return ENUM_CLASSES[data["$enum"]][data["v"]]
+        if "$building" in data:
+            building = Building.__new__(Building)
+            building.__dict__.update({name: decode_value(v, resolve) for name, v in data["$building"].items()})
+            return building
+        if "$dict" in data:
+            return {decode_value(k, resolve): decode_value(v, resolve) for k, v in data["$dict"]}
+    return data
+
+
+def encode_entity(entity, fields=None, on_ref=None):
+    """编码实体的指定字段，fields为None时编码全部存档字段"""
+    save_fields = SAVE_FIELDS[type(entity).__name__]
+    if fields is None:
+        fields = save_fields
+    return {
+        field: encode_value(getattr(entity, field), on_ref)
+        for field in fields
+        if field in save_fields and hasattr(entity, field)
+    }
+
+
+def build_snapshot(roots):
+    """从根实体出发收集所有可达实体，生成完整快照"""
+    entities = {}
+    queue = list(roots)
+    while queue:
+        entity = queue.pop()
+        key = entity_key(entity)
+        if key in entities:
+            continue
+        entities[key] = encode_entity(entity, None, queue.append)
+    return {"roots": [entity_key(root) for root in roots], "entities": entities}
+
+
+def _write_atomic(path, text):
+    """先写临时文件再替换，保证快照文件要么是旧的要么是完整的新文件"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class _EntityRegistry:
+    """读档时的实体表，按存档键创建并填充实体"""
+
+    def __init__(self):
+        self.entities = {}
+
+    def resolve(self, key):
+        """获取存档键对应的实体，不存在则先创建空实体"""
+        entity = self.entities.get(key)
+        if entity is None:
+            cls = ENTITY_CLASSES[key.split(":", 1)[0]]
+            entity = cls.__new__(cls)
+            self.entities[key] = entity
+        return entity
+
+    def apply(self, key, fields):
+        """把一组字段值写入实体"""
+        entity = self.resolve(key)
+        for field, value in fields.items():
+            setattr(entity, field, decode_value(value, self.resolve))
+
+    def finish(self):
+        """补齐未存档字段，并登记已使用的军队编号"""
+        for entity in self.entities.values():
+            for field, factory in RESTORE_DEFAULTS.get(type(entity).__name__, {}).items():
+                if not hasattr(entity, field):
+                    setattr(entity, field, factory())
+            if isinstance(entity, Army):
+                reserve_army_id(entity.army_id)
+
+
+def read_generation(directory):
+    """读取存档目录中快照的代数，没有快照时返回0"""
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("generation", 0)
+
+
+def recover_world(directory):
+    """从快照和日志恢复游戏世界
+
+    Args:
+        directory: 存档目录
+
+    Returns:
+        list: 按存档时顺序排列的根实体
+    """
+    with open(os.path.join(directory, SNAPSHOT_FILE), encoding="utf-8") as f:
+        snapshot = json.load(f)
+
+    registry = _EntityRegistry()
+    for key, fields in snapshot["entities"].items():
+        registry.apply(key, fields)
+
+    journal_path = os.path.join(directory, JOURNAL_FILE.format(snapshot.get("generation", 0)))
+    if os.path.exists(journal_path):
+        with open(journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # 最后一行可能因崩溃而不完整，之后的内容全部忽略
+                registry.apply(record["k"], record["f"])
+
+    registry.finish()
+    return [registry.resolve(key) for key in snapshot["roots"]]
+
+
+class SaveJournal:
+    """增量存档日志，自动存档的开销只与变更数量有关，与世界规模无关"""
+
+    def __init__(self, directory, compact_threshold=5000):
+        self.directory = directory  # 存档目录
+        self.compact_threshold = compact_threshold  # 日志记录数达到该值时压缩为快照
+        self.roots = []  # 世界的根实体（各势力和玩家）
+        self.generation = 0  # 快照代数
+        self.records_since_snapshot = 0  # 当前日志中的记录数
+
+        self._pending = {}  # 存档键 -> [实体, 变化字段集合]，字段集合为None表示全部字段
+        self._known = set()  # 已写入快照或日志的实体
+        self._journal_file = None
+        self.attached = False
+
+    def attach(self, roots):
+        """开始跟踪世界变化，并写入一份初始快照"""
+        self.roots = list(roots)
+        os.makedirs(self.directory, exist_ok=True)
+        self.generation = read_generation(self.directory)
+        self.compact()
+
+        add_listener(self.record)
+        self.attached = True
+
+    def detach(self):
+        """停止跟踪并写入尚未保存的变更"""
+        if not self.attached:
+            return
+        self.autosave()
+        remove_listener(self.record)
+        self._journal_file.close()
+        self._journal_file = None
+        self.attached = False
+
+    def record(self, entity, fields):
+        """记录实体变更（models.observer回调），只合并到待写集合，不做IO"""
+        key = entity_key(entity)
+        if key is None:
+            return
+
+        entry = self._pending.get(key)
+        if entry is None:
+            self._pending[key] = [entity, set(fields) if fields else None]
+        elif entry[1] is not None:
+            if fields:
+                entry[1].update(fields)
+            else:
+                entry[1] = None
+
+    def autosave(self):
+        """把累积的变更批量写入日志并fsync一次
+
+        Returns:
+            int: 写入的记录数
+        """
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, {}
+
+        # 已存档实体直接写增量；新实体只有被已存档实体引用时才整体写入，
+        # 战斗演示等临时创建的对象因此不会进入存档
+        queue = [(key, entity, fields) for key, (entity, fields) in pending.items() if key in self._known]
+
+        def on_ref(entity):
+            key = entity_key(entity)
+            if key not in self._known:
+                self._known.add(key)
+                queue.append((key, entity, None))
+
+        lines = []
+        while queue:
+            key, entity, fields = queue.pop()
+            record = {"k": key, "f": encode_entity(entity, fields, on_ref)}
+            lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+
+        if not lines:
+            return 0
+
+        self._journal_file.write("\n".join(lines) + "\n")
+        self._journal_file.flush()
+        os.fsync(self._journal_file.fileno())
+        self.records_since_snapshot += len(lines)
+
+        if self.records_since_snapshot >= self.compact_threshold:
+            self.compact()
+
+        return len(lines)
+
+    def compact(self):
+        """把当前世界写成新快照，并切换到新的空日志"""
+        snapshot = build_snapshot(self.roots)
+        snapshot["generation"] = self.generation + 1
+        _write_atomic(
+            os.path.join(self.directory, SNAPSHOT_FILE),
+            json.dumps(snapshot, ensure_ascii=False, separators=(",", ":"))
+        )
+
+        # 新快照落盘后旧日志才可以删除
+        old_journal = os.path.join(self.directory, JOURNAL_FILE.format(self.generation))
+        if self._journal_file:
+            self._journal_file.close()
+        if os.path.exists(old_journal):
+            os.remove(old_journal)
+
+        self.generation = snapshot["generation"]
+        self._journal_file = open(
+            os.path.join(self.directory, JOURNAL_FILE.format(self.generation)), "a", encoding="utf-8"
+        )
+        self._known = set(snapshot["entities"])
+        self._pending.clear()
+        self.records_since_snapshot = 0
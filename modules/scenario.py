@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+剧本包加载模块
+剧本以JSON或YAML编写，包含势力、将领、城市和剧情章节。
+首次加载时校验并编译为二进制缓存（将领和城市编译为data_tables数据表，
+其余部分用marshal保存），缓存以剧本内容的哈希命名；
+之后启动时只计算哈希并直接读取缓存，不再解析源文件。
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import time
+
+from models.army import TroopType
+from models.general import Skill
+from modules.data_tables import GameDataTables, compile_tables
+from modules.story import EFFECT_TYPES, EFFECT_FIELDS, NUMBER
+
+CACHE_FORMAT = 2  # 缓存格式版本，修改编译逻辑时递增使旧缓存失效
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "cache", "scenarios"
+)
+
+STATS = ("leadership", "strength", "intelligence", "politics", "charisma")
+CITY_FIELDS = ("population", "prosperity", "farms", "mines", "forts")
+
+class ScenarioError(ValueError):
+    """剧本内容不合法"""
+
+    def __init__(self, path, errors):
+        self.path = path
+        self.errors = errors
+        super().__init__(f"剧本{path}校验失败:\n" + "\n".join(f"- {error}" for error in errors))
+
+class Scenario:
+    """加载完成的剧本"""
+
+    def __init__(self, name, tables, kingdoms, city_owners, chapters, timing):
+        self.name = name  # 剧本名称
+        self.tables = tables  # 将领和城市数据表
+        self.kingdoms = kingdoms  # 势力定义列表
+        self.city_owners = city_owners  # [(城市行号, 势力名)]，开局即有归属的城市
+        self.chapters = chapters  # 章节数据列表
+        self.timing = timing  # 加载耗时统计
+
+def read_source(path, raw=None):
+    """解析JSON或YAML剧本文件"""
+    if raw is None:
+        with open(path, "rb") as f:
+            raw = f.read()
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("加载YAML剧本需要安装PyYAML: pip install pyyaml")
+        return yaml.safe_load(raw.decode("utf-8"))
+    return json.loads(raw.decode("utf-8"))
+
+def _check_int(errors, where, data, field, minimum=0, maximum=65535):
+    value = data.get(field)
+    if not isinstance(value, int) or isinstance(value, bool) or not minimum <= value <= maximum:
+        errors.append(f"{where}的{field}必须是{minimum}到{maximum}之间的整数")
+
+def _has_type(value, kind):
+    return isinstance(value, kind) and not isinstance(value, bool)
+
+def _entries(errors, where, value):
+    """产出列表中的(序号, 对象)，列表或条目类型不对时记录错误"""
+    if not isinstance(value, list):
+        errors.append(f"{where}必须是列表")
+        return
+    for i, entry in enumerate(value):
+        if isinstance(entry, dict):
+            yield i, entry
+        else:
+            errors.append(f"{where}[{i}]必须是对象")
+
+def _check_effect(errors, where, effect):
+    effect_type = effect.get("type")
+    if effect_type not in EFFECT_TYPES:
+        errors.append(f"{where}未知效果类型: {effect_type}")
+        return
+    if effect_type == "fame":
+        kind = NUMBER
+    else:
+        name = effect.get("name")
+        kind = EFFECT_FIELDS[effect_type].get(name) if isinstance(name, str) else None
+        if kind is None:
+            errors.append(f"{where}的{effect_type}效果不能修改属性: {name}")
+            return
+    field = "value" if effect_type == "set" else "amount"
+    if not _has_type(effect.get(field), kind):
+        expected = "字符串" if kind is str else "数值"
+        errors.append(f"{where}的{field}必须是{expected}")
+
+def validate_scenario(data):
+    """校验剧本结构，返回错误信息列表"""
+    errors = []
+    if not isinstance(data, dict):
+        return ["剧本顶层必须是对象"]
+
+    kingdom_names = set()
+    for i, kingdom in _entries(errors, "kingdoms", data.get("kingdoms", [])):
+        where = f"kingdoms[{i}]"
+        for field in ("name", "leader", "color"):
+            if not isinstance(kingdom.get(field), str) or not kingdom.get(field):
+                errors.append(f"{where}缺少{field}")
+        name = kingdom.get("name")
+        if isinstance(name, str):  # 其他类型已在上面报告，且可能无法放入集合
+            if name in kingdom_names:
+                errors.append(f"{where}势力名重复: {name}")
+            kingdom_names.add(name)
+
+    skill_names = {skill.value for skill in Skill}
+    troop_names = {troop.value for troop in TroopType}
+    general_names = set()
+    for i, general in _entries(errors, "generals", data.get("generals", [])):
+        where = f"generals[{i}]"
+        if not isinstance(general.get("name"), str) or not general.get("name"):
+            errors.append(f"{where}缺少name")
+        elif general["name"] in general_names:
+            errors.append(f"{where}将领重名: {general['name']}")
+        else:
+            general_names.add(general["name"])
+        for stat in STATS:
+            _check_int(errors, where, general, stat)
+        skills = general.get("skills", [])
+        if not isinstance(skills, list):
+            errors.append(f"{where}的skills必须是列表")
+            skills = []
+        for skill in skills:
+            if not isinstance(skill, str) or skill not in skill_names:
+                errors.append(f"{where}未知技能: {skill}")
+        troops_bonus = general.get("troops_bonus", {})
+        if not isinstance(troops_bonus, dict):
+            errors.append(f"{where}的troops_bonus必须是对象")
+            troops_bonus = {}
+        if len(troops_bonus) > 1:
+            errors.append(f"{where}最多只能有一项兵种加成")
+        for troop, bonus in troops_bonus.items():
+            if troop not in troop_names:
+                errors.append(f"{where}未知兵种: {troop}")
+            if not isinstance(bonus, (int, float)) or not 0 <= bonus <= 65:
+                errors.append(f"{where}兵种加成必须是0到65之间的数值")
+
+    city_names = set()
+    for i, city in _entries(errors, "cities", data.get("cities", [])):
+        where = f"cities[{i}]"
+        if not isinstance(city.get("name"), str) or not city.get("name"):
+            errors.append(f"{where}缺少name")
+        elif city["name"] in city_names:
+            errors.append(f"{where}城市重名: {city['name']}")
+        else:
+            city_names.add(city["name"])
+        if not isinstance(city.get("region"), str):
+            errors.append(f"{where}缺少region")
+        _check_int(errors, where, city, "population", maximum=0xFFFFFFFF)
+        for field in CITY_FIELDS[1:]:
+            _check_int(errors, where, city, field)
+        if "owner" in city and (not isinstance(city["owner"], str) or city["owner"] not in kingdom_names):
+            errors.append(f"{where}的owner不是剧本中的势力: {city['owner']}")
+
+    for i, chapter in _entries(errors, "chapters", data.get("chapters", [])):
+        where = f"chapters[{i}]"
+        for field in ("title", "intro"):
+            if not isinstance(chapter.get(field), str):
+                errors.append(f"{where}缺少{field}")
+        events = chapter.get("events", [])
+        if not isinstance(events, list) or not all(isinstance(event, str) for event in events):
+            errors.append(f"{where}的events必须是字符串列表")
+        _check_int(errors, where, {"required_level": chapter.get("required_level", 1)}, "required_level", 1, 999)
+        for j, choice in _entries(errors, f"{where}.choices", chapter.get("choices", [])):
+            choice_where = f"{where}.choices[{j}]"
+            for field in ("text", "result"):
+                if not isinstance(choice.get(field), str):
+                    errors.append(f"{choice_where}缺少{field}")
+            for k, effect in _entries(errors, f"{choice_where}.effects", choice.get("effects", [])):
+                _check_effect(errors, f"{choice_where}.effects[{k}]", effect)
+
+    return errors
+
+def _compile(path, raw, table_path, meta_path):
+    """解析、校验并写入缓存"""
+    data = read_source(path, raw)
+    errors = validate_scenario(data)
+    if errors:
+        raise ScenarioError(path, errors)
+
+    cities = data.get("cities", [])
+    compile_tables(data.get("generals", []), cities, table_path)
+    meta = {
+        "name": data.get("name", os.path.splitext(os.path.basename(path))[0]),
+        "kingdoms": data.get("kingdoms", []),
+        "city_owners": [(i, city["owner"]) for i, city in enumerate(cities) if "owner" in city],
+        "chapters": data.get("chapters", []),
+    }
+    with open(meta_path + ".tmp", "wb") as f:
+        marshal.dump(meta, f)
+    # compile_tables已原子地写好数据表，元数据最后替换，元数据存在即表示缓存完整
+    os.replace(meta_path + ".tmp", meta_path)
+    return meta
+
+def load_scenario(path, cache_dir=DEFAULT_CACHE_DIR):
+    """加载剧本，优先使用编译缓存
+
+    Args:
+        path: 剧本文件路径（.json/.yaml/.yml）
+        cache_dir: 缓存目录
+
+    Returns:
+        Scenario: 剧本对象，timing中记录是否命中缓存及各阶段耗时
+    """
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw + f"\0{CACHE_FORMAT}".encode("ascii")).hexdigest()[:32]
+    hash_seconds = time.perf_counter() - start
+
+    os.makedirs(cache_dir, exist_ok=True)
+    table_path = os.path.join(cache_dir, digest + ".tbl")
+    meta_path = os.path.join(cache_dir, digest + ".meta")
+
+    timing = {"source": "cache", "hash_seconds": hash_seconds, "parse_seconds": 0.0}
+    meta = None
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, "rb") as f:
+                meta = marshal.load(f)
+        except (EOFError, ValueError, TypeError):
+            meta = None  # 缓存损坏，重新编译
+
+    if meta is None:
+        timing["source"] = "parse"
+        parse_start = time.perf_counter()
+        meta = _compile(path, raw, table_path, meta_path)
+        timing["parse_seconds"] = time.perf_counter() - parse_start
+
+    tables = GameDataTables(table_path)
+    timing["total_seconds"] = time.perf_counter() - start
+
+    return Scenario(meta["name"], tables, meta["kingdoms"], meta["city_owners"], meta["chapters"], timing)
+
+def format_timing(timing):
+    """把加载耗时格式化为一行说明"""
+    source = "缓存命中" if timing["source"] == "cache" else "解析编译"
+    return (f"剧本加载({source}): 总计{timing['total_seconds'] * 1000:.1f}ms, "
+            f"哈希{timing['hash_seconds'] * 1000:.1f}ms, 解析{timing['parse_seconds'] * 1000:.1f}ms")
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+世界事件调度模块
+离散事件调度：各实体把未来要发生的事件（行军到达、训练完成、建筑完工、同盟到期、随机事件等）
+按游戏日登记到最小堆，世界直接推进到下一个事件的时间，两次事件之间的日子不做任何计算。
+没有待办事件的实体每个tick不产生开销，因此可以很快地模拟几十年的游戏时间。
+
+随机事件也按概率直接抽出下一次发生的时间（几何分布），而不是每月为每个势力掷一次骰子。
+
+命令行:
+    python -m modules.scheduler --scale 100 --years 50   # 在合成世界上模拟并输出耗时
+"""
+
+import argparse
+import heapq
+import itertools
+import math
+import random
+import time
+
+from models.kingdom import RANDOM_EVENT_CHANCE
+from modules.economy import run_month
+
+DAYS_PER_MONTH = 30
+DAYS_PER_YEAR = 12 * DAYS_PER_MONTH
+
+class ScheduledEvent:
+    """已登记的事件，cancel()后不会再执行"""
+
+    __slots__ = ("time", "callback", "args", "interval", "cancelled")
+
+    def __init__(self, time, callback, args, interval=None):
+        self.time = time  # 执行时间（游戏日）
+        self.callback = callback
+        self.args = args
+        self.interval = interval  # 重复间隔，None表示只执行一次
+        self.cancelled = False
+
+    def __repr__(self):
+        name = getattr(self.callback, "__qualname__", repr(self.callback))
+        return f"ScheduledEvent({self.time!r}, {name})"
+
+class EventScheduler:
+    """基于最小堆的事件调度器
+
+    同一时间的事件按登记顺序执行；取消的事件只做标记，出堆时跳过，
+    取消的条目超过一半时重建堆
+    """
+
+    def __init__(self, now=0):
+        self.now = now  # 当前游戏日
+        self.fired = 0  # 已执行的事件数
+        self._heap = []  # (时间, 序号, 事件)
+        self._counter = itertools.count()
+        self._cancelled = 0
+        self._running = None  # 正在执行回调的重复事件
+
+    def __len__(self):
+        """待执行的事件数"""
+        return len(self._heap) - self._cancelled
+
+    def schedule(self, at, callback, *args, interval=None):
+        """登记在指定游戏日执行的事件
+
+        Args:
+            at: 执行时间，不能早于当前时间
+            interval: 重复间隔（天），回调返回False时不再重复
+        """
+        if at < self.now:
+            raise ValueError(f"事件时间{at}早于当前时间{self.now}")
+        if interval is not None and interval <= 0:
+            raise ValueError("重复间隔必须大于0")
+        event = ScheduledEvent(at, callback, args, interval)
+        heapq.heappush(self._heap, (at, next(self._counter), event))
+        return event
+
+    def schedule_in(self, delay, callback, *args, interval=None):
+        """登记在若干天后执行的事件"""
+        return self.schedule(self.now + delay, callback, *args, interval=interval)
+
+    def every(self, interval, callback, *args, start=None):
+        """登记重复事件，默认从一个间隔之后开始"""
+        return self.schedule(self.now + interval if start is None else start, callback, *args, interval=interval)
+
+    def cancel(self, event):
+        """取消事件，返回是否取消了待执行的事件"""
+        if event is None or event.cancelled:
+            return False
+        event.cancelled = True
+        if event is self._running:
+            return True  # 正在执行的重复事件，条目已经出堆
+        self._cancelled += 1
+        if self._cancelled > len(self._heap) // 2:
+            # 原地重建：回调中取消事件时，run_until仍在使用同一个列表
+            self._heap[:] = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+        return True
+
+    def next_time(self):
+        """下一个事件的时间，没有事件时返回None"""
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+            self._cancelled -= 1
+        return heap[0][0] if heap else None
+
+    def run_until(self, until):
+        """依次执行直到指定时间（含）的所有事件，然后把当前时间推进到until
+
+        Returns:
+            int: 执行的事件数
+        """
+        heap = self._heap
+        fired = 0
+        while heap and heap[0][0] <= until:
+            at, _, event = heapq.heappop(heap)
+            if event.cancelled:
+                self._cancelled -= 1
+                continue
+            self.now = at
+            fired += 1
+            if event.interval is None:
+                event.cancelled = True  # 已执行，之后的cancel()不再计数
+                event.callback(*event.args)
+                continue
+            self._running = event
+            try:
+                result = event.callback(*event.args)
+            finally:
+                self._running = None
+            if result is False:
+                event.cancelled = True
+            elif not event.cancelled:
+                event.time = at + event.interval
+                heapq.heappush(heap, (event.time, next(self._counter), event))
+        self.now = max(self.now, until)
+        self.fired += fired
+        return fired
+
+    def run_next(self):
+        """推进到下一个事件的时间并执行该时间的全部事件，没有事件时返回0"""
+        at = self.next_time()
+        return 0 if at is None else self.run_until(at)
+
+    def advance(self, days):
+        """推进若干天"""
+        return self.run_until(self.now + days)
+
+def months_until_event(chance, rng=random):
+    """按每月发生概率抽出下一次发生在几个月后（几何分布，至少为1）"""
+    if chance >= 1:
+        return 1
+    return 1 + int(math.log(1.0 - rng.random()) / math.log(1.0 - chance))
+
+class WorldTimeline:
+    """把世界的定时事务登记到调度器
+
+    所有势力的月度结算是一个重复事件；随机事件按几何分布直接安排到发生的那个月，
+    与每月掷骰的发生概率相同。训练、建筑、行军和同盟等按各自的工期登记一次性事件。
+    """
+
+    def __init__(self, kingdoms=(), scheduler=None, start_day=0, event_chance=RANDOM_EVENT_CHANCE):
+        self.scheduler = scheduler or EventScheduler(start_day)
+        self.event_chance = event_chance
+        self.messages = []  # [(游戏日, 随机事件的描述)]
+        self.kingdoms = []
+        self.ledgers = []  # 最近一次月度结算的账目，与self.kingdoms一一对应
+        self._random_events = {}  # id(势力) -> 下一次随机事件
+        self._monthly = self.scheduler.every(DAYS_PER_MONTH, self._month_end)
+        for kingdom in kingdoms:
+            self.add_kingdom(kingdom)
+
+    @property
+    def day(self):
+        return self.scheduler.now
+
+    def add_kingdom(self, kingdom):
+        """开始为势力安排月度结算和随机事件"""
+        if id(kingdom) in self._random_events:
+            return False
+        self.kingdoms.append(kingdom)
+        self._schedule_random_event(kingdom)
+        return True
+
+    def remove_kingdom(self, kingdom):
+        """势力灭亡时取消它的全部事件"""
+        event = self._random_events.pop(id(kingdom), None)
+        if event is None:
+            return False
+        self.kingdoms.remove(kingdom)
+        self.scheduler.cancel(event)
+        return True
+
+    def _month_end(self):
+        # 所有势力一起结算，见modules/economy.py
+        self.ledgers = run_month(self.kingdoms, with_events=False)
+
+    def _schedule_random_event(self, kingdom):
+        months = months_until_event(self.event_chance)
+        # 与月度结算同一天发生
+        at = (self.scheduler.now // DAYS_PER_MONTH + months) * DAYS_PER_MONTH
+        self._random_events[id(kingdom)] = self.scheduler.schedule(at, self._random_event, kingdom)
+
+    def _random_event(self, kingdom):
+        message = kingdom.random_events(chance=1)
+        if message:
+            self.messages.append((self.scheduler.now, message))
+        self._schedule_random_event(kingdom)
+
+    # ---- 有工期的事务 ----
+
+    def train_army(self, army, days, general=None, on_done=None):
+        """训练军队，days天后一次结算训练效果"""
+        def finish():
+            army.train(days, general)
+            if on_done:
+                on_done(army)
+        return self.scheduler.schedule_in(days, finish)
+
+    def upgrade_building(self, city, building_name, days, on_done=None):
+        """建筑施工days天，完工时支付费用并升级（资金不足则升级失败）"""
+        def finish():
+            upgraded = city.upgrade_building(building_name)
+            if on_done:
+                on_done(city, building_name, upgraded)
+        return self.scheduler.schedule_in(days, finish)
+
+    def march(self, army, days, on_arrive, *args):
+        """军队行军days天，到达时调用on_arrive(army, *args)"""
+        return self.scheduler.schedule_in(days, on_arrive, army, *args)
+
+    def form_alliance(self, kingdom, other_kingdom, days):
+        """结成为期days天的同盟，到期自动解除；返回到期事件，取消它即可延长为长期同盟"""
+        if not kingdom.form_alliance(other_kingdom):
+            return None
+        return self.scheduler.schedule_in(days, kingdom.break_alliance, other_kingdom)
+
+    # ---- 推进 ----
+
+    def advance_days(self, days):
+        """推进若干天，返回执行的事件数"""
+        return self.scheduler.advance(days)
+
+    def advance_years(self, years):
+        return self.scheduler.advance(years * DAYS_PER_YEAR)
+
+def benchmark_timeline(scale=10, years=20, seed=0):
+    """在合成世界上模拟若干年，返回耗时和事件数"""
+    from modules.world_generator import generate_scaled_world
+
+    world = generate_scaled_world(scale, seed)
+    random.seed(seed)
+    timeline = WorldTimeline(world["kingdoms"])
+    for index, army in enumerate(world["armies"]):
+        # 每支军队每年训练一次，时间错开
+        timeline.scheduler.schedule(index % DAYS_PER_YEAR, timeline.train_army, army, 10,
+                                    interval=DAYS_PER_YEAR)
+    start = time.perf_counter()
+    fired = timeline.advance_years(years)
+    seconds = time.perf_counter() - start
+    return {
+        "scale": scale,
+        "years": years,
+        "kingdoms": len(world["kingdoms"]),
+        "armies": len(world["armies"]),
+        "events": fired,
+        "random_events": len(timeline.messages),
+        "seconds": seconds,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="世界事件调度模拟")
+    parser.add_argument("--scale", type=int, default=10, help="合成世界的规模倍数")
+    parser.add_argument("--years", type=int, default=20, help="模拟的年数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    result = benchmark_timeline(args.scale, args.years, args.seed)
+    print(f"{result['kingdoms']}个势力、{result['armies']}支军队模拟{result['years']}年: "
+          f"{result['events']}个事件（随机事件{result['random_events']}个），耗时{result['seconds']:.2f}s")
@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+攻城战模块
+按天模拟围城：攻城兵器和攻城技能每天削弱城墙，守军消耗粮仓和随军粮草，双方每天都有少量减员；
+粮尽后守军减员加快、士气逐日下降直至投降，攻方随军粮草和本国粮食都耗尽后士气下降直至撤围。
+城墙被攻破时发起总攻，由Battle按城墙剩余的防御值结算。
+
+两次事件（城破、粮尽、投降、撤围）之间的日子里各项数值按固定比例变化，
+可以用等比数列求和直接算出若干天后的状态和下一次事件的日期，因此数年的围城也只需几毫秒。
+
+命令行:
+    python -m modules.siege --days 3650   # 比较逐日模拟和直接推进的结果与耗时
+"""
+
+import argparse
+import math
+import time
+
+from models.army import TroopType, Terrain
+from models.general import Skill
+from models.observer import notify_change
+from modules.battle import Battle
+
+# 每天的减员比例
+ATTACKER_ATTRITION = 0.002  # 攻方：疫病、守军夜袭
+DEFENDER_ATTRITION = 0.001  # 守方：攻方的箭矢和投石
+STARVING_ATTRITION = 0.01  # 守方粮尽后
+
+# 每名士兵每天消耗的粮食，攻方可就地征粮，消耗较少
+DEFENDER_FOOD = 0.5
+ATTACKER_FOOD = 0.2
+
+# 每名士兵每天对城墙造成的损伤（防御值）
+SIEGE_ENGINE_DAMAGE = 0.02  # 攻城兵
+WALL_DAMAGE = 0.0005  # 其他兵种
+SIEGE_SKILL_FACTOR = 1.5  # 将领有攻城技能时的损伤倍数
+
+# 断粮后每天的士气下降，士气低于SURRENDER_MORALE时投降或撤围
+STARVING_MORALE_DROP = 2
+UNSUPPLIED_MORALE_DROP = 3
+SURRENDER_MORALE = 20
+
+def decayed_sum(rate, days):
+    """每天按rate递减的量在days天内的累计倍数：1 + (1-rate) + (1-rate)^2 + ..."""
+    if rate <= 0:
+        return days
+    return (1 - (1 - rate) ** days) / rate
+
+def days_until(amount, per_day, rate):
+    """首日消耗per_day、之后每天按rate递减时，累计消耗达到amount所需的天数
+
+    Returns:
+        int: 天数，永远达不到时返回None
+    """
+    if amount <= 0:
+        return 0
+    if per_day <= 0:
+        return None
+    if rate <= 0:
+        return math.ceil(amount / per_day)
+    remaining = 1 - amount * rate / per_day
+    if remaining <= 0:
+        return None  # 累计消耗的极限per_day/rate不超过amount
+    days = max(1, math.ceil(math.log(remaining) / math.log(1 - rate)))
+    # 修正对数的浮点误差
+    while days > 1 and per_day * decayed_sum(rate, days - 1) >= amount:
+        days -= 1
+    while per_day * decayed_sum(rate, days) < amount:
+        days += 1
+    return days
+
+def days_until_below(size, rate, limit=1):
+    """每天按rate减员时，兵力降到limit以下所需的天数，不减员时返回None"""
+    if size < limit:
+        return 0
+    if rate <= 0:
+        return None
+    days = math.floor(math.log(limit / size) / math.log(1 - rate)) + 1
+    while days > 1 and size * (1 - rate) ** (days - 1) < limit:
+        days -= 1
+    while size * (1 - rate) ** days >= limit:
+        days += 1
+    return days
+
+def _siege_soldiers(army):
+    """军队中攻城兵的人数"""
+    if army.primary_type == TroopType.SIEGE:
+        return army.size * (1 - army.secondary_ratio)
+    if army.secondary_type == TroopType.SIEGE:
+        return army.size * army.secondary_ratio
+    return 0
+
+def _average_morale(armies):
+    total = sum(army.size for army in armies)
+    return sum(army.morale * army.size for army in armies) / total if total else 0
+
+def _distribute_casualties(armies, casualties):
+    """按兵力比例把伤亡分配到各支军队"""
+    total = sum(army.size for army in armies)
+    if total <= 0 or casualties <= 0:
+        return
+    remaining = casualties
+    for i, army in enumerate(armies):
+        amount = remaining if i == len(armies) - 1 else int(casualties * army.size / total)
+        remaining -= amount
+        army.take_casualties(min(amount, army.size))
+
+def _consume_food(armies, amount):
+    """按比例扣除各支军队携带的粮食，返回随军粮草不够支付的部分"""
+    carried = sum(army.food for army in armies)
+    eaten = min(amount, carried)
+    if eaten > 0:
+        for army in armies:
+            army.food -= army.food * eaten / carried
+            notify_change(army, "food")
+    return amount - eaten
+
+class SiegeResult:
+    """攻城战结果"""
+    def __init__(self, outcome, days, attacker_casualties, defender_casualties, siege_log, battle=None):
+        self.outcome = outcome  # captured城破，surrendered守军投降，held击退总攻，lifted撤围，ongoing尚未结束
+        self.days = days  # 围城天数
+        self.attacker_casualties = attacker_casualties  # 进攻方伤亡
+        self.defender_casualties = defender_casualties  # 防守方伤亡
+        self.siege_log = siege_log  # 围城日志
+        self.battle = battle  # 总攻的BattleResult，没有总攻时为None
+
+class Siege:
+    """围城战
+
+    state中的兵力、城墙、粮食和士气按天变化，只在总攻前和结束时写回各支军队
+    """
+
+    def __init__(self, city, attacker_armies, attacker_generals=None, defender_generals=None, attacker_kingdom=None):
+        """
+        Args:
+            attacker_kingdom: 攻方势力，随军粮草吃完后从其粮食中补给（按围城开始时的存粮计算）
+        """
+        self.city = city
+        self.attacker_kingdom = attacker_kingdom
+        self.attacker_armies = attacker_armies if isinstance(attacker_armies, list) else [attacker_armies]
+        self.defender_armies = list(city.garrison)
+        self.attacker_generals = attacker_generals or []
+        if defender_generals is None:
+            defender_generals = [city.governor] if city.governor else []
+        self.defender_generals = defender_generals
+
+        self.day = 0
+        self.outcome = None
+        self.siege_log = []
+        self.battle = None
+
+        attackers = sum(army.size for army in self.attacker_armies)
+        siege_soldiers = sum(_siege_soldiers(army) for army in self.attacker_armies)
+        skill_factor = SIEGE_SKILL_FACTOR if any(Skill.SIEGE in general.skills
+                                                 for general in self.attacker_generals) else 1.0
+        # 攻城兵与其他兵种按相同比例减员，每名攻方士兵的平均损伤保持不变
+        self.wall_damage = ((siege_soldiers * SIEGE_ENGINE_DAMAGE + (attackers - siege_soldiers) * WALL_DAMAGE)
+                            * skill_factor / attackers) if attackers else 0
+        self.granary = city.bonus("粮食储量")
+
+        self.attackers = float(attackers)
+        self.defenders = float(city.total_garrison_size())
+        self.wall = float(city.get_defense_bonus())
+        self.food = float(self.granary + sum(army.food for army in self.defender_armies))
+        self.supplies = float(sum(army.food for army in self.attacker_armies))
+        if attacker_kingdom is not None:
+            self.supplies += max(0, attacker_kingdom.resources["food"])
+        self.attacker_morale = _average_morale(self.attacker_armies)
+        self.defender_morale = _average_morale(self.defender_armies)
+        self._synced = (attackers, self.defenders, self.attacker_morale, self.defender_morale, self.food,
+                        self.supplies)
+        self.attacker_casualties = 0
+        self.defender_casualties = 0
+        self._food_out = self._supplies_out = False
+
+        self.log(f"{city.name}被围：攻方{attackers}人，守军{int(self.defenders)}人，城防{int(self.wall)}")
+
+    def log(self, message):
+        """添加围城日志"""
+        self.siege_log.append(f"第{self.day}天 {message}")
+
+    @property
+    def defenders_starving(self):
+        return self.food <= 0
+
+    @property
+    def attackers_unsupplied(self):
+        return self.supplies <= 0
+
+    def _rates(self):
+        """当前阶段双方每天的减员比例"""
+        return ATTACKER_ATTRITION, STARVING_ATTRITION if self.defenders_starving else DEFENDER_ATTRITION
+
+    # ---- 推进 ----
+
+    def step(self):
+        """逐日模拟一天"""
+        attacker_rate, defender_rate = self._rates()
+        self.wall -= self.attackers * self.wall_damage
+        if self.attackers_unsupplied:
+            self.attacker_morale -= UNSUPPLIED_MORALE_DROP
+        else:
+            self.supplies -= self.attackers * ATTACKER_FOOD
+        if self.defenders_starving:
+            self.defender_morale -= STARVING_MORALE_DROP
+        else:
+            self.food -= self.defenders * DEFENDER_FOOD
+        self.attackers *= 1 - attacker_rate
+        self.defenders *= 1 - defender_rate
+        self.day += 1
+        self._check_events()
+
+    def _days_to_next_event(self):
+        """按当前阶段的比例算出下一次事件（城破、粮尽、投降、撤围、一方伤亡殆尽）在几天后，没有事件时返回None"""
+        attacker_rate, defender_rate = self._rates()
+        candidates = [
+            days_until(self.wall, self.attackers * self.wall_damage, attacker_rate),
+            days_until_below(self.attackers, attacker_rate),
+            days_until_below(self.defenders, defender_rate),
+        ]
+        if self.attackers_unsupplied:
+            candidates.append(math.floor((self.attacker_morale - SURRENDER_MORALE) / UNSUPPLIED_MORALE_DROP) + 1)
+        else:
+            candidates.append(days_until(self.supplies, self.attackers * ATTACKER_FOOD, attacker_rate))
+        if self.defenders_starving:
+            candidates.append(math.floor((self.defender_morale - SURRENDER_MORALE) / STARVING_MORALE_DROP) + 1)
+        else:
+            candidates.append(days_until(self.food, self.defenders * DEFENDER_FOOD, defender_rate))
+        candidates = [days for days in candidates if days is not None]
+        return max(1, min(candidates)) if candidates else None
+
+    def fast_forward(self, days):
+        """直接推进若干个平静的日子，结果与逐日调用step()相同（不跨越事件时）"""
+        attacker_rate, defender_rate = self._rates()
+        attacker_days = decayed_sum(attacker_rate, days)
+        defender_days = decayed_sum(defender_rate, days)
+        self.wall -= self.attackers * self.wall_damage * attacker_days
+        if self.attackers_unsupplied:
+            self.attacker_morale -= UNSUPPLIED_MORALE_DROP * days
+        else:
+            self.supplies -= self.attackers * ATTACKER_FOOD * attacker_days
+        if self.defenders_starving:
+            self.defender_morale -= STARVING_MORALE_DROP * days
+        else:
+            self.food -= self.defenders * DEFENDER_FOOD * defender_days
+        self.attackers *= (1 - attacker_rate) ** days
+        self.defenders *= (1 - defender_rate) ** days
+        self.day += days
+        self._check_events()
+
+    def _check_events(self):
+        if self.food <= 0 and not self._food_out:
+            self.food = 0
+            self._food_out = True
+            self.log("城中粮尽，守军开始饿死")
+        if self.supplies <= 0 and not self._supplies_out:
+            self.supplies = 0
+            self._supplies_out = True
+            self.log("攻方粮草耗尽")
+        if self.defenders < 1:
+            self.finish("captured", "守军伤亡殆尽，城池陷落")
+        elif self.attackers < 1:
+            self.finish("lifted", "攻方伤亡殆尽，围城失败")
+        elif self.defender_morale < SURRENDER_MORALE:
+            self.finish("surrendered", "守军士气崩溃，开城投降")
+        elif self.attacker_morale < SURRENDER_MORALE:
+            self.finish("lifted", "攻方士气崩溃，撤围而去")
+        elif self.wall <= 0:
+            self.wall = 0
+            self.log("城墙被攻破")
+            self.assault()
+
+    def run(self, max_days=3650, fast=True):
+        """围城直到分出结果或达到max_days天
+
+        Args:
+            fast: 是否直接推进到下一次事件，False时逐日模拟（用于对照）
+        """
+        while self.outcome is None and self.day < max_days:
+            if fast:
+                days = self._days_to_next_event()
+                self.fast_forward(min(days, max_days - self.day) if days else max_days - self.day)
+            else:
+                self.step()
+        if self.outcome is None:
+            self.sync()
+            self.log("围城仍在继续")
+        return self.result()
+
+    # ---- 总攻和结算 ----
+
+    def assault(self):
+        """发起总攻，按城墙剩余的防御值交战"""
+        self.sync()
+        if not any(army.size for army in self.defender_armies):
+            self.finish("captured", "城中已无守军，攻方入城")
+            return
+        self.log(f"攻方发起总攻，城防剩余{int(self.wall)}")
+        battle = Battle(self.attacker_armies, self.defender_armies, self.attacker_generals, self.defender_generals,
+                        terrain=Terrain.CITY, dramatic_pauses=False, city=self.city, defense_bonus=self.wall)
+        self.battle = battle.simulate_battle()
+        self.attacker_casualties += self.battle.attacker_casualties
+        self.defender_casualties += self.battle.defender_casualties
+        if self.battle.winner == "attacker":
+            self.finish("captured", "总攻得手，城池陷落")
+        else:
+            self.finish("held", "守军击退总攻，攻方撤退")
+
+    def finish(self, outcome, message):
+        self.sync()
+        self.outcome = outcome
+        self.log(message)
+
+    def sync(self):
+        """把上次写回以来的减员、士气和粮食变化写回各支军队"""
+        attackers, defenders, attacker_morale, defender_morale, food, supplies = self._synced
+        attacker_losses = int(attackers - self.attackers)
+        defender_losses = int(defenders - self.defenders)
+        _distribute_casualties(self.attacker_armies, attacker_losses)
+        _distribute_casualties(self.defender_armies, defender_losses)
+        self.attacker_casualties += attacker_losses
+        self.defender_casualties += defender_losses
+        for armies, morale, before in ((self.attacker_armies, self.attacker_morale, attacker_morale),
+                                       (self.defender_armies, self.defender_morale, defender_morale)):
+            if morale != before:
+                for army in armies:
+                    army.morale = max(10, min(100, army.morale + morale - before))
+                    notify_change(army, "morale")
+        # 双方都先吃随军粮草，守军再动用粮仓，攻方再由本国补给
+        _consume_food(self.defender_armies, food - self.food)
+        shipped = _consume_food(self.attacker_armies, supplies - self.supplies)
+        if shipped > 0 and self.attacker_kingdom is not None:
+            kingdom = self.attacker_kingdom
+            kingdom.ledger.debit("food", min(shipped, max(0, kingdom.resources["food"])), "攻城军粮")
+        self.attackers = float(sum(army.size for army in self.attacker_armies))
+        self.defenders = float(sum(army.size for army in self.defender_armies))
+        self._synced = (self.attackers, self.defenders, self.attacker_morale, self.defender_morale, self.food,
+                        self.supplies)
+
+    def result(self):
+        return SiegeResult(self.outcome or "ongoing", self.day, self.attacker_casualties, self.defender_casualties,
+                           self.siege_log, self.battle)
+
+def benchmark_siege(days=3650, granary_level=100, seed=0):
+    """比较逐日模拟和直接推进：高墙大仓的城池，攻方没有攻城兵但有本国补给，围城可持续数年"""
+    import random
+    from models.army import Army
+    from models.city import Building, City
+    from models.kingdom import Kingdom
+
+    def make_siege():
+        random.seed(seed)
+        city = City("襄阳", 80000, 70, 30, 5, 20, "荆州")
+        city.buildings = dict(city.buildings, 粮仓=Building.from_type("粮仓", level=granary_level))
+        for _ in range(4):
+            city.add_garrison(Army(1500, 80, 70, TroopType.ARCHER))
+        kingdom = Kingdom("魏", "曹操", "blue")
+        kingdom.resources["food"] = 2000000
+        attackers = [Army(3000, 80, 70, TroopType.INFANTRY) for _ in range(4)]
+        return Siege(city, attackers, attacker_kingdom=kingdom)
+
+    rows = {}
+    for label, fast in (("逐日", False), ("直接推进", True)):
+        siege = make_siege()
+        start = time.perf_counter()
+        result = siege.run(days, fast=fast)
+        rows[label] = {"seconds": time.perf_counter() - start, "outcome": result.outcome, "days": result.days,
+                       "attacker_casualties": result.attacker_casualties,
+                       "defender_casualties": result.defender_casualties}
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="攻城战模拟")
+    parser.add_argument("--days", type=int, default=3650, help="最长围城天数")
+    parser.add_argument("--granary", type=int, default=100, help="粮仓等级")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for label, row in benchmark_siege(args.days, args.granary, args.seed).items():
+        print(f"{label}: {row['outcome']} 第{row['days']}天 攻方伤亡{row['attacker_casualties']} "
+              f"守方伤亡{row['defender_casualties']} 耗时{row['seconds'] * 1000:.2f}ms")
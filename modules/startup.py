@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+启动耗时记录模块
+记录启动过程中各阶段（导入、创建窗口、首帧）距离启动的时间，首帧绘制后输出报告，
+并把每次启动的结果追加到轨迹文件，便于跟踪启动速度的变化。
+报告中也会列出首帧时已经加载的重量级模块，用于检查延迟导入是否生效。
+
+本模块只依赖标准库，应当在启动脚本中最先导入。
+"""
+
+import json
+import os
+import sys
+import time
+
+START_TIME = time.perf_counter()  # 以本模块被导入的时间作为启动时间
+REPORT_PATH = os.path.join("profiles", "startup.json")
+REPORT_HISTORY = 50  # 轨迹文件中保留的启动次数
+
+# 首帧之前不应加载的模块
+DEFERRED_MODULES = (
+    "three_kingdoms_game", "modules.battle", "modules.story", "modules.game_data",
+    "modules.scenario", "modules.data_tables", "PIL",
+)
+
+_marks = []  # [(阶段, 距离启动的毫秒数)]
+_reported = False
+
+def mark(stage):
+    """记录一个启动阶段完成的时间"""
+    elapsed = (time.perf_counter() - START_TIME) * 1000
+    _marks.append((stage, round(elapsed, 1)))
+    return elapsed
+
+def loaded_deferred_modules():
+    """已经加载的延迟模块"""
+    return [name for name in DEFERRED_MODULES if name in sys.modules]
+
+def build_report():
+    """汇总本次启动的各阶段耗时"""
+    stages = {}
+    previous = 0.0
+    for stage, elapsed in _marks:
+        stages[stage] = {"at_ms": elapsed, "step_ms": round(elapsed - previous, 1)}
+        previous = elapsed
+    return {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "stages": stages,
+        "modules_loaded": len(sys.modules),
+        "deferred_loaded": loaded_deferred_modules(),
+    }
+
+def write_report(report, path=REPORT_PATH):
+    """把报告追加到轨迹文件，只保留最近的若干次"""
+    history = []
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                history = json.load(f)
+        except (OSError, ValueError):
+            history = []
+    history = (history + [report])[-REPORT_HISTORY:]
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
+    return path
+
+def format_report(report):
+    """报告的单行文字"""
+    stages = "  ".join(f"{stage} {values['at_ms']:.0f}ms" for stage, values in report["stages"].items())
+    text = f"启动耗时: {stages}  已加载模块 {report['modules_loaded']}"
+    if report["deferred_loaded"]:
+        text += f"  首帧前已加载: {', '.join(report['deferred_loaded'])}"
+    return text
+
+def first_frame():
+    """首帧绘制完成时调用，只在第一次调用时输出并保存报告"""
+    global _reported
+    if _reported:
+        return None
+    _reported = True
+    mark("first_frame")
+    report = build_report()
+    print(format_report(report))
+    try:
+        write_report(report)
+    except OSError as e:
+        print(f"启动报告保存失败: {e}")
+    return report
+
+def print_history(path=REPORT_PATH, count=10):
+    """打印最近几次启动的首帧时间"""
+    with open(path, "r", encoding="utf-8") as f:
+        history = json.load(f)
+    for report in history[-count:]:
+        print(format_report(report) + f"  ({report['time']})")
+
+if __name__ == "__main__":
+    print_history()
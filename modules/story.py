@@ -1,8 +1,64 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import json
+import os
 import random
 import time
+import heapq
+from collections import OrderedDict, deque
+from models.observer import notify_change
+from modules.quest_tracker import QuestTrigger, QuestTracker
+
+# 章节数据目录：index.json为章节索引，章节内容按需从各自的文件加载
+STORY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "story")
+CHAPTER_CACHE_SIZE = 4  # 同时保留在内存中的章节数
+
+# 数据化选择效果支持的类型，剧本文件中的章节只能使用这些效果
+EFFECT_TYPES = ("fame", "attribute", "army", "set")
+# 各类效果可以修改的属性 -> amount（set为value）的类型
+NUMBER = (int, float)
+EFFECT_FIELDS = {
+    "attribute": dict.fromkeys(("leadership", "strength", "intelligence", "politics", "charisma", "loyalty"), NUMBER),
+    "army": dict.fromkeys(("size", "morale", "training", "experience", "fatigue", "food", "equipment_level"), NUMBER),
+    "set": {"title": str, "loyalty": NUMBER},
+}
+
+def apply_effects(player, effects):
+    """执行数据化的选择效果
+    
+    支持的效果:
+    - {"type": "fame", "amount": 20}: 获得声望
+    - {"type": "attribute", "name": "leadership", "amount": 5}: 提升玩家属性
+    - {"type": "army", "name": "size", "amount": 500}: 提升玩家第一支军队的属性
+    - {"type": "set", "name": "title", "value": "一方诸侯"}: 直接设置玩家属性
+    """
+    for effect in effects:
+        effect_type = effect["type"]
+        if effect_type == "fame":
+            player.gain_fame(effect["amount"])
+        elif effect_type == "attribute":
+            setattr(player, effect["name"], getattr(player, effect["name"]) + effect["amount"])
+            notify_change(player, effect["name"])
+        elif effect_type == "army":
+            if player.armies:
+                army = player.armies[0]
+                setattr(army, effect["name"], getattr(army, effect["name"]) + effect["amount"])
+                notify_change(army, effect["name"])
+        elif effect_type == "set":
+            setattr(player, effect["name"], effect["value"])
+            notify_change(player, effect["name"])
+
+def apply_choice(player, choice):
+    """执行选项的效果，兼容效果函数和数据化效果两种写法"""
+    if 'effect' in choice and callable(choice['effect']):
+        choice['effect'](player)
+        # 效果函数直接修改属性，需要整体通知玩家及其军队的变化
+        notify_change(player)
+        for army in player.armies:
+            notify_change(army)
+    if choice.get('effects'):
+        apply_effects(player, choice['effects'])
 
 class Chapter:
     """故事章节类"""
@@ -13,39 +69,148 @@ class Chapter:
         self.events = events  # 章节事件列表
         self.choices = choices or []  # 玩家可选择的选项
         self.required_level = required_level  # 解锁所需等级
+    
+    @classmethod
+    def from_dict(cls, data):
+        """根据剧本数据创建章节，选项效果使用apply_effects支持的格式"""
+        return cls(
+            title=data["title"],
+            intro=data["intro"],
+            events=list(data.get("events", [])),
+            choices=[dict(choice) for choice in data.get("choices", [])],
+            required_level=data.get("required_level", 1)
+        )
         
+    def run(self, player):
+        """以生成器方式推进章节，不阻塞、可随时暂停和恢复
+        
+        依次产出显示事件字典，type为title/intro/event/choices/result，
+        delay为显示前应等待的秒数；产出choices后需用send()传入选择的序号(从1开始)。
+        生成器结束时的返回值为选择的序号，没有选项或选择无效时为0。
+        """
+        yield {"type": "title", "text": self.title, "delay": 0}
+        yield {"type": "intro", "text": self.intro, "delay": 0}
+        
+        for i, event in enumerate(self.events):
+            # 每个事件前等待1秒，事件之后停留1.5秒
+            yield {"type": "event", "text": event, "delay": 1 if i == 0 else 2.5}
+        
+        if not self.choices:
+            return 0
+        
+        choice_num = yield {
+            "type": "choices",
+            "choices": [choice['text'] for choice in self.choices],
+            "delay": 1.5 if self.events else 0
+        }
+        if not isinstance(choice_num, int) or not 1 <= choice_num <= len(self.choices):
+            return 0
+        
+        chosen = self.choices[choice_num - 1]
+        # 执行选择的效果
+        apply_choice(player, chosen)
+        yield {"type": "result", "text": chosen['result'], "delay": 0}
+        return choice_num
+    
     def play(self, player):
-        """播放章节内容"""
-        print(f"\n==== {self.title} ====")
-        print(self.intro)
-        
-        for event in self.events:
-            time.sleep(1)
-            print(f"\n{event}")
-            time.sleep(1.5)
-        
-        if self.choices:
-            print("\n做出你的选择:")
-            for i, choice in enumerate(self.choices, 1):
-                print(f"{i}. {choice['text']}")
-            
-            choice_num = int(input("你的选择 (1-{len(self.choices)}): "))
-            if 1 <= choice_num <= len(self.choices):
-                chosen = self.choices[choice_num - 1]
-                print(f"\n{chosen['result']}")
+        """在控制台播放章节内容"""
+        steps = self.run(player)
+        reply = None
+        try:
+            while True:
+                event = steps.send(reply)
+                reply = None
+                if event["delay"]:
+                    time.sleep(event["delay"])
                 
-                # 执行选择的效果
-                if 'effect' in chosen and callable(chosen['effect']):
-                    chosen['effect'](player)
-                    
-                return choice_num
+                if event["type"] == "title":
+                    print(f"\n==== {event['text']} ====")
+                elif event["type"] == "intro":
+                    print(event["text"])
+                elif event["type"] == "choices":
+                    print("\n做出你的选择:")
+                    for i, text in enumerate(event["choices"], 1):
+                        print(f"{i}. {text}")
+                    reply = int(input(f"你的选择 (1-{len(event['choices'])}): "))
+                else:
+                    print(f"\n{event['text']}")
+        except StopIteration as stop:
+            return stop.value
+
+class ChapterLibrary:
+    """章节库：启动时只读取索引（标题、解锁等级），章节内容在首次访问时加载，
+    最近使用的章节保存在LRU缓存中，章节数量不影响启动时间和常驻内存"""
+    
+    def __init__(self, entries, loader, cache_size=CHAPTER_CACHE_SIZE):
+        self.entries = entries  # 章节索引，每项至少包含title和required_level
+        self._loader = loader  # 根据索引项创建Chapter
+        self._cache = OrderedDict()  # 索引 -> Chapter，按最近使用排序
+        self.cache_size = cache_size
+        self.loads = 0  # 实际加载章节的次数
+    
+    @classmethod
+    def from_directory(cls, directory=STORY_DIR, cache_size=CHAPTER_CACHE_SIZE):
+        """从章节目录加载索引"""
+        with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+            entries = json.load(f)["chapters"]
         
-        return 0
+        def load(entry):
+            with open(os.path.join(directory, entry["file"]), encoding="utf-8") as f:
+                return Chapter.from_dict(json.load(f))
+        
+        return cls(entries, load, cache_size)
+    
+    @classmethod
+    def from_chapters(cls, chapters):
+        """包装已创建好的章节列表"""
+        entries = [{"title": chapter.title, "required_level": chapter.required_level, "chapter": chapter}
+                   for chapter in chapters]
+        return cls(entries, lambda entry: entry["chapter"], cache_size=0)
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.entries)
+        if not 0 <= index < len(self.entries):
+            raise IndexError(index)
+        
+        chapter = self._cache.get(index)
+        if chapter is not None:
+            self._cache.move_to_end(index)
+            return chapter
+        
+        chapter = self._loader(self.entries[index])
+        self.loads += 1
+        if self.cache_size > 0:
+            self._cache[index] = chapter
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return chapter
+    
+    def title(self, index):
+        """章节标题，不加载章节内容"""
+        return self.entries[index]["title"]
+    
+    def required_level(self, index):
+        """章节解锁等级，不加载章节内容"""
+        return self.entries[index].get("required_level", 1)
+
+_default_chapters = None  # 内置章节库，整个进程共享
+
+def default_chapters():
+    """获取内置章节库"""
+    global _default_chapters
+    if _default_chapters is None:
+        _default_chapters = ChapterLibrary.from_directory()
+    return _default_chapters
 
 class Quest:
     """任务类"""
     
-    def __init__(self, name, description, objectives, exp_reward, fame_reward, achievement_points=0, item_reward=None):
+    def __init__(self, name, description, objectives, exp_reward, fame_reward, achievement_points=0, item_reward=None,
+                 trigger=None, requires=None):
         self.name = name  # 任务名称
         self.description = description  # 任务描述
         self.objectives = objectives  # 任务目标
@@ -53,6 +218,8 @@ class Quest:
         self.fame_reward = fame_reward  # 声望奖励
         self.achievement_points = achievement_points  # 成就点数
         self.item_reward = item_reward  # 物品奖励
+        self.trigger = trigger  # 完成条件QuestTrigger，为None时需手动完成
+        self.requires = requires  # 接取条件QuestTrigger
         self.completed = False  # 是否完成
         
     def __str__(self):
@@ -68,338 +235,19 @@ class Quest:
 class Story:
     """游戏剧情类"""
     
-    def __init__(self):
-        self.chapters = self._init_chapters()
+    def __init__(self, chapters=None):
+        # 可传入剧本中的章节（ChapterLibrary或Chapter列表），否则使用内置章节
+        if chapters is None:
+            chapters = default_chapters()
+        elif not isinstance(chapters, ChapterLibrary):
+            chapters = ChapterLibrary.from_chapters(chapters)
+        self.chapters = chapters
         self.current_chapter = 0
         self.chapter_outcomes = {}  # 记录玩家在各章节的选择
         self.completed_chapters = []
         self.quests = self._init_quests()  # 初始化任务
+        self.trackers = {}  # 玩家名 -> 任务跟踪器
         
-    def _init_chapters(self):
-        """初始化游戏章节"""
-        chapters = []
-        
-        # 第一章：黄巾起义
-        yellow_turban_chapter = Chapter(
-            title="黄巾起义",
-            intro="建宁元年(公元168年)，黄巾军揭竿而起，以'苍天已死，黄天当立'为口号，席卷天下。朝廷命各地州郡镇压叛乱...",
-            events=[
-                "你是一名地方上的小官吏，正值壮年，目睹黄巾军的暴行，决定挺身而出。",
-                "当地太守征召勇士组建义军，你毫不犹豫地报名参加。",
-                "在一场战斗中，你表现出色，成功击退了一支黄巾军，救下了一个村庄。",
-                "你的名声开始在当地传开..."
-            ],
-            choices=[
-                {
-                    "text": "加入官军，为朝廷效力",
-                    "result": "你加入了官军，在太守麾下效力。太守对你委以重任，给予你一支小队的指挥权。",
-                    "effect": lambda player: player.gain_fame(20)
-                },
-                {
-                    "text": "自立队伍，招募乡勇",
-                    "result": "你决定自立队伍，招募乡勇保卫家乡。不少当地青壮年响应你的号召，你很快组建了一支小型部队。",
-                    "effect": lambda player: (player.gain_fame(15), setattr(player.armies[0], 'size', player.armies[0].size + 500))
-                },
-                {
-                    "text": "投奔一方诸侯",
-                    "result": "你听闻刘备、曹操、孙坚等人都在各地起兵抗击黄巾，决定前去投奔一方诸侯。",
-                    "effect": lambda player: player.gain_fame(10)
-                }
-            ],
-            required_level=1
-        )
-        chapters.append(yellow_turban_chapter)
-        
-        # 第二章：群雄割据
-        warlords_chapter = Chapter(
-            title="群雄割据",
-            intro="黄巾之乱平定后，各地州牧、刺史拥兵自重，不听朝廷调遣。董卓挟持献帝，专权朝政，天下震动...",
-            events=[
-                "董卓迁都长安，焚烧洛阳，无数百姓流离失所。",
-                "各地诸侯纷纷起兵讨伐董卓，关东联军初具规模。",
-                "你已经拥有了一定声望，开始考虑自己的未来道路。"
-            ],
-            choices=[
-                {
-                    "text": "加入讨董联军",
-                    "result": "你决定加入讨董联军，与各路诸侯共同讨伐董卓。联军盟主袁绍对你的加入表示欢迎。",
-                    "effect": lambda player: player.gain_fame(25)
-                },
-                {
-                    "text": "独自发展实力",
-                    "result": "你认为当前局势混乱，选择暂时独自发展实力，静观其变。你在家乡招募更多兵丁，扩充军备。",
-                    "effect": lambda player: (player.gain_fame(15), setattr(player.armies[0], 'size', player.armies[0].size + 1000))
-                },
-                {
-                    "text": "投靠强大势力",
-                    "result": "你决定投靠一方强大势力，以求自保和发展。经过考虑，你最终选择了前去投奔。",
-                    "effect": lambda player: player.gain_fame(20)
-                }
-            ],
-            required_level=3
-        )
-        chapters.append(warlords_chapter)
-        
-        # 第三章：官渡之战
-        guandu_chapter = Chapter(
-            title="官渡之战",
-            intro="建安五年(公元200年)，曹操与袁绍在官渡展开决战。这场战役将决定中国北方的命运...",
-            events=[
-                "曹操与袁绍两支大军在官渡隔河相望，形势紧张。",
-                "曹军虽然兵力不及袁军，但士气高昂，谋士众多。",
-                "袁军虽然人多势众，但内部不和，军令不一。",
-                "两军相持不下，都在等待战机。"
-            ],
-            choices=[
-                {
-                    "text": "支持曹操",
-                    "result": "你率军支持曹操。曹操亲自接见了你，对你的到来表示感谢。你被安排在右翼军中，准备接下来的大战。",
-                    "effect": lambda player: player.gain_fame(30)
-                },
-                {
-                    "text": "支持袁绍",
-                    "result": "你率军支持袁绍。袁绍对你的加入极为重视，将你安排在前锋部队，准备对曹军发起猛攻。",
-                    "effect": lambda player: player.gain_fame(30)
-                },
-                {
-                    "text": "保持中立，坐观成败",
-                    "result": "你决定保持中立，静观其变。你率军驻扎在官渡周边，随时准备应对局势变化。",
-                    "effect": lambda player: (player.gain_fame(15), setattr(player, 'leadership', player.leadership + 5))
-                }
-            ],
-            required_level=5
-        )
-        chapters.append(guandu_chapter)
-        
-        # 第四章：三国鼎立
-        three_kingdoms_chapter = Chapter(
-            title="三国鼎立",
-            intro="赤壁之战后，曹操据有北方，孙权盘踞江东，刘备占据荆州，三国鼎立的局面初步形成...",
-            events=[
-                "曹操统一北方，自封魏王，实力强盛。",
-                "孙权继承江东基业，与周瑜等名将共同守卫东吴。",
-                "刘备在诸葛亮的辅佐下，开始谋划西蜀之地。",
-                "天下初步呈现三足鼎立之势，战火不断。"
-            ],
-            choices=[
-                {
-                    "text": "效忠魏国",
-                    "result": "你决定效忠曹操建立的魏国。曹操任命你为一方将领，赐予你封地和兵权。",
-                    "effect": lambda player: (player.gain_fame(40), setattr(player, 'leadership', player.leadership + 5), setattr(player.armies[0], 'size', player.armies[0].size + 2000))
-                },
-                {
-                    "text": "归顺蜀汉",
-                    "result": "你选择归顺刘备建立的蜀汉政权。刘备以礼相待，诸葛亮也对你很是欣赏。",
-                    "effect": lambda player: (player.gain_fame(40), setattr(player, 'intelligence', player.intelligence + 5), setattr(player.armies[0], 'size', player.armies[0].size + 1500))
-                },
-                {
-                    "text": "加入东吴",
-                    "result": "你投奔孙权的东吴。孙权对你非常器重，授予你要职，委以重任。",
-                    "effect": lambda player: (player.gain_fame(40), setattr(player, 'politics', player.politics + 5), setattr(player.armies[0], 'size', player.armies[0].size + 1500))
-                },
-                {
-                    "text": "自立为王",
-                    "result": "你决定不臣服于任何一方，而是自立为王，在三国之间开辟属于自己的势力。",
-                    "effect": lambda player: (player.gain_fame(50), setattr(player, 'charisma', player.charisma + 10), setattr(player, 'title', "一方诸侯"))
-                }
-            ],
-            required_level=8
-        )
-        chapters.append(three_kingdoms_chapter)
-        
-        # 第五章：赤壁之战
-        chibi_chapter = Chapter(
-            title="赤壁之战",
-            intro="建安十三年(公元208年)，曹操南下荆州，率水军八十万直指江东，欲一举吞并江南。孙权与刘备结盟，共同抵抗曹操...",
-            events=[
-                "曹操大军南下，连破荆州数城，刘表病逝，其子刘琮投降。",
-                "刘备携民渡江，与孙权结盟。周瑜、诸葛亮等谋士共同商议迎战之策。",
-                "曹军初到江南，水土不服，再加上军中疾病流行，战力有所削弱。",
-                "风向对曹军不利，江东联军决定以火攻破敌..."
-            ],
-            choices=[
-                {
-                    "text": "参与火攻计划",
-                    "result": "你主动请缨，参与周瑜和诸葛亮策划的火攻。在关键时刻，你成功率队引燃曹军战船，为联军立下大功。",
-                    "effect": lambda player: (player.gain_fame(45), setattr(player, 'intelligence', player.intelligence + 5))
-                },
-                {
-                    "text": "负责阻截曹军溃兵",
-                    "result": "你率军在曹军溃败的必经之路上设伏，成功俘虏了大批曹军士兵，斩杀敌将数名。",
-                    "effect": lambda player: (player.gain_fame(40), setattr(player, 'strength', player.strength + 5))
-                },
-                {
-                    "text": "保护后方补给",
-                    "result": "你负责守卫联军后方补给线，击退了曹军的多次偷袭，确保了前线的稳定供应。",
-                    "effect": lambda player: (player.gain_fame(35), setattr(player, 'leadership', player.leadership + 5))
-                }
-            ],
-            required_level=10
-        )
-        chapters.append(chibi_chapter)
-        
-        # 第六章：征讨益州
-        yizhou_chapter = Chapter(
-            title="征讨益州",
-            intro="刘备在诸葛亮的建议下，决定进取益州。刘璋性格懦弱，益州虽大却未善加经营，正是良机...",
-            events=[
-                "刘备借口援助刘璋抵抗张鲁，率军入蜀。",
-                "庞统献计，建议刘备以迅雷不及掩耳之势夺取成都。",
-                "刘璋派遣杨怀、高沛率军阻击，被刘备军击败。",
-                "刘备军队围攻成都，刘璋最终投降，蜀地落入刘备之手。"
-            ],
-            choices=[
-                {
-                    "text": "跟随刘备入蜀",
-                    "result": "你追随刘备入蜀，参与了定军山之战，协助黄忠斩杀夏侯渊，为取蜀立下大功。",
-                    "effect": lambda player: (player.gain_fame(45), setattr(player, 'strength', player.strength + 5), setattr(player.armies[0], 'size', player.armies[0].size + 2000))
-                },
-                {
-                    "text": "留守荆州",
-                    "result": "你被委以重任，留守荆州，抵挡东吴和曹魏的压力，保证刘备后方安全。",
-                    "effect": lambda player: (player.gain_fame(40), setattr(player, 'leadership', player.leadership + 5), setattr(player, 'politics', player.politics + 5))
-                },
-                {
-                    "text": "劝说刘璋投降",
-                    "result": "你深入成都，向刘璋分析利弊，成功说服他投降，避免了一场血战，刘备非常欣赏你的外交才能。",
-                    "effect": lambda player: (player.gain_fame(50), setattr(player, 'intelligence', player.intelligence + 5), setattr(player, 'charisma', player.charisma + 5))
-                }
-            ],
-            required_level=12
-        )
-        chapters.append(yizhou_chapter)
-        
-        # 第七章：汉中之战
-        hanzhong_chapter = Chapter(
-            title="汉中之战",
-            intro="汉中位于蜀中咽喉，是进攻中原的门户，也是曹魏进攻蜀汉的必经之地。刘备决定夺取汉中，为北伐中原做准备...",
-            events=[
-                "刘备命令黄忠、赵云等将领进攻汉中，曹操亲自领兵前来抵抗。",
-                "双方在定军山等地多次交战，战况胶着。",
-                "法正建议断敌粮道，迫使曹军撤退。",
-                "黄忠在定军山一战中斩杀夏侯渊，曹军士气大挫。"
-            ],
-            choices=[
-                {
-                    "text": "参与正面战场",
-                    "result": "你在定军山之战中表现出色，协助击败曹军主力，立下赫赫战功。",
-                    "effect": lambda player: (player.gain_fame(50), setattr(player, 'strength', player.strength + 8), setattr(player, 'leadership', player.leadership + 5))
-                },
-                {
-                    "text": "断敌粮道",
-                    "result": "你率轻骑突袭曹军后方，成功切断了曹军的补给线，迫使曹操无奈撤军。",
-                    "effect": lambda player: (player.gain_fame(55), setattr(player, 'intelligence', player.intelligence + 5), setattr(player.armies[0], 'training', player.armies[0].training + 10))
-                },
-                {
-                    "text": "设伏击杀敌将",
-                    "result": "你在曹军撤退路线上设下埋伏，成功伏击了曹军一支部队，击杀多名敌将。",
-                    "effect": lambda player: (player.gain_fame(45), setattr(player.armies[0], 'experience', player.armies[0].experience + 100), setattr(player, 'strength', player.strength + 5))
-                }
-            ],
-            required_level=15
-        )
-        chapters.append(hanzhong_chapter)
-        
-        # 第八章：夷陵之战
-        yiling_chapter = Chapter(
-            title="夷陵之战",
-            intro="刘备为报关羽之仇，不顾诸葛亮劝阻，执意东征孙权。吴蜀两国由盟友变成了敌人...",
-            events=[
-                "关羽北上攻打曹魏，被东吴吕蒙偷袭荆州，最终战死。",
-                "刘备悲愤交加，决定东征讨伐孙权，为关羽报仇。",
-                "诸葛亮等人多次劝阻，但刘备意已决，率大军出发。",
-                "陆逊使用火攻，大败蜀军，刘备被迫撤退，不久病逝于白帝城。"
-            ],
-            choices=[
-                {
-                    "text": "追随刘备东征",
-                    "result": "你跟随刘备东征，在大军溃败时奋勇掩护，使刘备得以安全撤退。虽然战败，但你的忠诚和勇气获得了刘备的赞赏。",
-                    "effect": lambda player: (player.gain_fame(40), setattr(player, 'loyalty', 100), setattr(player, 'strength', player.strength + 5))
-                },
-                {
-                    "text": "支持诸葛亮留守",
-                    "result": "你支持诸葛亮的观点，留守成都，保障后方安全。东征失败后，你协助诸葛亮安定朝局，稳定军心。",
-                    "effect": lambda player: (player.gain_fame(35), setattr(player, 'intelligence', player.intelligence + 5), setattr(player, 'politics', player.politics + 8))
-                },
-                {
-                    "text": "尝试调解吴蜀关系",
-                    "result": "你冒险前往东吴，尝试调解两国关系，虽未能阻止战争，但为日后两国重修于好埋下了伏笔。",
-                    "effect": lambda player: (player.gain_fame(50), setattr(player, 'charisma', player.charisma + 10), setattr(player, 'politics', player.politics + 5))
-                }
-            ],
-            required_level=18
-        )
-        chapters.append(yiling_chapter)
-        
-        # 第九章：北伐中原
-        northern_expedition_chapter = Chapter(
-            title="北伐中原",
-            intro="刘备病逝，托孤于诸葛亮。诸葛亮为实现先主遗愿，恢复汉室，开始了一系列北伐曹魏的战争...",
-            events=[
-                "诸葛亮励精图治，政通人和，蜀国国力逐渐恢复。",
-                "为联合东吴抗魏，诸葛亮亲自前往东吴，与陆逊达成同盟。",
-                "诸葛亮率军出祁山，与魏军大将军司马懿对峙。",
-                "双方多次交战，但因粮尽，诸葛亮被迫撤军。"
-            ],
-            choices=[
-                {
-                    "text": "随诸葛亮北伐",
-                    "result": "你随诸葛亮北伐，在多次战役中表现出色。虽然最终撤军，但你的军事才能得到了诸葛亮的高度认可。",
-                    "effect": lambda player: (player.gain_fame(60), setattr(player, 'leadership', player.leadership + 10), setattr(player.armies[0], 'training', player.armies[0].training + 15))
-                },
-                {
-                    "text": "负责军需后勤",
-                    "result": "你负责北伐军队的后勤补给，多次组织大规模运粮，确保前线军需充足，为军队作战提供了坚实保障。",
-                    "effect": lambda player: (player.gain_fame(55), setattr(player, 'intelligence', player.intelligence + 5), setattr(player, 'politics', player.politics + 5))
-                },
-                {
-                    "text": "镇守边境重地",
-                    "result": "你被委派镇守蜀国边境重地，抵挡魏军的多次进攻，保证了北伐军队的侧翼安全。",
-                    "effect": lambda player: (player.gain_fame(50), setattr(player, 'strength', player.strength + 5), setattr(player.armies[0], 'morale', player.armies[0].morale + 20))
-                }
-            ],
-            required_level=20
-        )
-        chapters.append(northern_expedition_chapter)
-        
-        # 第十章：三分归一
-        unification_chapter = Chapter(
-            title="三分归一",
-            intro="诸葛亮五次北伐，最终因积劳成疾，病逝于五丈原。司马氏篡魏，司马炎废魏帝曹奂，建立晋朝，随后灭吴，三国归于一统...",
-            events=[
-                "诸葛亮病逝，蜀汉朝政逐渐衰败，最终被魏国司马氏所灭。",
-                "魏国司马氏逐渐掌权，司马懿之孙司马炎废黜魏帝，建立晋朝。",
-                "晋朝大军压境，东吴独木难支，最终灭亡。",
-                "天下重归一统，但战乱的创伤需要时间愈合..."
-            ],
-            choices=[
-                {
-                    "text": "归顺晋朝",
-                    "result": "你看清大势，主动归顺晋朝。司马炎赏识你的才能，委以重任，你在新的朝代继续发挥自己的才能。",
-                    "effect": lambda player: (player.gain_fame(70), setattr(player, 'politics', player.politics + 10), setattr(player, 'title', "晋朝重臣"))
-                },
-                {
-                    "text": "退隐江湖",
-                    "result": "你选择功成身退，辞官归隐，在山水之间寄情山水，著书立说，传播三国故事。",
-                    "effect": lambda player: (player.gain_fame(60), setattr(player, 'intelligence', player.intelligence + 10), setattr(player, 'title', "隐世名士"))
-                },
-                {
-                    "text": "组织残部抵抗",
-                    "result": "你率领残余忠义之士，在偏远地区建立根据地，虽然知道大势已去，但仍然坚持抵抗，成为一段佳话。",
-                    "effect": lambda player: (player.gain_fame(80), setattr(player, 'strength', player.strength + 5), setattr(player, 'charisma', player.charisma + 5), setattr(player, 'title', "乱世英雄"))
-                },
-                {
-                    "text": "重建新政权",
-                    "result": "你不甘心就此屈服，在混乱中趁机建立自己的势力，虽然规模不大，但在一方土地上成为了实际统治者。",
-                    "effect": lambda player: (player.gain_fame(90), setattr(player, 'leadership', player.leadership + 10), setattr(player, 'title', "一方霸主"))
-                }
-            ],
-            required_level=25
-        )
-        chapters.append(unification_chapter)
-        
-        return chapters
-    
     def _init_quests(self):
         """初始化任务列表"""
         quests = []
@@ -410,7 +258,8 @@ class Story:
             description="招募1000名士兵，组建自己的军队",
             objectives=["招募1000名士兵"],
             exp_reward=100,
-            fame_reward=10
+            fame_reward=10,
+            trigger=QuestTrigger("army_size", 1000)
         )
         quests.append(recruit_quest)
         
@@ -419,7 +268,8 @@ class Story:
             description="将军队训练度提升到80以上",
             objectives=["提升军队训练度到80"],
             exp_reward=150,
-            fame_reward=15
+            fame_reward=15,
+            trigger=QuestTrigger("max_training", 80)
         )
         quests.append(training_quest)
         
@@ -439,7 +289,8 @@ class Story:
             objectives=["获得战斗胜利1次"],
             exp_reward=250,
             fame_reward=25,
-            achievement_points=2
+            achievement_points=2,
+            trigger=QuestTrigger("battle_victories", 1)
         )
         quests.append(battle_quest)
         
@@ -450,7 +301,8 @@ class Story:
             objectives=["攻占1座城池"],
             exp_reward=500,
             fame_reward=50,
-            achievement_points=5
+            achievement_points=5,
+            trigger=QuestTrigger("city_count", 1)
         )
         quests.append(city_quest)
         
@@ -460,7 +312,8 @@ class Story:
             objectives=["招募3名将领"],
             exp_reward=400,
             fame_reward=40,
-            achievement_points=3
+            achievement_points=3,
+            trigger=QuestTrigger("general_count", 3)
         )
         quests.append(general_quest)
         
@@ -470,7 +323,8 @@ class Story:
             objectives=["与1个势力结盟"],
             exp_reward=350,
             fame_reward=35,
-            achievement_points=3
+            achievement_points=3,
+            trigger=QuestTrigger("alliance_count", 1)
         )
         quests.append(alliance_quest)
         
@@ -480,7 +334,8 @@ class Story:
             objectives=["扩充军队至10000人"],
             exp_reward=600,
             fame_reward=60,
-            achievement_points=6
+            achievement_points=6,
+            trigger=QuestTrigger("army_size", 10000)
         )
         quests.append(army_quest)
         
@@ -491,7 +346,9 @@ class Story:
             objectives=["攻占10座城池"],
             exp_reward=1000,
             fame_reward=100,
-            achievement_points=10
+            achievement_points=10,
+            trigger=QuestTrigger("city_count", 10),
+            requires=QuestTrigger("city_count", 3)
         )
         quests.append(conquer_quest)
         
@@ -501,23 +358,42 @@ class Story:
             objectives=["声望达到1000"],
             exp_reward=1500,
             fame_reward=150,
-            achievement_points=15
+            achievement_points=15,
+            trigger=QuestTrigger("fame", 1000),
+            requires=QuestTrigger("fame", 500)
         )
         quests.append(legendary_quest)
         
         return quests
     
+    def check_chapter(self, chapter_index, player):
+        """检查章节能否进行，返回不能进行的原因，可以进行时返回None"""
+        if chapter_index < 0 or chapter_index >= len(self.chapters):
+            return "无效的章节索引"
+        
+        required_level = self.chapters.required_level(chapter_index)
+        if player.level < required_level:
+            return f"需要达到{required_level}级才能进行此章节"
+        return None
+    
     def play_chapter(self, chapter_index, player):
         """播放特定章节"""
-        if chapter_index < 0 or chapter_index >= len(self.chapters):
-            print("无效的章节索引")
-            return
-            
-        if player.level < self.chapters[chapter_index].required_level:
-            print(f"需要达到{self.chapters[chapter_index].required_level}级才能进行此章节")
+        reason = self.check_chapter(chapter_index, player)
+        if reason:
+            print(reason)
             return
             
         outcome = self.chapters[chapter_index].play(player)
+        return self.finish_chapter(chapter_index, player, outcome)
+    
+    def start_chapter(self, chapter_index, player, now=0.0):
+        """开始非阻塞地播放章节，返回StorySession，不能进行时返回None"""
+        if self.check_chapter(chapter_index, player):
+            return None
+        return StorySession(self, chapter_index, player, now)
+    
+    def finish_chapter(self, chapter_index, player, outcome):
+        """记录章节结果并发放章节奖励"""
         self.chapter_outcomes[chapter_index] = outcome
         
         if chapter_index not in self.completed_chapters:
@@ -531,21 +407,20 @@ class Story:
     def get_available_chapters(self, player):
         """获取玩家当前可用的章节"""
         available = []
-        for i, chapter in enumerate(self.chapters):
-            if player.level >= chapter.required_level:
-                available.append((i, chapter.title))
+        for i in range(len(self.chapters)):
+            if player.level >= self.chapters.required_level(i):
+                available.append((i, self.chapters.title(i)))
         return available
     
     def get_next_chapter(self, player):
         """获取下一个可用章节"""
         if self.current_chapter < len(self.chapters):
-            chapter = self.chapters[self.current_chapter]
-            if player.level >= chapter.required_level:
+            if player.level >= self.chapters.required_level(self.current_chapter):
                 return self.current_chapter
         
         # 寻找其他未完成的章节
-        for i, chapter in enumerate(self.chapters):
-            if i not in self.completed_chapters and player.level >= chapter.required_level:
+        for i in range(len(self.chapters)):
+            if i not in self.completed_chapters and player.level >= self.chapters.required_level(i):
                 return i
                 
         return None
@@ -555,67 +430,179 @@ class Story:
         available = []
         for quest in self.quests:
             if quest not in player.quests and quest not in player.completed_quests:
-                if quest.name == "横扫六合" and len(player.kingdom.cities) < 3:
-                    continue  # 需要至少有3座城市才能接"横扫六合"任务
-                elif quest.name == "威震华夏" and player.fame < 500:
-                    continue  # 需要至少500声望才能接"威震华夏"任务
+                if quest.requires and not quest.requires.is_met(player):
+                    continue  # 未满足接取条件，如"横扫六合"需要至少3座城市
                 
                 available.append(quest)
         return available
     
+    def get_tracker(self, player):
+        """获取玩家的任务跟踪器，首次获取时跟踪玩家已有的任务"""
+        tracker = self.trackers.get(player.name)
+        if tracker is None or tracker.player is not player:
+            if tracker is not None:
+                tracker.detach()
+            tracker = QuestTracker(player)
+            for quest in player.quests:
+                tracker.add_quest(quest)
+            tracker.attach()
+            self.trackers[player.name] = tracker
+        return tracker
+    
     def assign_quest(self, player, quest_index):
         """分配任务给玩家"""
         available_quests = self.get_available_quests(player)
         if 0 <= quest_index < len(available_quests):
             quest = available_quests[quest_index]
-            player.add_quest(quest)
+            # 先取得跟踪器：首次创建时会跟踪玩家已有的任务，不能包含刚接取的这一个
+            tracker = self.get_tracker(player)
+            if player.add_quest(quest):
+                tracker.add_quest(quest)
             return quest
         return None
     
     def check_quest_completion(self, player):
-        """检查玩家任务完成情况"""
-        completed = []
-        
-        for quest in player.quests:
-            completed_flag = False
-            
-            # 根据任务类型检查完成条件
-            if quest.name == "招兵买马":
-                if player.total_army_size() >= 1000:
-                    completed_flag = True
-            
-            elif quest.name == "训练精兵":
-                if any(army.training >= 80 for army in player.armies):
-                    completed_flag = True
-            
-            elif quest.name == "初试锋芒":
-                # 假设战斗胜利已在别处记录
-                if hasattr(player, 'battle_victories') and player.battle_victories > 0:
-                    completed_flag = True
-            
-            elif quest.name == "据城称雄":
-                if player.kingdom and len(player.kingdom.cities) > 0:
-                    completed_flag = True
-            
-            elif quest.name == "招贤纳士":
-                if len(player.kingdom.generals) >= 3:
-                    completed_flag = True
-            
-            elif quest.name == "千军万马":
-                if player.total_army_size() >= 10000:
-                    completed_flag = True
-            
-            elif quest.name == "横扫六合":
-                if player.kingdom and len(player.kingdom.cities) >= 10:
-                    completed_flag = True
-            
-            elif quest.name == "威震华夏":
-                if player.fame >= 1000:
-                    completed_flag = True
-            
-            # 处理完成的任务
-            if completed_flag:
-                player.complete_quest(quest)
-                completed.append(quest)
+        """检查玩家任务完成情况
         
-        return completed 
\ No newline at end of file
+        只检查上次检查以来发生变化的数值所对应的任务，
+        任务需通过assign_quest接取才会被跟踪
+        """
+        return self.get_tracker(player).collect_completed() 
+
+class StorySession:
+    """一名玩家正在进行的章节
+    
+    章节生成器推进到需要玩家选择为止，产出的事件按各自的delay排入时间线，
+    poll()只取出到时间的事件，choose()送入选择后继续推进。
+    不使用线程和sleep，可以在arcade的on_update或服务器的事件循环中驱动。
+    """
+    
+    def __init__(self, story, chapter_index, player, now=0.0):
+        self.story = story
+        self.chapter_index = chapter_index
+        self.player = player
+        self.choices = None  # 等待选择时为选项文本列表
+        self.finished = False
+        self.outcome = None  # 章节结束时选择的序号
+        self._steps = story.chapters[chapter_index].run(player)
+        self._timeline = deque()  # (显示时间, 事件)
+        self._last_due = now
+        self._advance(now, None)
+    
+    def _advance(self, now, reply):
+        """推进章节直到需要选择或结束"""
+        due = max(now, self._last_due)
+        try:
+            event = self._steps.send(reply)
+            while True:
+                due += event["delay"]
+                self._timeline.append((due, event))
+                if event["type"] == "choices":
+                    self.choices = event["choices"]
+                    break
+                event = next(self._steps)
+        except StopIteration as stop:
+            self.finished = True
+            self.outcome = stop.value
+            self.story.finish_chapter(self.chapter_index, self.player, self.outcome)
+            self._timeline.append((due, {"type": "end", "outcome": self.outcome, "delay": 0}))
+        self._last_due = due
+    
+    @property
+    def next_due(self):
+        """下一个事件的显示时间，没有待显示事件时为None"""
+        return self._timeline[0][0] if self._timeline else None
+    
+    def poll(self, now):
+        """取出所有到时间的事件"""
+        ready = []
+        while self._timeline and self._timeline[0][0] <= now:
+            ready.append(self._timeline.popleft()[1])
+        return ready
+    
+    def flush(self):
+        """忽略等待时间，取出所有已产出的事件（跳过动画时使用）"""
+        ready = [event for _, event in self._timeline]
+        self._timeline.clear()
+        return ready
+    
+    def choose(self, choice_num, now=0.0):
+        """送入玩家的选择，选择无效或当前不需要选择时返回False"""
+        if self.choices is None or not 1 <= choice_num <= len(self.choices):
+            return False
+        self.choices = None
+        self._advance(now, choice_num)
+        return True
+
+class StoryRuntime:
+    """在一个线程内驱动大量玩家的剧情
+    
+    各会话按下一个事件的显示时间放入最小堆，poll()只处理到时间的会话，
+    开销与当前需要显示事件的玩家数有关，而与在线玩家总数无关。
+    """
+    
+    def __init__(self):
+        self.sessions = {}  # 玩家标识 -> StorySession
+        self._timeline = []  # (显示时间, 序号, 玩家标识, 会话)
+        self._scheduled = {}  # 玩家标识 -> 堆中有效条目的(显示时间, 会话)
+        self._counter = 0
+    
+    def _schedule(self, key, session):
+        due = session.next_due
+        if due is None:
+            return
+        entry = self._scheduled.get(key)
+        # 同一时间重新开始章节时会话已被替换，旧条目不能代替新会话
+        if entry is None or entry[0] != due or entry[1] is not session:
+            self._counter += 1
+            self._scheduled[key] = (due, session)
+            heapq.heappush(self._timeline, (due, self._counter, key, session))
+    
+    def start(self, key, story, chapter_index, player, now=0.0):
+        """为玩家开始章节，返回会话，不能进行时返回None"""
+        session = story.start_chapter(chapter_index, player, now)
+        if session is None:
+            return None
+        self.sessions[key] = session
+        self._schedule(key, session)
+        return session
+    
+    def choose(self, key, choice_num, now=0.0):
+        """送入玩家的选择"""
+        session = self.sessions.get(key)
+        if session is None or not session.choose(choice_num, now):
+            return False
+        self._schedule(key, session)
+        return True
+    
+    def stop(self, key):
+        """结束玩家的剧情会话（如玩家下线），返回被移除的会话"""
+        self._scheduled.pop(key, None)  # 堆中的旧条目在poll()时跳过
+        return self.sessions.pop(key, None)
+    
+    def poll(self, now):
+        """取出所有到时间的事件
+        
+        Returns:
+            dict: 玩家标识 -> 事件列表；章节结束的会话会被移除
+        """
+        ready = {}
+        timeline = self._timeline
+        while timeline and timeline[0][0] <= now:
+            due, _, key, session = heapq.heappop(timeline)
+            entry = self._scheduled.get(key)
+            if self.sessions.get(key) is not session or entry is None or entry[1] is not session or entry[0] != due:
+                continue  # 会话已被替换、结束，或条目已过期
+            del self._scheduled[key]
+            events = session.poll(now)
+            if events:
+                ready.setdefault(key, []).extend(events)
+            if session.finished and session.next_due is None:
+                del self.sessions[key]
+            else:
+                self._schedule(key, session)
+        return ready
+    
+    def waiting_count(self):
+        """等待玩家选择的会话数"""
+        return sum(1 for session in self.sessions.values() if session.choices is not None)
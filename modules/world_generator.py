@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+合成世界生成模块
+按固定随机种子生成任意规模的势力、城市（含相邻关系）、将领和军队，
+用于暴露Kingdom.monthly_update、top_generals、Battle等在大规模数据下的性能问题。
+
+- generate_world: 生成完整的、已建立归属关系的世界对象
+- iter_*_rows / stream_world: 流式模式，逐条产出剧本格式的数据，不在内存中保留整体结果
+- write_scenario_pack: 流式写出剧本包（modules.scenario可直接加载）
+- run_benchmarks: 在基础规模的10倍、100倍、1000倍世界上运行性能测试
+
+命令行: python -m modules.world_generator --scales 10 100 1000
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+
+from models.army import Army, TroopType
+from models.city import City
+from models.general import General, Skill
+from models.kingdom import Kingdom
+from modules.battle import Battle
+
+# 基础规模：与内置数据相当
+BASE_WORLD = {
+    "kingdoms": 3,
+    "cities": 8,
+    "generals": 24,
+    "armies": 6,
+}
+
+BENCHMARK_SCALES = (10, 100, 1000)
+
+SURNAMES = "曹刘孙袁董吕马张关赵黄周陆甘夏许司诸徐庞姜邓钟荀郭贾程鲁"
+GIVEN_NAMES = "操备权绍卓布超飞羽云忠瑜逊宁惇褚懿亮晃统维艾会彧嘉诩昱肃"
+REGIONS = ("中原", "关中", "河北", "江东", "益州", "荆州", "徐州", "凉州", "幽州", "交州")
+COLORS = ("蓝色", "绿色", "红色", "黄色", "紫色", "黑色", "白色", "橙色")
+
+# 将领类型: (权重, 各属性的均值和标准差, 倾向的技能)
+ARCHETYPES = (
+    (0.35, {"leadership": (70, 12), "strength": (80, 10), "intelligence": (45, 15),
+            "politics": (40, 15), "charisma": (60, 15)},
+     (Skill.DUEL, Skill.CHARGE, Skill.COUNTER, Skill.IRON_DEFENSE)),  # 武将
+    (0.25, {"leadership": (60, 15), "strength": (35, 12), "intelligence": (82, 10),
+            "politics": (70, 12), "charisma": (60, 15)},
+     (Skill.WISDOM, Skill.FIRE_ATTACK, Skill.WATER_STRATEGY, Skill.AMBUSH)),  # 谋士
+    (0.15, {"leadership": (82, 8), "strength": (70, 12), "intelligence": (70, 12),
+            "politics": (55, 15), "charisma": (70, 12)},
+     (Skill.INSPIRE, Skill.FORMATION_BREAK, Skill.SIEGE, Skill.LOGISTICS)),  # 统帅
+    (0.25, {"leadership": (45, 15), "strength": (30, 12), "intelligence": (70, 12),
+            "politics": (80, 10), "charisma": (65, 15)},
+     (Skill.LOGISTICS, Skill.INSPIRE, Skill.WISDOM)),  # 文官
+)
+SKILL_COUNT_WEIGHTS = (0.2, 0.45, 0.25, 0.1)  # 拥有0-3个技能的概率
+
+# 兵种出现的权重
+TROOP_WEIGHTS = (
+    (TroopType.INFANTRY, 30), (TroopType.CAVALRY, 15), (TroopType.ARCHER, 15),
+    (TroopType.SPEARMAN, 15), (TroopType.CROSSBOWMAN, 8), (TroopType.SHIELDED, 8),
+    (TroopType.NAVY, 5), (TroopType.SIEGE, 4),
+)
+
+def scaled_counts(scale):
+    """返回基础规模乘以倍数后的各项数量"""
+    return {name: count * scale for name, count in BASE_WORLD.items()}
+
+def general_name(index):
+    """按编号生成不重复的将领姓名"""
+    combos = len(SURNAMES) * len(GIVEN_NAMES)
+    name = SURNAMES[index % len(SURNAMES)] + GIVEN_NAMES[(index // len(SURNAMES)) % len(GIVEN_NAMES)]
+    return name if index < combos else f"{name}{index // combos}"
+
+def kingdom_name(index):
+    """按编号生成势力名称"""
+    return f"势力{index + 1}"
+
+def city_name(index):
+    """按编号生成城市名称"""
+    return f"城{index + 1}"
+
+def city_owner_index(city_index, city_count, kingdom_count):
+    """城市按编号分成连续的块分配给各势力，使势力领土在网格上基本相连"""
+    return city_index * kingdom_count // city_count
+
+def grid_neighbors(index, count):
+    """城市排列在近似正方形的网格上，相邻关系只由编号计算，不占用内存"""
+    width = max(1, math.isqrt(count - 1) + 1) if count > 1 else 1
+    row, col = divmod(index, width)
+    neighbors = []
+    for d_row, d_col in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        r, c = row + d_row, col + d_col
+        if r >= 0 and 0 <= c < width:
+            neighbor = r * width + c
+            if neighbor < count:
+                neighbors.append(neighbor)
+    return neighbors
+
+def _stat(rng, mean, deviation):
+    return max(1, min(100, int(round(rng.gauss(mean, deviation)))))
+
+def iter_kingdom_rows(count, seed=0):
+    """流式生成势力数据"""
+    rng = random.Random(f"{seed}-kingdoms")
+    for i in range(count):
+        yield {"name": kingdom_name(i), "leader": general_name(rng.randrange(1 << 20)), "color": COLORS[i % len(COLORS)]}
+
+def iter_city_rows(count, kingdom_count=0, seed=0):
+    """流式生成城市数据，neighbors为相邻城市的编号"""
+    rng = random.Random(f"{seed}-cities")
+    for i in range(count):
+        population = max(5000, min(300000, int(rng.lognormvariate(10.8, 0.5))))
+        row = {
+            "name": city_name(i),
+            "population": population,
+            "prosperity": rng.randint(30, 90),
+            "farms": max(5, int(population / 1500 * rng.uniform(0.7, 1.3))),
+            "mines": rng.randint(0, 25),
+            "forts": rng.choices((1, 2, 3), weights=(6, 3, 1))[0],
+            "region": rng.choice(REGIONS),
+            "neighbors": grid_neighbors(i, count),
+        }
+        if kingdom_count:
+            row["owner"] = kingdom_name(city_owner_index(i, count, kingdom_count))
+        yield row
+
+def iter_general_rows(count, kingdom_count=0, seed=0):
+    """流式生成将领数据，属性按将领类型的正态分布生成，kingdom_index为所属势力的编号（独立将领为None）"""
+    rng = random.Random(f"{seed}-generals")
+    weights = [archetype[0] for archetype in ARCHETYPES]
+    for i in range(count):
+        _, stats, preferred_skills = rng.choices(ARCHETYPES, weights=weights)[0]
+        row = {"name": general_name(i)}
+        owner = rng.randrange(kingdom_count) if kingdom_count else None
+        row["kingdom"] = kingdom_name(owner) if owner is not None else "独立"
+        row["kingdom_index"] = owner
+        for stat, (mean, deviation) in stats.items():
+            row[stat] = _stat(rng, mean, deviation)
+
+        # 顶尖人才多一个技能，技能大多来自该类型倾向的技能
+        skill_count = rng.choices(range(len(SKILL_COUNT_WEIGHTS)), weights=SKILL_COUNT_WEIGHTS)[0]
+        if max(row[stat] for stat in stats) >= 90:
+            skill_count += 1
+        skills = []
+        for _ in range(skill_count):
+            pool = preferred_skills if rng.random() < 0.8 else tuple(Skill)
+            skill = rng.choice(pool)
+            if skill not in skills:
+                skills.append(skill)
+        row["skills"] = [skill.value for skill in skills]
+
+        if Skill.CHARGE in skills or rng.random() < 0.05:
+            troop = rng.choices([t for t, _ in TROOP_WEIGHTS], weights=[w for _, w in TROOP_WEIGHTS])[0]
+            row["troops_bonus"] = {troop.value: round(rng.uniform(0.1, 0.25), 2)}
+        yield row
+
+def iter_armies(count, size_range=(1000, 10000), seed=0):
+    """流式生成军队对象"""
+    rng = random.Random(f"{seed}-armies")
+    troops = [troop for troop, _ in TROOP_WEIGHTS]
+    weights = [weight for _, weight in TROOP_WEIGHTS]
+    for _ in range(count):
+        primary = rng.choices(troops, weights=weights)[0]
+        secondary = rng.choices(troops, weights=weights)[0] if rng.random() < 0.3 else None
+        if secondary == primary:
+            secondary = None
+        yield Army(
+            size=rng.randint(*size_range),
+            morale=rng.randint(50, 95),
+            training=rng.randint(40, 90),
+            primary_type=primary,
+            secondary_type=secondary
+        )
+
+def general_from_row(row):
+    """根据将领数据创建将领对象"""
+    general = General(
+        name=row["name"],
+        leadership=row["leadership"],
+        strength=row["strength"],
+        intelligence=row["intelligence"],
+        politics=row["politics"],
+        charisma=row["charisma"],
+        kingdom_name=row["kingdom"]
+    )
+    for skill in row["skills"]:
+        general.add_skill(Skill(skill))
+    if "troops_bonus" in row:
+        general.troops_bonus = {TroopType(troop): bonus for troop, bonus in row["troops_bonus"].items()}
+    return general
+
+def city_from_row(row):
+    """根据城市数据创建城市对象"""
+    return City(row["name"], row["population"], row["prosperity"], row["farms"],
+                row["mines"], row["forts"], row["region"])
+
+def stream_world(kingdoms, cities, generals, armies=0, army_size=(1000, 10000), seed=0):
+    """流式产出整个世界，每次产出一条 (类型, 数据) 记录
+
+    势力、城市产出剧本格式的字典，将领产出 (剧本格式的字典, 所属势力编号)，军队产出 (Army, 所属势力编号)；
+    生成器本身不保留任何已产出的数据。
+    """
+    for row in iter_kingdom_rows(kingdoms, seed):
+        yield "kingdom", row
+    for row in iter_city_rows(cities, kingdoms, seed):
+        yield "city", row
+    for row in iter_general_rows(generals, kingdoms, seed):
+        yield "general", (row, row.pop("kingdom_index"))
+    for i, army in enumerate(iter_armies(armies, army_size, seed)):
+        yield "army", (army, i % kingdoms if kingdoms else None)
+
+def generate_world(kingdoms, cities, generals, armies=0, army_size=(1000, 10000), seed=0):
+    """生成完整的世界对象
+
+    Returns:
+        dict: kingdoms/cities/generals/armies为对象列表，adjacency为城市编号的相邻表
+    """
+    world = {"kingdoms": [], "cities": [], "generals": [], "armies": [], "adjacency": []}
+    for kind, data in stream_world(kingdoms, cities, generals, armies, army_size, seed):
+        if kind == "kingdom":
+            world["kingdoms"].append(Kingdom(data["name"], data["leader"], data["color"]))
+        elif kind == "city":
+            city = city_from_row(data)
+            world["cities"].append(city)
+            world["adjacency"].append(data["neighbors"])
+            if "owner" in data:
+                world["kingdoms"][city_owner_index(len(world["cities"]) - 1, cities, kingdoms)].add_city(city)
+        elif kind == "general":
+            row, owner = data
+            general = general_from_row(row)
+            world["generals"].append(general)
+            if owner is not None:
+                world["kingdoms"][owner].add_general(general)
+        else:
+            army, owner = data
+            world["armies"].append(army)
+            if owner is not None:
+                world["kingdoms"][owner].add_army(army)
+    return world
+
+def generate_scaled_world(scale, seed=0):
+    """生成基础规模指定倍数的世界"""
+    counts = scaled_counts(scale)
+    return generate_world(counts["kingdoms"], counts["cities"], counts["generals"], counts["armies"], seed=seed)
+
+def write_scenario_pack(path, kingdoms, cities, generals, seed=0, name="合成世界"):
+    """流式写出剧本包，内存占用与规模无关"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{" + f'"name": {json.dumps(name, ensure_ascii=False)}')
+        for section, rows in (
+            ("kingdoms", iter_kingdom_rows(kingdoms, seed)),
+            ("cities", iter_city_rows(cities, kingdoms, seed)),
+            ("generals", iter_general_rows(generals, kingdoms, seed)),
+        ):
+            f.write(f',\n"{section}": [')
+            for i, row in enumerate(rows):
+                row.pop("neighbors", None)
+                row.pop("kingdom_index", None)
+                f.write(("," if i else "") + "\n  " + json.dumps(row, ensure_ascii=False))
+            f.write("\n]")
+        f.write("\n}\n")
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+def benchmark_world(scale, seed=0):
+    """在指定倍数的世界上测量各项操作耗时（秒）"""
+    results = {"scale": scale}
+    results["generate"] = _timed(lambda: results.setdefault("world", generate_scaled_world(scale, seed)))
+    world = results.pop("world")
+    kingdoms = world["kingdoms"]
+
+    random.seed(seed)  # monthly_update中的随机事件使用全局随机数
+    results["monthly_update"] = _timed(lambda: [kingdom.monthly_update() for kingdom in kingdoms])
+    results["top_generals"] = _timed(lambda: [kingdom.top_generals() for kingdom in kingdoms])
+
+    # 奇偶编号的势力分为两个阵营会战，参战军队数随规模增长
+    attacker_armies = [army for kingdom in kingdoms[0::2] for army in kingdom.armies]
+    defender_armies = [army for kingdom in kingdoms[1::2] for army in kingdom.armies]
+    battle = Battle(attacker_armies, defender_armies, kingdoms[0].top_generals(), kingdoms[1].top_generals(),
+                    dramatic_pauses=False)
+    results["battle_armies"] = len(attacker_armies) + len(defender_armies)
+    results["battle"] = _timed(battle.simulate_battle)
+    results["battle_log_lines"] = len(battle.battle_log)
+    return results
+
+def run_benchmarks(scales=BENCHMARK_SCALES, seed=0):
+    """依次在各倍数的世界上运行性能测试并打印结果"""
+    rows = []
+    print(f"{'倍数':>6} {'生成':>9} {'月度更新':>9} {'top_generals':>12} {'战斗':>9} {'参战军队':>8}")
+    for scale in scales:
+        result = benchmark_world(scale, seed)
+        rows.append(result)
+        print(f"{scale:>6} {result['generate'] * 1000:>7.1f}ms {result['monthly_update'] * 1000:>7.1f}ms "
+              f"{result['top_generals'] * 1000:>10.1f}ms {result['battle'] * 1000:>7.1f}ms {result['battle_armies']:>8}")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="合成世界生成与性能测试")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(BENCHMARK_SCALES), help="世界规模倍数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--scenario", help="只写出剧本包到指定路径，规模取--scales的第一个值")
+    args = parser.parse_args()
+
+    if args.scenario:
+        counts = scaled_counts(args.scales[0])
+        write_scenario_pack(args.scenario, counts["kingdoms"], counts["cities"], counts["generals"], args.seed)
+        print(f"剧本包已写出: {args.scenario}")
+    else:
+        run_benchmarks(args.scales, args.seed)
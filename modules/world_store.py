@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+世界数据库模块
+把长期运行的共享世界（势力、城市、军队、将领和玩家）保存在SQLite数据库中，每个实体一行。
+行数据与增量存档日志使用相同的编码（见save_journal.py），另外把查询用到的所属势力、
+战斗力等字段单独存为带索引的列。
+
+- 模型经observer通知变更，只合并到待写集合；每个tick调用flush()，在一个事务中
+  按表用executemany批量写入（sqlite3缓存预编译语句），数据库使用WAL模式
+- 已写入或读出的实体保存在身份映射中：重复读取同一实体不再访问数据库，
+  且同一存档键始终对应同一个对象
+"""
+
+import json
+import sqlite3
+import weakref
+
+from models.army import Army, reserve_army_id
+from models.observer import add_listener, remove_listener
+from modules.save_journal import ENTITY_CLASSES, RESTORE_DEFAULTS, decode_value, encode_entity, entity_key
+
+# 实体类型 -> 表名
+TABLES = {
+    "Kingdom": "kingdoms",
+    "City": "cities",
+    "Army": "armies",
+    "General": "generals",
+    "Player": "players",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kingdoms (key TEXT PRIMARY KEY, name TEXT NOT NULL, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS cities (key TEXT PRIMARY KEY, owner TEXT, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS armies (key TEXT PRIMARY KEY, owner TEXT, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS generals (key TEXT PRIMARY KEY, kingdom TEXT, power INTEGER, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS players (key TEXT PRIMARY KEY, kingdom TEXT, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS cities_by_owner ON cities (owner);
+CREATE INDEX IF NOT EXISTS armies_by_owner ON armies (owner);
+CREATE INDEX IF NOT EXISTS generals_by_kingdom_power ON generals (kingdom, power DESC);
+CREATE INDEX IF NOT EXISTS players_by_kingdom ON players (kingdom);
+"""
+
+def _kingdom_ref(name):
+    return f"Kingdom:{name}" if name else None
+
+# 实体类型 -> (带索引的列, 读取列值的函数)
+# 军队本身不记录归属，owner列在写入其所属势力或玩家时更新
+INDEXED_COLUMNS = {
+    "Kingdom": (("name",), lambda kingdom: (kingdom.name,)),
+    "City": (("owner",), lambda city: (entity_key(city.owner) if city.owner else None,)),
+    "Army": ((), lambda army: ()),
+    "General": (("kingdom", "power"),
+                lambda general: (_kingdom_ref(general.kingdom_name), general.calculate_battle_power())),
+    "Player": (("kingdom",), lambda player: (entity_key(player.kingdom) if player.kingdom else None,)),
+}
+
+# 持有军队列表的实体类型
+ARMY_OWNERS = ("Kingdom", "Player")
+
+def _upsert_sql(cls_name):
+    columns = ("key",) + INDEXED_COLUMNS[cls_name][0] + ("data",)
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+    return (f"INSERT INTO {TABLES[cls_name]} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (key) DO UPDATE SET {updates}")
+
+UPSERT_SQL = {cls_name: _upsert_sql(cls_name) for cls_name in TABLES}
+
+class WorldStore:
+    """SQLite世界数据库"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None)  # 自行管理事务
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")  # WAL模式下提交时不必每次fsync
+        self.conn.executescript(SCHEMA)
+        # 尚未读出的军队也占用着编号，新军队的编号须从数据库中最大的编号之后开始
+        max_army_id = self.conn.execute("SELECT MAX(CAST(substr(key, 6) AS INTEGER)) FROM armies").fetchone()[0]
+        if max_army_id is not None:
+            reserve_army_id(max_army_id)
+        self._identity = weakref.WeakValueDictionary()  # 存档键 -> 已写入或读出的实体
+        self._pending = {}  # 存档键 -> 实体，等待写入
+        self.attached = False
+        self.reads = 0  # 从数据库读取实体的次数
+        self.writes = 0  # 写入的行数
+
+    def close(self):
+        self.detach()
+        self.conn.close()
+
+    # ---- 变更跟踪 ----
+
+    def attach(self):
+        """开始跟踪模型变更"""
+        if not self.attached:
+            add_listener(self.record)
+            self.attached = True
+
+    def detach(self):
+        """写入尚未保存的变更并停止跟踪"""
+        if self.attached:
+            self.flush()
+            remove_listener(self.record)
+            self.attached = False
+
+    def record(self, entity, fields):
+        """记录实体变更（models.observer回调），只合并到待写集合，不做IO"""
+        key = entity_key(entity)
+        if key is not None:
+            self._pending[key] = entity
+
+    def add(self, entity):
+        """把实体（及其引用的新实体）加入数据库，下次flush时写入"""
+        key = entity_key(entity)
+        if key is None:
+            raise TypeError(f"无法存入数据库的类型: {type(entity).__name__}")
+        self._identity[key] = entity
+        self._pending[key] = entity
+
+    def is_stored(self, entity):
+        """实体是否已写入数据库或从数据库读出"""
+        key = entity_key(entity)
+        return key is not None and self._identity.get(key) is entity
+
+    def flush(self):
+        """在一个事务中写入所有待写实体
+
+        数据库中还没有的实体只有被已存储实体引用时才写入，战斗演示等临时对象不会进入数据库
+
+        Returns:
+            int: 写入的行数
+        """
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        queue = [entity for key, entity in pending.items() if self._identity.get(key) is entity]
+
+        def on_ref(entity):
+            key = entity_key(entity)
+            if self._identity.get(key) is not entity:
+                self._identity[key] = entity
+                queue.append(entity)
+
+        rows = {cls_name: [] for cls_name in TABLES}
+        army_owners = []  # [(持有者键, [军队键])]
+        while queue:
+            entity = queue.pop()
+            cls_name = type(entity).__name__
+            key = entity_key(entity)
+            data = json.dumps(encode_entity(entity, None, on_ref), ensure_ascii=False, separators=(",", ":"))
+            rows[cls_name].append((key,) + INDEXED_COLUMNS[cls_name][1](entity) + (data,))
+            if cls_name in ARMY_OWNERS:
+                army_owners.append((key, [entity_key(army) for army in entity.armies]))
+
+        with self.conn:
+            self.conn.execute("BEGIN")
+            for cls_name, values in rows.items():
+                if values:
+                    self.conn.executemany(UPSERT_SQL[cls_name], values)
+            if army_owners:
+                self.conn.executemany("UPDATE armies SET owner = NULL WHERE owner = ?",
+                                      [(owner,) for owner, _ in army_owners])
+                self.conn.executemany("UPDATE armies SET owner = ? WHERE key = ?",
+                                      [(owner, army) for owner, armies in army_owners for army in armies])
+        written = sum(len(values) for values in rows.values())
+        self.writes += written
+        return written
+
+    # ---- 整个世界 ----
+
+    def save_world(self, roots):
+        """写入根实体及其可达的全部实体，并记录根实体以便load_world恢复"""
+        for root in roots:
+            self.add(root)
+        self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('roots', ?)",
+                          (json.dumps([entity_key(root) for root in roots], ensure_ascii=False),))
+        return self.flush()
+
+    def load_world(self):
+        """读出save_world保存的根实体，数据库为空时返回None"""
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'roots'").fetchone()
+        if row is None:
+            return None
+        return [self.get(key) for key in json.loads(row[0])]
+
+    # ---- 读取 ----
+
+    def get(self, key):
+        """按存档键读取实体，数据库中没有时返回None
+
+        已在身份映射中的实体直接返回；读出的实体所引用的实体也一并读出
+        """
+        entity = self._identity.get(key)
+        if entity is not None:
+            return entity
+        loaded = {}
+        entity = self._load(key, loaded)
+        for item in loaded.values():
+            for field, factory in RESTORE_DEFAULTS.get(type(item).__name__, {}).items():
+                if not hasattr(item, field):
+                    setattr(item, field, factory())
+            if isinstance(item, Army):
+                reserve_army_id(item.army_id)
+        return entity
+
+    def _load(self, key, loaded):
+        entity = self._identity.get(key)
+        if entity is not None:
+            return entity
+        cls_name = key.split(":", 1)[0]
+        row = self.conn.execute(f"SELECT data FROM {TABLES[cls_name]} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.reads += 1
+        cls = ENTITY_CLASSES[cls_name]
+        entity = cls.__new__(cls)
+        # 先放入身份映射再填充字段，互相引用的实体只会读取一次
+        self._identity[key] = entity
+        loaded[key] = entity
+        resolve = lambda ref: self._load(ref, loaded)
+        for field, value in json.loads(row[0]).items():
+            setattr(entity, field, decode_value(value, resolve))
+        return entity
+
+    def _select(self, sql, params):
+        """执行返回存档键的查询，查询前先写入待写变更"""
+        self.flush()
+        return [self.get(key) for key, in self.conn.execute(sql, params)]
+
+    def cities_of(self, kingdom):
+        """势力拥有的城市"""
+        return self._select("SELECT key FROM cities WHERE owner = ?", (entity_key(kingdom),))
+
+    def armies_of(self, owner):
+        """势力或玩家持有的军队"""
+        return self._select("SELECT key FROM armies WHERE owner = ?", (entity_key(owner),))
+
+    def generals_of(self, kingdom, limit=-1):
+        """势力的将领，按战斗力从高到低，limit为-1时不限数量"""
+        return self._select("SELECT key FROM generals WHERE kingdom = ? ORDER BY power DESC LIMIT ?",
+                            (entity_key(kingdom), limit))
+
+    def players_of(self, kingdom):
+        """效忠势力的玩家"""
+        return self._select("SELECT key FROM players WHERE kingdom = ?", (entity_key(kingdom),))
@@ -3,49 +3,105 @@
 
 """
 生成默认背景图片脚本
-这个脚本会创建一个简单的背景图片，用于测试游戏
+按任意尺寸绘制网格和标题背景，生成的图片按(尺寸, 参数)的哈希保存在resources/cache/backgrounds，
+相同尺寸和参数的背景只生成一次。游戏界面在后台线程中调用ensure_background，
+直接运行本脚本时生成resources/background.jpg。
 """
 
-from PIL import Image, ImageDraw, ImageFont
+import hashlib
+import json
 import os
 
-def create_default_background():
-    """创建一个简单的背景图片"""
-    # 创建一个深蓝色背景
-    img = Image.new('RGB', (1280, 720), (20, 20, 50))
-    draw = ImageDraw.Draw(img)
-    
-    # 添加一些装饰线条
-    for i in range(0, 1280, 50):
-        opacity = int(255 * (0.2 + 0.1 * (i % 3)))
-        draw.line([(i, 0), (i, 720)], fill=(255, 255, 255, opacity), width=1)
-    
-    for i in range(0, 720, 50):
-        opacity = int(255 * (0.2 + 0.1 * (i % 3)))
-        draw.line([(0, i), (1280, i)], fill=(255, 255, 255, opacity), width=1)
-    
-    # 尝试加载字体
+RESOURCES_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(RESOURCES_DIR, "cache", "backgrounds")
+GENERATOR_VERSION = 1  # 修改绘制方式后递增，使旧的缓存失效
+BASE_HEIGHT = 720  # 默认参数对应的窗口高度，其他尺寸按比例缩放
+
+DEFAULT_PARAMS = {
+    "color": [20, 20, 50],  # 底色
+    "spacing": 50,  # 网格间距
+    "title": "三国霸业",
+    "subtitle": "群雄逐鹿 天下三分",
+    "title_color": [255, 215, 0],
+    "font": "simhei.ttf",
+}
+
+def background_params(**overrides):
+    """默认参数加上覆盖项"""
+    params = dict(DEFAULT_PARAMS)
+    params.update(overrides)
+    return params
+
+def background_key(width, height, params):
+    """背景的内容哈希，尺寸、参数或绘制方式变化时不同"""
+    content = json.dumps({"version": GENERATOR_VERSION, "size": [width, height], "params": params},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+
+def background_path(width, height, params):
+    """背景在缓存目录中的路径"""
+    return os.path.join(CACHE_DIR, f"{background_key(width, height, params)}.png")
+
+def _load_font(name, size):
+    from PIL import ImageFont
     try:
         # 尝试使用系统字体
-        font = ImageFont.truetype("simhei.ttf", 60)
-        title_font = ImageFont.truetype("simhei.ttf", 120)
+        return ImageFont.truetype(name, size)
     except IOError:
         # 如果找不到字体，使用默认字体
-        font = ImageFont.load_default()
-        title_font = ImageFont.load_default()
-    
-    # 添加标题
-    draw.text((640, 200), "三国霸业", fill=(255, 215, 0), font=title_font, anchor="mm")
-    
-    # 添加副标题
-    draw.text((640, 320), "群雄逐鹿 天下三分", fill=(255, 255, 255), font=font, anchor="mm")
-    
-    # 保存图片
-    if not os.path.exists("resources"):
-        os.makedirs("resources")
-    
-    img.save("resources/background.jpg")
-    print("背景图片已创建: resources/background.jpg")
+        return ImageFont.load_default()
+
+def render_background(width, height, params=None):
+    """按指定尺寸绘制背景图片
+
+    Returns:
+        PIL.Image: 绘制好的图片
+    """
+    # 只在真正绘制时导入PIL，计算缓存路径不需要它
+    from PIL import Image, ImageDraw
+
+    params = params or DEFAULT_PARAMS
+    scale = height / BASE_HEIGHT
+    img = Image.new('RGB', (width, height), tuple(params["color"]))
+    draw = ImageDraw.Draw(img)
+
+    # 添加一些装饰线条
+    spacing = max(10, int(params["spacing"] * scale))
+    for i in range(0, width, spacing):
+        opacity = int(255 * (0.2 + 0.1 * (i // spacing % 3)))
+        draw.line([(i, 0), (i, height)], fill=(255, 255, 255, opacity), width=1)
+
+    for i in range(0, height, spacing):
+        opacity = int(255 * (0.2 + 0.1 * (i // spacing % 3)))
+        draw.line([(0, i), (width, i)], fill=(255, 255, 255, opacity), width=1)
+
+    # 添加标题和副标题
+    title_font = _load_font(params["font"], max(12, int(120 * scale)))
+    font = _load_font(params["font"], max(10, int(60 * scale)))
+    draw.text((width // 2, int(200 * scale)), params["title"], fill=tuple(params["title_color"]),
+              font=title_font, anchor="mm")
+    draw.text((width // 2, int(320 * scale)), params["subtitle"], fill=(255, 255, 255), font=font, anchor="mm")
+    return img
+
+def ensure_background(width, height, params=None):
+    """返回指定尺寸和参数的背景文件路径，缓存中没有时生成
+
+    先写入临时文件再改名，多个线程或进程同时生成同一背景时不会读到不完整的文件
+    """
+    params = params or DEFAULT_PARAMS
+    path = background_path(width, height, params)
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        render_background(width, height, params).save(tmp_path, format="PNG")
+        os.replace(tmp_path, path)
+    return path
+
+def create_default_background():
+    """创建一个1280×720的背景图片resources/background.jpg"""
+    path = os.path.join(RESOURCES_DIR, "background.jpg")
+    render_background(1280, 720).save(path)
+    print(f"背景图片已创建: {path}")
 
 if __name__ == "__main__":
-    create_default_background() 
\ No newline at end of file
+    create_default_background()
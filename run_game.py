@@ -5,18 +5,21 @@
 三国霸业游戏启动脚本
 """
 
+from modules import startup  # 最先导入，以此作为启动计时的起点
+
 import os
 import sys
 import subprocess
+from importlib.util import find_spec
+
+REQUIRED_MODULES = ("arcade", "PIL")
 
 def check_requirements():
-    """检查并安装必要的库"""
+    """检查并安装必要的库（只查找模块，不导入）"""
     print("检查依赖库...")
-    try:
-        import arcade
-        import PIL
+    if all(find_spec(name) is not None for name in REQUIRED_MODULES):
         print("依赖库已安装")
-    except ImportError:
+    else:
         print("正在安装依赖库...")
         subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
         print("依赖库安装完成")
@@ -27,17 +30,7 @@ def setup_resources():
     # 创建资源目录
     if not os.path.exists("resources"):
         os.makedirs("resources")
-    
-    # 如果不存在背景图，生成一个默认背景
-    if not os.path.exists("resources/background.jpg"):
-        print("正在生成默认背景图...")
-        try:
-            from resources.default_background import create_default_background
-            create_default_background()
-        except Exception as e:
-            print(f"背景图生成失败: {e}")
-            # 提示用户手动添加背景图
-            print("请手动将背景图片放置到resources/background.jpg")
+    # 没有背景图片时，界面会在后台按窗口尺寸生成默认背景，启动时不再同步生成
 
 def main():
     """主函数"""
@@ -58,10 +51,13 @@ def main():
         with open("gui/__init__.py", "w") as f:
             f.write("# GUI包初始化文件\n")
     
+    startup.mark("checks")
+    
     # 启动游戏
     print("启动游戏...")
     try:
         from three_kingdoms_arcade import main
+        startup.mark("import_gui")
         main()
     except Exception as e:
         print(f"游戏启动失败: {e}")
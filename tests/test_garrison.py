@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+import unittest
+
+from models.army import Army, TroopType
+from models.city import City
+from models.general import General
+from models.observer import add_listener, remove_listener
+from modules.battle import Battle
+
+class GarrisonIndexTest(unittest.TestCase):
+
+    def assert_index_matches(self, city):
+        garrison = city.garrison
+        self.assertEqual(city.total_garrison_size(), sum(army.size for army in garrison))
+        self.assertAlmostEqual(city.garrison_power(), sum(army.get_battle_power() for army in garrison), places=6)
+
+    def test_battle_on_garrisoned_armies(self):
+        """驻军参战后，索引中的兵力和战斗力与逐支重新计算的结果一致"""
+        random.seed(3)
+        city = City("许昌", 50000, 60, 10, 5, 3, "中原")
+        for army in (Army(5000, 80, 70, TroopType.INFANTRY), Army(3000, 70, 60, TroopType.ARCHER)):
+            city.add_garrison(army)
+        self.assert_index_matches(city)
+
+        for seed in range(5):
+            random.seed(seed)
+            attackers = [Army(6000, 85, 75, TroopType.CAVALRY)]
+            Battle(attackers, list(city.garrison), General("吕布", 95, 100, 30, 20, 40),
+                   General("曹仁", 85, 85, 65, 55, 70), dramatic_pauses=False, city=city).simulate_battle()
+            self.assert_index_matches(city)
+
+    def test_battle_notifies_morale(self):
+        """战斗中每次修改士气都发出变更通知，监听者看到的是最终士气"""
+        def on_change(army, fields):
+            if not fields or "morale" in fields:
+                seen[id(army)] = army.morale
+
+        for seed in range(5):
+            random.seed(seed)
+            city = City("宛城", 30000, 50, 8, 4, 2, "中原")
+            for army in (Army(4000, 80, 70, TroopType.INFANTRY), Army(2000, 75, 60, TroopType.CAVALRY)):
+                city.add_garrison(army)
+            attackers = [Army(5000, 85, 75, TroopType.CAVALRY)]
+            armies = attackers + list(city.garrison)
+            seen = {}
+            for army in armies:
+                add_listener(on_change, army)
+            try:
+                Battle(attackers, list(city.garrison), General("张绣", 80, 85, 60, 50, 65),
+                       General("典韦", 75, 98, 35, 30, 60), dramatic_pauses=False, city=city).simulate_battle()
+            finally:
+                for army in armies:
+                    remove_listener(on_change, army)
+                city.garrison_index.detach()
+            self.assertEqual([seen.get(id(army)) for army in armies], [army.morale for army in armies])
+            self.assert_index_matches(city)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+import tempfile
+import unittest
+
+from models.army import Army, TroopType
+from models.general import General
+from models.kingdom import Kingdom
+from modules.battle import Battle
+from modules.save_journal import SaveJournal, recover_world
+
+class SaveJournalTest(unittest.TestCase):
+
+    def test_battle_changes_survive_recovery(self):
+        """战斗中修改的士气、经验和疲劳都写入日志，读档后与存档前一致"""
+        random.seed(7)
+        wei = Kingdom("魏", "曹操", "blue")
+        shu = Kingdom("蜀", "刘备", "green")
+        wei.armies = [Army(5000, 80, 70, TroopType.INFANTRY), Army(3000, 70, 60, TroopType.CAVALRY)]
+        shu.armies = [Army(4000, 75, 65, TroopType.ARCHER)]
+
+        with tempfile.TemporaryDirectory() as directory:
+            journal = SaveJournal(directory)
+            journal.attach([wei, shu])
+            try:
+                Battle(wei.armies, shu.armies, General("夏侯惇", 85, 90, 60, 50, 70),
+                       General("赵云", 90, 95, 75, 65, 85), dramatic_pauses=False).simulate_battle()
+                journal.autosave()
+                expected = [(army.size, army.morale, army.experience, army.fatigue)
+                            for kingdom in (wei, shu) for army in kingdom.armies]
+                recovered = recover_world(directory)
+            finally:
+                journal.detach()
+
+        self.assertTrue(any(state[2] or state[3] for state in expected))
+        actual = [(army.size, army.morale, army.experience, army.fatigue)
+                  for kingdom in recovered for army in kingdom.armies]
+        self.assertEqual(actual, expected)
+
+if __name__ == "__main__":
+    unittest.main()
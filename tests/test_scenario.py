@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+import unittest
+
+from modules.scenario import ScenarioError, load_scenario
+
+SCENARIO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "resources", "scenarios", "guandu.json")
+
+class ValidateScenarioTest(unittest.TestCase):
+
+    def setUp(self):
+        with open(SCENARIO, encoding="utf-8") as f:
+            self.data = json.load(f)
+
+    def assert_rejected(self, message):
+        """写出修改后的剧本并加载，应当报告ScenarioError而不是其他异常"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "scenario.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False)
+            with self.assertRaises(ScenarioError) as context:
+                load_scenario(path, cache_dir=os.path.join(directory, "cache"))
+        self.assertTrue(any(message in error for error in context.exception.errors), context.exception.errors)
+
+    def test_kingdom_name_not_string(self):
+        self.data["kingdoms"][0]["name"] = ["魏国"]
+        self.assert_rejected("kingdoms[0]缺少name")
+
+    def test_general_name_not_string(self):
+        self.data["generals"][0]["name"] = {"姓": "曹"}
+        self.assert_rejected("generals[0]缺少name")
+
+    def test_skill_not_string(self):
+        self.data["generals"][0]["skills"] = [["智谋"]]
+        self.assert_rejected("generals[0]未知技能")
+
+    def test_city_owner_not_string(self):
+        self.data["cities"][0]["owner"] = {"name": "魏国"}
+        self.assert_rejected("cities[0]的owner不是剧本中的势力")
+
+if __name__ == "__main__":
+    unittest.main()
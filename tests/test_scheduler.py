@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from modules.scheduler import EventScheduler
+
+class EventSchedulerTest(unittest.TestCase):
+
+    def test_callback_cancels_other_events(self):
+        """回调中取消其他事件触发重建堆后，重复事件和时钟仍然正确"""
+        scheduler = EventScheduler()
+        monthly = []
+        scheduler.every(30, lambda: monthly.append(scheduler.now))
+        pending = [scheduler.schedule(100 + i, lambda: self.fail("已取消的事件被执行")) for i in range(3)]
+        scheduler.schedule(40, lambda: [scheduler.cancel(event) for event in pending])
+
+        scheduler.advance(365)
+        self.assertEqual(scheduler.now, 365)
+        self.assertEqual(monthly, list(range(30, 361, 30)))
+        self.assertEqual(scheduler.next_time(), 390)
+        self.assertEqual(len(scheduler), 1)
+
+        scheduler.advance(60)
+        self.assertEqual(monthly[-2:], [390, 420])
+        self.assertEqual(scheduler.now, 425)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from models.kingdom import Kingdom
+from models.player import Player
+from modules.story import Story
+
+class StoryQuestTest(unittest.TestCase):
+
+    def test_first_quest_is_tracked_once(self):
+        """新玩家接取的第一个任务只被跟踪一次"""
+        player = Player("张三", Kingdom("魏", "曹操", "blue"), 70, 70, 70, 70, 70)
+        story = Story()
+        available = story.get_available_quests(player)
+        index = next(i for i, quest in enumerate(available) if quest.trigger is not None)
+
+        quest = story.assign_quest(player, index)
+        self.assertIn(quest, player.quests)
+        self.assertEqual(story.get_tracker(player).tracked_count(), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,19 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from modules import startup  # 直接运行本文件时以此作为启动计时的起点
+
 import arcade
 import os
 import time
 import math
-from three_kingdoms_game import ThreeKingdomsGame
 from gui.ui.button import Button
-from gui.views.city_view import CityView
-from gui.views.battle_view import BattleView  # 直接从battle_view.py导入
+from gui.utils.text_layout import build_text, draw_text, layout_text, make_text
+from gui.utils.shapes import add_panel, texture_sprites
+from gui.utils.assets import AssetScope, asset_manager
+from gui.utils.backgrounds import default_background
+from gui.utils.profiler import install_profiler
+from modules.roster import GeneralRoster, SORT_KEYS, SORT_NAMES
 
 # 设置常量
 SCREEN_WIDTH = 1280
@@ -137,27 +142,20 @@ class WelcomeView(arcade.View):
     def __init__(self):
         super().__init__()
         
-        # 游戏核心
-        self.game = ThreeKingdomsGame()
+        # 游戏核心在点击开始游戏时才创建，欢迎界面不等待游戏数据加载
+        self.game = None
         
         # UI元素
         self.buttons = []
         self.setup()
         
-        # 加载背景
-        try:
-            # 优先加载新背景图
-            self.background_texture = arcade.load_texture("resources/back_ground.png")
-        except:
-            try:
-                # 如果新背景加载失败，尝试加载旧背景
-                self.background_texture = arcade.load_texture("resources/background.jpg")
-            except:
-                self.background_texture = None
+        # 加载背景（资源管理器中已配置备选背景图）
+        self.assets = AssetScope()
+        self.background_texture = self.assets.texture("background")
             
         # 按钮音效
-        self.hover_sound = arcade.load_sound(":resources:sounds/laser1.wav")
-        self.click_sound = arcade.load_sound(":resources:sounds/hit1.wav")
+        self.hover_sound = self.assets.sound("hover")
+        self.click_sound = self.assets.sound("click")
         self.last_hovered_button = None
         
         # 动画效果
@@ -186,18 +184,26 @@ class WelcomeView(arcade.View):
     def on_show(self):
         """视图显示时"""
         arcade.set_background_color(BACKGROUND_COLOR)
+        # 玩家停留在欢迎界面时，在后台预加载后续界面要用的资源
+        asset_manager().preload()
+    
+    def on_hide_view(self):
+        """视图隐藏时释放资源引用"""
+        self.assets.release()
     
     def on_draw(self):
         """绘制界面"""
         arcade.start_render()
         
-        # 绘制背景
+        # 绘制背景，没有背景图片时使用按窗口尺寸生成的背景
         if self.background_texture:
             arcade.draw_texture_rectangle(
                 SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
                 SCREEN_WIDTH, SCREEN_HEIGHT,
                 self.background_texture
             )
+        else:
+            default_background().draw(self.window.width, self.window.height)
         
         # 绘制边框装饰
         border_width = 5
@@ -257,6 +263,9 @@ class WelcomeView(arcade.View):
             font_name=("SimHei", "Microsoft YaHei"),
             anchor_x="center"
         )
+        
+        # 首帧绘制完成后输出启动耗时报告（只在第一次时输出）
+        startup.first_frame()
     
     def on_mouse_motion(self, x, y, dx, dy):
         """处理鼠标移动"""
@@ -278,6 +287,8 @@ class WelcomeView(arcade.View):
         """处理鼠标点击"""
         if self.buttons[0].check_mouse_press(x, y):  # 开始游戏
             arcade.play_sound(self.click_sound, 0.5)
+            from three_kingdoms_game import ThreeKingdomsGame
+            self.game = ThreeKingdomsGame()
             self.game.initialize_game()
             create_player_view = CreatePlayerView(self.game)
             self.window.show_view(create_player_view)
@@ -307,27 +318,17 @@ class CreatePlayerView(arcade.View):
         self.active_text_input = None
         self.setup()
         
-        # 加载背景
-        try:
-            # 优先加载新背景图
-            self.background_texture = arcade.load_texture("resources/back_ground.png")
-        except:
-            try:
-                # 如果新背景加载失败，尝试加载旧背景
-                self.background_texture = arcade.load_texture("resources/background.jpg")
-            except:
-                self.background_texture = None
+        # 加载背景（资源管理器中已配置备选背景图）
+        self.assets = AssetScope()
+        self.background_texture = self.assets.texture("background")
             
         # 按钮音效
-        self.hover_sound = arcade.load_sound(":resources:sounds/laser1.wav")
-        self.click_sound = arcade.load_sound(":resources:sounds/hit1.wav")
+        self.hover_sound = self.assets.sound("hover")
+        self.click_sound = self.assets.sound("click")
         self.last_hovered_button = None
         
         # 尝试加载刘备图片作为示例将领
-        try:
-            self.liubei_image = arcade.load_texture("resources/generals/liubei.png")
-        except:
-            self.liubei_image = None
+        self.liubei_image = self.assets.texture("liubei")
     
     def setup(self):
         """设置界面元素"""
@@ -386,17 +387,23 @@ class CreatePlayerView(arcade.View):
         """视图显示时"""
         arcade.set_background_color(BACKGROUND_COLOR)
     
+    def on_hide_view(self):
+        """视图隐藏时释放资源引用"""
+        self.assets.release()
+    
     def on_draw(self):
         """绘制界面"""
         arcade.start_render()
         
-        # 绘制背景
+        # 绘制背景，没有背景图片时使用按窗口尺寸生成的背景
         if self.background_texture:
             arcade.draw_texture_rectangle(
                 SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
                 SCREEN_WIDTH, SCREEN_HEIGHT,
                 self.background_texture
             )
+        else:
+            default_background().draw(self.window.width, self.window.height)
         
         # 绘制边框装饰
         border_width = 5
@@ -642,27 +649,19 @@ class MainMenuView(arcade.View):
         self.buttons = []
         self.setup()
         
-        # 加载背景
-        try:
-            # 优先加载新背景图
-            self.background_texture = arcade.load_texture("resources/back_ground.png")
-        except:
-            try:
-                # 如果新背景加载失败，尝试加载旧背景
-                self.background_texture = arcade.load_texture("resources/background.jpg")
-            except:
-                self.background_texture = None
+        # 加载背景（资源管理器中已配置备选背景图）
+        self.assets = AssetScope()
+        self.background_texture = self.assets.texture("background")
             
         # 按钮悬停音效
-        self.hover_sound = arcade.load_sound(":resources:sounds/laser1.wav")
-        self.click_sound = arcade.load_sound(":resources:sounds/hit1.wav")
+        self.hover_sound = self.assets.sound("hover")
+        self.click_sound = self.assets.sound("click")
         self.last_hovered_button = None
         
         # 尝试加载刘备图片
-        try:
-            self.liubei_image = arcade.load_texture("resources/generals/liubei.png")
-        except:
-            self.liubei_image = None
+        self.liubei_image = self.assets.texture("liubei")
+        
+        self.build_scene()
     
     def setup(self):
         """设置界面元素"""
@@ -724,137 +723,84 @@ class MainMenuView(arcade.View):
         """视图显示时"""
         arcade.set_background_color(BACKGROUND_COLOR)
     
-    def on_draw(self):
-        """绘制界面"""
-        arcade.start_render()
-        
-        # 绘制背景
-        if self.background_texture:
-            arcade.draw_texture_rectangle(
-                SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
-                SCREEN_WIDTH, SCREEN_HEIGHT,
-                self.background_texture
-            )
-        
-        # 绘制装饰性边框
-        border_width = 5
-        border_color = GOLD
+    def on_hide_view(self):
+        """视图隐藏时释放资源引用"""
+        self.assets.release()
+    
+    def build_scene(self):
+        """预先生成静态的面板、贴图和文字，绘制时只需批量提交"""
         padding = 20
-        arcade.draw_rectangle_outline(
-            SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
-            SCREEN_WIDTH - padding * 2, SCREEN_HEIGHT - padding * 2,
-            border_color, border_width
-        )
-        
-        # 绘制标题背景
         title_bg_height = 120
-        arcade.draw_rectangle_filled(
-            SCREEN_WIDTH // 2, SCREEN_HEIGHT - title_bg_height // 2,
-            SCREEN_WIDTH - padding * 4, title_bg_height,
-            (20, 20, 50, 200)  # 半透明深蓝色
+        image_width = 200
+        image_height = 200
+        image_x = SCREEN_WIDTH - 140
+        image_y = SCREEN_HEIGHT - 260
+        
+        # 背景贴图
+        self.background_sprites = texture_sprites(
+            (self.background_texture, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, SCREEN_WIDTH, SCREEN_HEIGHT)
         )
         
-        # 绘制标题
-        arcade.draw_text(
-            "主菜单",
-            SCREEN_WIDTH // 2, SCREEN_HEIGHT - 80,
-            GOLD,
-            font_size=64,
-            font_name=("SimHei", "Microsoft YaHei"),
-            anchor_x="center"
+        # 装饰性边框、标题背景和玩家信息背景
+        self.static_shapes = arcade.ShapeElementList()
+        add_panel(self.static_shapes, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
+                  SCREEN_WIDTH - padding * 2, SCREEN_HEIGHT - padding * 2, outline=GOLD, border_width=5)
+        add_panel(self.static_shapes, SCREEN_WIDTH // 2, SCREEN_HEIGHT - title_bg_height // 2,
+                  SCREEN_WIDTH - padding * 4, title_bg_height, fill=(20, 20, 50, 200))
+        if self.game.player:
+            add_panel(self.static_shapes, SCREEN_WIDTH // 2, SCREEN_HEIGHT - 140, 600, 80, fill=(30, 30, 60, 180))
+        
+        self.static_labels = [
+            build_text("主菜单", SCREEN_WIDTH // 2, SCREEN_HEIGHT - 80, GOLD, font_size=64, anchor_x="center"),
+            build_text("三国霸业 - 群雄逐鹿", SCREEN_WIDTH // 2, 30, (200, 200, 200, 150),
+                     font_size=18, anchor_x="center"),
+        ]
+        
+        # 刘备图片及其背景、说明
+        self.portrait_shapes = arcade.ShapeElementList()
+        self.portrait_sprites = texture_sprites(
+            (self.liubei_image, image_x, image_y, image_width, image_height)
         )
+        if self.liubei_image:
+            add_panel(self.portrait_shapes, image_x, image_y, image_width + 20, image_height + 20,
+                      fill=(40, 40, 70, 180), outline=GOLD, border_width=2)
+            self.static_labels.append(
+                build_text("刘备", image_x, image_y - 110, GOLD, font_size=24, anchor_x="center")
+            )
+            self.static_labels.append(
+                build_text("蜀国君主", image_x, image_y - 140, WHITE, font_size=18, anchor_x="center")
+            )
+    
+    def on_draw(self):
+        """绘制界面"""
+        arcade.start_render()
+        
+        if not self.background_texture:
+            default_background().draw(self.window.width, self.window.height)
+        self.background_sprites.draw()
+        self.static_shapes.draw()
         
-        # 绘制玩家信息背景
+        # 玩家信息随状态变化，文字对象按内容缓存
         if self.game.player:
-            info_bg_width = 600
-            info_bg_height = 80
-            arcade.draw_rectangle_filled(
-                SCREEN_WIDTH // 2, SCREEN_HEIGHT - 140,
-                info_bg_width, info_bg_height,
-                (30, 30, 60, 180)  # 半透明深色
-            )
-            
-            # 绘制玩家信息
-            arcade.draw_text(
+            draw_text(
                 f"{self.game.player.name} - {self.game.player.kingdom.name}",
                 SCREEN_WIDTH // 2, SCREEN_HEIGHT - 140,
-                GOLD,
-                font_size=32,
-                font_name=("SimHei", "Microsoft YaHei"),
-                anchor_x="center"
+                GOLD, font_size=32, anchor_x="center"
             )
-            
-            # 绘制玩家兵力信息
-            arcade.draw_text(
+            draw_text(
                 f"当前兵力: {sum(army.size for army in self.game.player.armies)}",
                 SCREEN_WIDTH // 2, SCREEN_HEIGHT - 170,
-                WHITE,
-                font_size=24,
-                font_name=("SimHei", "Microsoft YaHei"),
-                anchor_x="center"
+                WHITE, font_size=24, anchor_x="center"
             )
         
         # 绘制按钮
         for button in self.buttons:
             button.draw()
         
-        # 显示刘备图片（如果有）
-        if hasattr(self, 'liubei_image') and self.liubei_image:
-            # 计算图片位置和大小
-            image_width = 200
-            image_height = 200
-            image_x = SCREEN_WIDTH - 140
-            image_y = SCREEN_HEIGHT - 260
-            
-            # 绘制图片背景
-            arcade.draw_rectangle_filled(
-                image_x, image_y, 
-                image_width + 20, image_height + 20,
-                (40, 40, 70, 180)  # 半透明背景
-            )
-            
-            # 绘制图片边框
-            arcade.draw_rectangle_outline(
-                image_x, image_y, 
-                image_width + 20, image_height + 20,
-                GOLD, 2
-            )
-            
-            # 绘制图片
-            arcade.draw_texture_rectangle(
-                image_x, image_y,
-                image_width, image_height,
-                self.liubei_image
-            )
-            
-            # 绘制图片说明
-            arcade.draw_text(
-                "刘备",
-                image_x, image_y - 110,
-                GOLD,
-                font_size=24,
-                font_name=("SimHei", "Microsoft YaHei"),
-                anchor_x="center"
-            )
-            
-            arcade.draw_text(
-                "蜀国君主",
-                image_x, image_y - 140,
-                WHITE,
-                font_size=18,
-                font_name=("SimHei", "Microsoft YaHei"),
-                anchor_x="center"
-            )
-        
-        # 绘制底部版权信息
-        arcade.draw_text(
-            "三国霸业 - 群雄逐鹿",
-            SCREEN_WIDTH // 2, 30,
-            (200, 200, 200, 150),  # 半透明灰白色
-            font_size=18,
-            font_name=("SimHei", "Microsoft YaHei"),
-            anchor_x="center"
-        )
+        self.portrait_shapes.draw()
+        self.portrait_sprites.draw()
+        for label in self.static_labels:
+            label.draw()
     
     def on_mouse_motion(self, x, y, dx, dy):
         """处理鼠标移动"""
@@ -937,6 +883,7 @@ class MainMenuView(arcade.View):
             battle_data = BattleData(self.game)  # 传递游戏对象
             
             # 启动战斗视图
+            from gui.views.battle_view import BattleView
             battle_view = BattleView(
                 self.window,  # 游戏窗口
                 (self.window.width, self.window.height),  # 窗口尺寸
@@ -963,6 +910,7 @@ class MainMenuView(arcade.View):
                 )
                 self.game.sample_city.owner = self.game.player.kingdom
             
+            from gui.views.city_view import CityView
             city_view = CityView(self.game, self.game.sample_city)
             self.window.show_view(city_view)
             
@@ -998,6 +946,12 @@ class MainMenuView(arcade.View):
         """处理文本输入事件"""
         pass  # 主菜单不需要处理文本输入，但需要实现此方法
 
+# 剧情文本区域
+STORY_TEXT_BG_WIDTH = 1000
+STORY_TEXT_MARGIN = 40
+STORY_TEXT_WIDTH = STORY_TEXT_BG_WIDTH - STORY_TEXT_MARGIN * 2
+STORY_FONT_SIZE = 24
+
 class StoryView(arcade.View):
     """剧情展示界面"""
     def __init__(self, game):
@@ -1016,24 +970,24 @@ class StoryView(arcade.View):
         self.text_animation_active = False
         self.show_choices = False
         
-        # 加载背景
-        try:
-            # 优先加载新背景图
-            self.background_texture = arcade.load_texture("resources/back_ground.png")
-        except:
-            try:
-                # 如果新背景加载失败，尝试加载旧背景
-                self.background_texture = arcade.load_texture("resources/background.jpg")
-            except:
-                self.background_texture = None
+        # 剧情正文内容逐字变化，单独使用一个文本对象，只在可见文字变化时更新
+        self.body_text = make_text(
+            SCREEN_WIDTH // 2 - STORY_TEXT_BG_WIDTH // 2 + STORY_TEXT_MARGIN, 0,
+            WHITE, font_size=STORY_FONT_SIZE, width=STORY_TEXT_WIDTH,
+            anchor_x="left", anchor_y="top"
+        )
+        
+        # 加载背景（资源管理器中已配置备选背景图）
+        self.assets = AssetScope()
+        self.background_texture = self.assets.texture("background")
         
         # 按钮
         self.buttons = []
         self.choice_buttons = []
         
         # 音效
-        self.click_sound = arcade.load_sound(":resources:sounds/hit1.wav")
-        self.hover_sound = arcade.load_sound(":resources:sounds/laser1.wav")
+        self.click_sound = self.assets.sound("click")
+        self.hover_sound = self.assets.sound("hover")
         self.last_hovered_button = None
         
         # 获取当前章节
@@ -1062,6 +1016,40 @@ class StoryView(arcade.View):
             150, 50, "返回", bg_color=(100, 100, 100)
         )
         self.buttons.append(back_button)
+        
+        self.build_scene()
+    
+    def build_scene(self):
+        """预先生成背景、边框、面板和标题，绘制时只需批量提交"""
+        padding = 20
+        self.background_sprites = texture_sprites(
+            (self.background_texture, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, SCREEN_WIDTH, SCREEN_HEIGHT)
+        )
+        
+        # 边框和章节标题背景
+        self.frame_shapes = arcade.ShapeElementList()
+        add_panel(self.frame_shapes, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
+                  SCREEN_WIDTH - padding * 2, SCREEN_HEIGHT - padding * 2, outline=GOLD, border_width=5)
+        add_panel(self.frame_shapes, SCREEN_WIDTH // 2, SCREEN_HEIGHT - 80, 700, 80, fill=(20, 20, 50, 200))
+        
+        # 文本背景：显示选择时缩小并上移，给选择按钮留出空间
+        self.text_panels = {}
+        for show_choices in (False, True):
+            text_bg_height = 450 if not show_choices else 350
+            text_y_offset = 0 if not show_choices else 50
+            shapes = arcade.ShapeElementList()
+            add_panel(shapes, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + text_y_offset,
+                      STORY_TEXT_BG_WIDTH, text_bg_height, fill=(30, 30, 60, 230))
+            if show_choices:
+                add_panel(shapes, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 130, 400, 40, fill=(40, 40, 80, 200))
+            self.text_panels[show_choices] = (shapes, text_bg_height, text_y_offset)
+        
+        self.title_text = build_text(
+            self.chapter_title, SCREEN_WIDTH // 2, SCREEN_HEIGHT - 80, GOLD, font_size=40, anchor_x="center"
+        )
+        self.prompt_text = build_text(
+            "请做出你的选择:", SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 130, GOLD, font_size=24, anchor_x="center"
+        )
     
     def limit_title_length(self, title):
         """限制标题长度，防止超出边框"""
@@ -1072,74 +1060,29 @@ class StoryView(arcade.View):
     
     def get_current_chapter_data(self):
         """获取当前章节数据"""
+        from modules.story import default_chapters
+        
         if hasattr(self.game, 'story') and self.game.story:
             chapters = self.game.story.chapters
             chapter_index = self.game.chapter
-            
-            if 0 <= chapter_index < len(chapters):
-                chapter = chapters[chapter_index]
-                return {
-                    'title': chapter.title,
-                    'intro': self.process_text_for_display(chapter.intro),
-                    'events': [self.process_text_for_display(event) for event in chapter.events],
-                    'choices': chapter.choices
-                }
-        
-        # 如果无法获取章节数据，返回默认数据
-        return {
-            'title': '黄巾起义',
-            'intro': self.process_text_for_display('建宁元年(公元168年)，黄巾军揭竿而起，以"苍天已死，黄天当立"为口号，席卷天下。朝廷命各地州郡镇压叛乱...'),
-            'events': [
-                self.process_text_for_display('你是一名地方上的小官吏，正值壮年，目睹黄巾军的暴行，决定挺身而出。'),
-                self.process_text_for_display('当地太守征召勇士组建义军，你毫不犹豫地报名参加。'),
-                self.process_text_for_display('在一场战斗中，你表现出色，成功击退了一支黄巾军，救下了一个村庄。'),
-                self.process_text_for_display('你的名声开始在当地传开...')
-            ],
-            'choices': [
-                {
-                    'text': '加入官军，为朝廷效力',
-                    'result': self.process_text_for_display('你加入了官军，在太守麾下效力。太守对你委以重任，给予你一支小队的指挥权。')
-                },
-                {
-                    'text': '自立队伍，招募乡勇',
-                    'result': self.process_text_for_display('你决定自立队伍，招募乡勇保卫家乡。不少当地青壮年响应你的号召，你很快组建了一支小型部队。')
-                },
-                {
-                    'text': '投奔一方诸侯',
-                    'result': self.process_text_for_display('你听闻刘备、曹操、孙坚等人都在各地起兵抗击黄巾，决定前去投奔一方诸侯。')
-                }
-            ]
-        }
+        else:
+            # 无法获取游戏剧情时显示内置的第一章
+            chapters = default_chapters()
+            chapter_index = 0
+        
+        if 0 <= chapter_index < len(chapters):
+            chapter = chapters[chapter_index]
+            return {
+                'title': chapter.title,
+                'intro': self.process_text_for_display(chapter.intro),
+                'events': [self.process_text_for_display(event) for event in chapter.events],
+                'choices': chapter.choices
+            }
+        return None
     
     def process_text_for_display(self, text):
-        """处理文本以适应显示区域"""
-        # 检查文本长度
-        if len(text) <= 30:  # 短文本不需要特殊处理
-            return text
-            
-        # 长文本根据标点符号添加换行
-        result = ""
-        chars_since_break = 0
-        break_points = ['。', '！', '？', '，', '；', '：', '.', '!', '?', ',', ';', ':']
-        
-        for char in text:
-            result += char
-            chars_since_break += 1
-            
-            # 在标点符号处考虑换行
-            if char in break_points and chars_since_break >= 20:
-                result += "\n"
-                chars_since_break = 0
-                continue
-            
-            # 强制换行避免太长的句子
-            if chars_since_break >= 30:
-                # 添加换行，避免在单词中间断开
-                if not result.endswith("\n"):
-                    result += "\n"
-                chars_since_break = 0
-                
-        return result
+        """按文本区域的像素宽度断行（结果会被缓存）"""
+        return layout_text(text, STORY_TEXT_WIDTH, font_size=STORY_FONT_SIZE)
     
     def setup_choice_buttons(self):
         """设置选择按钮"""
@@ -1178,58 +1121,22 @@ class StoryView(arcade.View):
         """视图显示时"""
         arcade.set_background_color(BACKGROUND_COLOR)
     
+    def on_hide_view(self):
+        """视图隐藏时释放资源引用"""
+        self.assets.release()
+    
     def on_draw(self):
         """绘制界面"""
         arcade.start_render()
         
-        # 绘制背景
-        if self.background_texture:
-            arcade.draw_texture_rectangle(
-                SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
-                SCREEN_WIDTH, SCREEN_HEIGHT,
-                self.background_texture
-            )
-        
-        # 绘制边框
-        border_width = 5
-        border_color = GOLD
-        padding = 20
-        arcade.draw_rectangle_outline(
-            SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
-            SCREEN_WIDTH - padding * 2, SCREEN_HEIGHT - padding * 2,
-            border_color, border_width
-        )
-        
-        # 绘制章节标题背景 - 增加宽度以容纳更长的标题
-        title_bg_width = 700
-        title_bg_height = 80
-        arcade.draw_rectangle_filled(
-            SCREEN_WIDTH // 2, SCREEN_HEIGHT - 80,
-            title_bg_width, title_bg_height,
-            (20, 20, 50, 200)  # 半透明深蓝色
-        )
+        if not self.background_texture:
+            default_background().draw(self.window.width, self.window.height)
+        self.background_sprites.draw()
+        self.frame_shapes.draw()
+        self.title_text.draw()
         
-        # 绘制章节标题
-        arcade.draw_text(
-            self.chapter_title,
-            SCREEN_WIDTH // 2, SCREEN_HEIGHT - 80,
-            GOLD,
-            font_size=40,  # 稍微减小字体大小
-            font_name=("SimHei", "Microsoft YaHei"),
-            anchor_x="center"
-        )
-        
-        # 如果显示选择，调整文本区域高度，给选择按钮留出空间
-        text_bg_width = 1000
-        text_bg_height = 450 if not self.show_choices else 350
-        text_y_offset = 0 if not self.show_choices else 50  # 选择模式下上移文本区域
-        
-        # 绘制文本背景
-        arcade.draw_rectangle_filled(
-            SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + text_y_offset,
-            text_bg_width, text_bg_height,
-            (30, 30, 60, 230)  # 调整透明度
-        )
+        text_panel, text_bg_height, text_y_offset = self.text_panels[self.show_choices]
+        text_panel.draw()
         
         # 绘制文本内容
         if self.text_animation_active:
@@ -1241,46 +1148,17 @@ class StoryView(arcade.View):
         else:
             visible_text = self.display_text
         
-        # 文本渲染区域调整，优化显示效果
-        text_margin = 40  # 增加文本边距
-        text_width = text_bg_width - text_margin * 2  # 减小文本宽度，确保不会超出边框
+        # 文本已按区域宽度断行，只在可见内容或位置变化时更新文本对象
+        text_top = SCREEN_HEIGHT // 2 + text_bg_height // 2 - STORY_TEXT_MARGIN + text_y_offset
+        if self.body_text.text != visible_text:
+            self.body_text.text = visible_text
+        if self.body_text.y != text_top:
+            self.body_text.y = text_top
+        self.body_text.draw()
         
-        # 绘制文本内容，使用更清晰的渲染设置
-        arcade.draw_text(
-            visible_text,
-            SCREEN_WIDTH // 2 - text_bg_width // 2 + text_margin, 
-            SCREEN_HEIGHT // 2 + text_bg_height // 2 - text_margin + text_y_offset,
-            WHITE,
-            font_size=24,  # 调整为更小的字体
-            font_name=("SimHei", "Microsoft YaHei"),
-            width=text_width,
-            multiline=True,
-            anchor_x="left", anchor_y="top",
-            align="left"
-        )
-        
-        # 绘制选择按钮（如果显示选择）
+        # 绘制选择提示和选择按钮（如果显示选择）
         if self.show_choices:
-            # 绘制选择提示背景
-            choice_prompt_bg_width = 400
-            choice_prompt_bg_height = 40
-            arcade.draw_rectangle_filled(
-                SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 130,
-                choice_prompt_bg_width, choice_prompt_bg_height,
-                (40, 40, 80, 200)  # 半透明背景
-            )
-            
-            # 绘制选择提示文字
-            arcade.draw_text(
-                "请做出你的选择:",
-                SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 130,
-                GOLD,
-                font_size=24,
-                font_name=("SimHei", "Microsoft YaHei"),
-                anchor_x="center"
-            )
-            
-            # 绘制选择按钮
+            self.prompt_text.draw()
             for button in self.choice_buttons:
                 button.draw()
         
@@ -1400,8 +1278,8 @@ class StoryView(arcade.View):
             self.show_choices = False
             
             # 应用选择效果（在实际游戏中会更复杂）
-            if 'effect' in choice and callable(choice['effect']):
-                choice['effect'](self.game.player)
+            from modules.story import apply_choice
+            apply_choice(self.game.player, choice)
             
             # 增加章节序号
             self.game.chapter += 1
@@ -1421,35 +1299,35 @@ class GeneralsView(arcade.View):
         self.generals_display = []
         self.current_page = 0
         self.generals_per_page = 4
+        
+        # 将领名册：维护排序索引，翻页时只取出当前页
+        self.test_generals = None
+        self.roster = GeneralRoster()
+        self.roster.attach()
+        self.sort_key = "battle_power"  # 排序字段
+        self.kingdom_filter = None  # 只显示该势力的将领
+        self.skill_filter = None  # 只显示拥有该技能的将领
         self.setup()
         
-        # 加载背景
-        try:
-            # 优先加载新背景图
-            self.background_texture = arcade.load_texture("resources/back_ground.png")
-        except:
-            try:
-                # 如果新背景加载失败，尝试加载旧背景
-                self.background_texture = arcade.load_texture("resources/background.jpg")
-            except:
-                self.background_texture = None
+        # 加载背景（资源管理器中已配置备选背景图）
+        self.assets = AssetScope()
+        self.background_texture = self.assets.texture("background")
             
         # 按钮音效
-        self.hover_sound = arcade.load_sound(":resources:sounds/laser1.wav")
-        self.click_sound = arcade.load_sound(":resources:sounds/hit1.wav")
+        self.hover_sound = self.assets.sound("hover")
+        self.click_sound = self.assets.sound("click")
         self.last_hovered_button = None
         
         # 尝试加载刘备图片作为默认将领图片
-        try:
-            self.default_general_image = arcade.load_texture("resources/generals/liubei.png")
-        except:
-            self.default_general_image = None
+        self.default_general_image = self.assets.texture("liubei")
+        
+        self.build_scene()
     
     def setup(self):
         """设置界面元素"""
         # 根据玩家拥有的将领数量计算总页数
-        player_generals = self.get_player_generals()
-        total_pages = max(1, (len(player_generals) + self.generals_per_page - 1) // self.generals_per_page)
+        self.roster.sync(self.get_player_generals())
+        total_pages = self.total_pages()
         
         # 添加返回按钮
         back_button = Button(
@@ -1477,6 +1355,10 @@ class GeneralsView(arcade.View):
     def get_player_generals(self):
         """获取玩家的将领列表"""
         if not self.game.player or not hasattr(self.game.player, 'generals') or not self.game.player.generals:
+            # 测试将领只创建一次，每帧调用时返回同一个列表
+            if self.test_generals is not None:
+                return self.test_generals
+            
             # 如果玩家没有将领，创建一些测试将领数据
             from models.general import General
             
@@ -1543,6 +1425,7 @@ class GeneralsView(arcade.View):
                     self.game.player.generals = test_generals
             
             # 返回测试将领数据
+            self.test_generals = test_generals
             return test_generals
             
         return self.game.player.generals
@@ -1551,230 +1434,172 @@ class GeneralsView(arcade.View):
         """视图显示时"""
         arcade.set_background_color(BACKGROUND_COLOR)
     
-    def on_draw(self):
-        """绘制界面"""
-        arcade.start_render()
-        
-        # 绘制背景
-        if self.background_texture:
-            arcade.draw_texture_rectangle(
-                SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
-                SCREEN_WIDTH, SCREEN_HEIGHT,
-                self.background_texture
-            )
-        
-        # 绘制边框装饰
-        border_width = 5
-        border_color = GOLD
+    def on_hide_view(self):
+        """视图隐藏时释放资源引用"""
+        self.assets.release()
+        self.roster.detach()
+    
+    def total_pages(self):
+        """按当前过滤条件计算的总页数"""
+        return self.roster.page_count(self.generals_per_page, self.sort_key, self.kingdom_filter, self.skill_filter)
+    
+    def change_page(self, step):
+        """翻页"""
+        self.current_page = max(0, min(self.current_page + step, self.total_pages() - 1))
+    
+    def cycle_sort(self):
+        """切换排序字段"""
+        keys = list(SORT_KEYS)
+        self.sort_key = keys[(keys.index(self.sort_key) + 1) % len(keys)]
+        self.current_page = 0
+    
+    def cycle_filter(self, current, options):
+        """在"全部"和各选项之间循环"""
+        choices = [None] + list(options)
+        position = choices.index(current) if current in choices else 0
+        self.current_page = 0
+        return choices[(position + 1) % len(choices)]
+    
+    def view_key(self):
+        """当前页内容的标识，名册、页码、排序或过滤变化时重新生成"""
+        self.roster.refresh()  # 将领变化后名册只标记待调整，先处理才能让version递增
+        return (self.current_page, self.roster.version, self.sort_key, self.kingdom_filter, self.skill_filter)
+    
+    def build_scene(self):
+        """预先生成背景、边框和标题等不随翻页变化的部分"""
         padding = 20
-        arcade.draw_rectangle_outline(
-            SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
-            SCREEN_WIDTH - padding * 2, SCREEN_HEIGHT - padding * 2,
-            border_color, border_width
+        self.background_sprites = texture_sprites(
+            (self.background_texture, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, SCREEN_WIDTH, SCREEN_HEIGHT)
         )
         
-        # 绘制标题背景
-        title_bg_width = 500
-        title_bg_height = 80
-        arcade.draw_rectangle_filled(
-            SCREEN_WIDTH // 2, SCREEN_HEIGHT - 80,
-            title_bg_width, title_bg_height,
-            (20, 20, 50, 200)  # 半透明深蓝色
-        )
+        self.frame_shapes = arcade.ShapeElementList()
+        add_panel(self.frame_shapes, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
+                  SCREEN_WIDTH - padding * 2, SCREEN_HEIGHT - padding * 2, outline=GOLD, border_width=5)
+        add_panel(self.frame_shapes, SCREEN_WIDTH // 2, SCREEN_HEIGHT - 80, 500, 80, fill=(20, 20, 50, 200))
         
-        # 绘制标题
-        arcade.draw_text(
-            "将领查看",
-            SCREEN_WIDTH // 2, SCREEN_HEIGHT - 80,
-            GOLD,
-            font_size=48,
-            font_name=("SimHei", "Microsoft YaHei"),
-            anchor_x="center"
+        self.static_labels = [
+            build_text("将领查看", SCREEN_WIDTH // 2, SCREEN_HEIGHT - 80, GOLD, font_size=48, anchor_x="center"),
+            build_text("点击返回按钮返回主菜单", SCREEN_WIDTH // 2, 20, (200, 200, 200, 150),
+                       font_size=16, anchor_x="center"),
+        ]
+        
+        self.page_key = None  # 当前已生成内容对应的view_key()
+        self.page_shapes = None
+        self.page_sprites = None
+        self.page_labels = []
+    
+    def build_page(self):
+        """生成当前页的将领卡片，只在翻页、排序、过滤或名册变化时调用"""
+        self.current_page = min(self.current_page, self.total_pages() - 1)
+        current_page_generals = self.roster.page(
+            self.current_page, self.generals_per_page, self.sort_key, self.kingdom_filter, self.skill_filter
         )
         
-        # 获取当前页的将领列表
-        player_generals = self.get_player_generals()
-        start_idx = self.current_page * self.generals_per_page
-        current_page_generals = player_generals[start_idx:start_idx + self.generals_per_page]
+        self.page_shapes = arcade.ShapeElementList()
+        self.page_labels = []
+        portraits = []
         
         # 如果没有将领，显示提示信息
         if not current_page_generals:
-            # 绘制提示信息背景
-            info_bg_width = 600
-            info_bg_height = 100
-            arcade.draw_rectangle_filled(
-                SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
-                info_bg_width, info_bg_height,
-                (30, 30, 60, 200)  # 半透明深蓝色
-            )
-            
-            # 绘制提示信息
-            arcade.draw_text(
+            add_panel(self.page_shapes, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, 600, 100, fill=(30, 30, 60, 200))
+            self.page_labels.append(build_text(
                 "你目前没有将领。\n可以通过游戏剧情或招募功能获取将领。",
-                SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
-                WHITE,
-                font_size=24,
-                font_name=("SimHei", "Microsoft YaHei"),
-                width=550,
-                align="center",
-                anchor_x="center", anchor_y="center"
-            )
-        else:
-            # 绘制将领信息
-            for i, general in enumerate(current_page_generals):
-                # 计算每个将领卡片的位置
-                # 将屏幕分为2行2列
-                row = i // 2
-                col = i % 2
-                
-                # 计算卡片位置
-                card_width = 450
-                card_height = 220
-                card_spacing_x = 80
-                card_spacing_y = 50
-                
-                # 计算中心位置
-                center_x = SCREEN_WIDTH // 4 + (SCREEN_WIDTH // 2) * col + (col * card_spacing_x)
-                center_y = SCREEN_HEIGHT - 180 - (card_height + card_spacing_y) * row
-                
-                # 绘制卡片背景
-                arcade.draw_rectangle_filled(
-                    center_x, center_y,
-                    card_width, card_height,
-                    (40, 40, 70, 220)  # 半透明深色
-                )
-                
-                # 绘制卡片边框
-                arcade.draw_rectangle_outline(
-                    center_x, center_y,
-                    card_width, card_height,
-                    GOLD, 2
-                )
-                
-                # 绘制将领头像背景
-                portrait_size = 150
-                portrait_x = center_x - card_width // 2 + portrait_size // 2 + 15
-                portrait_y = center_y
-                
-                arcade.draw_rectangle_filled(
-                    portrait_x, portrait_y,
-                    portrait_size, portrait_size,
-                    (60, 60, 100, 180)  # 半透明背景
-                )
-                
-                # 尝试加载将领特定的图像
-                general_image = None
-                if hasattr(general, 'image_path') and general.image_path:
-                    try:
-                        general_image = arcade.load_texture(general.image_path)
-                    except:
-                        general_image = None
-                
-                # 如果没有特定图像，使用默认的刘备图像
-                if general_image is None:
-                    general_image = self.default_general_image
-                
-                # 绘制将领头像
-                if general_image:
-                    arcade.draw_texture_rectangle(
-                        portrait_x, portrait_y,
-                        portrait_size - 10, portrait_size - 10,
-                        general_image
-                    )
-                
-                # 绘制将领名称和基本信息
-                name_x = center_x + 50
-                name_y = center_y + card_height // 2 - 40
-                
-                # 绘制将领名字
-                arcade.draw_text(
-                    general.name,
-                    name_x, name_y,
-                    GOLD,
-                    font_size=28,
-                    font_name=("SimHei", "Microsoft YaHei"),
-                    anchor_x="left"
-                )
-                
-                # 绘制将领属性
-                stats_x = name_x
-                stats_spacing = 30
-                
-                # 统率
-                arcade.draw_text(
-                    f"统率: {general.leadership}",
-                    stats_x, name_y - stats_spacing,
-                    WHITE,
-                    font_size=20,
-                    font_name=("SimHei", "Microsoft YaHei"),
-                    anchor_x="left"
-                )
-                
-                # 武力
-                arcade.draw_text(
-                    f"武力: {general.strength}",
-                    stats_x, name_y - stats_spacing * 2,
-                    WHITE,
-                    font_size=20,
-                    font_name=("SimHei", "Microsoft YaHei"),
-                    anchor_x="left"
-                )
-                
-                # 智力
-                arcade.draw_text(
-                    f"智力: {general.intelligence}",
-                    stats_x, name_y - stats_spacing * 3,
-                    WHITE,
-                    font_size=20,
-                    font_name=("SimHei", "Microsoft YaHei"),
-                    anchor_x="left"
-                )
-                
-                # 政治
-                arcade.draw_text(
-                    f"政治: {general.politics}",
-                    stats_x, name_y - stats_spacing * 4,
-                    WHITE,
-                    font_size=20,
-                    font_name=("SimHei", "Microsoft YaHei"),
-                    anchor_x="left"
-                )
-                
-                # 显示所属势力
-                arcade.draw_text(
-                    f"势力: {general.kingdom_name}",
-                    portrait_x, portrait_y - portrait_size // 2 - 15,
-                    WHITE,
-                    font_size=16,
-                    font_name=("SimHei", "Microsoft YaHei"),
-                    anchor_x="center"
-                )
+                SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, WHITE,
+                font_size=24, width=550, align="center", anchor_x="center", anchor_y="center"
+            ))
+        
+        # 将屏幕分为2行2列
+        card_width = 450
+        card_height = 220
+        card_spacing_x = 80
+        card_spacing_y = 50
+        portrait_size = 150
+        stats_spacing = 30
+        for i, general in enumerate(current_page_generals):
+            row = i // 2
+            col = i % 2
             
-            # 显示分页信息
-            total_pages = (len(player_generals) + self.generals_per_page - 1) // self.generals_per_page
+            # 计算卡片中心位置
+            center_x = SCREEN_WIDTH // 4 + (SCREEN_WIDTH // 2) * col + (col * card_spacing_x)
+            center_y = SCREEN_HEIGHT - 180 - (card_height + card_spacing_y) * row
             
-            arcade.draw_text(
-                f"第 {self.current_page + 1} 页 / 共 {total_pages} 页",
-                SCREEN_WIDTH // 2, 100,
-                WHITE,
-                font_size=18,
-                font_name=("SimHei", "Microsoft YaHei"),
-                anchor_x="center"
+            # 卡片背景、边框和头像背景
+            add_panel(self.page_shapes, center_x, center_y, card_width, card_height,
+                      fill=(40, 40, 70, 220), outline=GOLD, border_width=2)
+            portrait_x = center_x - card_width // 2 + portrait_size // 2 + 15
+            portrait_y = center_y
+            add_panel(self.page_shapes, portrait_x, portrait_y, portrait_size, portrait_size,
+                      fill=(60, 60, 100, 180))
+            
+            # 尝试加载将领特定的图像，没有时使用默认的刘备图像
+            general_image = None
+            if hasattr(general, 'image_path') and general.image_path:
+                general_image = self.assets.texture(general.image_path)
+            if general_image is None:
+                general_image = self.default_general_image
+            portraits.append((general_image, portrait_x, portrait_y, portrait_size - 10, portrait_size - 10))
+            
+            # 将领名字和属性
+            name_x = center_x + 50
+            name_y = center_y + card_height // 2 - 40
+            self.page_labels.append(build_text(general.name, name_x, name_y, GOLD, font_size=28))
+            stats = (
+                f"统率: {general.leadership}",
+                f"武力: {general.strength}",
+                f"智力: {general.intelligence}",
+                f"政治: {general.politics}",
             )
+            for j, stat in enumerate(stats, 1):
+                self.page_labels.append(build_text(stat, name_x, name_y - stats_spacing * j, WHITE, font_size=20))
+            
+            # 所属势力
+            self.page_labels.append(build_text(
+                f"势力: {general.kingdom_name}",
+                portrait_x, portrait_y - portrait_size // 2 - 15,
+                WHITE, font_size=16, anchor_x="center"
+            ))
+        
+        # 分页信息
+        if current_page_generals:
+            self.page_labels.append(build_text(
+                f"第 {self.current_page + 1} 页 / 共 {self.total_pages()} 页",
+                SCREEN_WIDTH // 2, 100, WHITE, font_size=18, anchor_x="center"
+            ))
+        
+        # 排序和过滤条件
+        kingdom_label = self.kingdom_filter or "全部"
+        skill_label = self.skill_filter.value if self.skill_filter else "全部"
+        self.page_labels.append(build_text(
+            f"排序: {SORT_NAMES[self.sort_key]}  势力: {kingdom_label}  技能: {skill_label}  (S/K/F切换)",
+            SCREEN_WIDTH // 2, 130, (200, 200, 200), font_size=16, anchor_x="center"
+        ))
+        
+        self.page_sprites = texture_sprites(*portraits)
+        self.page_key = self.view_key()
+    
+    def on_draw(self):
+        """绘制界面"""
+        arcade.start_render()
+        
+        self.roster.sync(self.get_player_generals())
+        if self.page_key != self.view_key():
+            self.build_page()
+        
+        if not self.background_texture:
+            default_background().draw(self.window.width, self.window.height)
+        self.background_sprites.draw()
+        self.frame_shapes.draw()
+        self.page_shapes.draw()
+        self.page_sprites.draw()
+        for label in self.page_labels:
+            label.draw()
         
         # 绘制按钮
         for button in self.buttons:
             button.draw()
         
-        # 绘制底部提示
-        arcade.draw_text(
-            "点击返回按钮返回主菜单",
-            SCREEN_WIDTH // 2, 20,
-            (200, 200, 200, 150),  # 半透明灰白色
-            font_size=16,
-            font_name=("SimHei", "Microsoft YaHei"),
-            anchor_x="center"
-        )
+        for label in self.static_labels:
+            label.draw()
     
     def on_mouse_motion(self, x, y, dx, dy):
         """处理鼠标移动"""
@@ -1803,13 +1628,16 @@ class GeneralsView(arcade.View):
                     main_menu_view = MainMenuView(self.game)
                     self.window.show_view(main_menu_view)
                 elif i == 1:  # 上一页按钮
-                    self.current_page = max(0, self.current_page - 1)
+                    self.change_page(-1)
                 elif i == 2:  # 下一页按钮
-                    player_generals = self.get_player_generals()
-                    total_pages = (len(player_generals) + self.generals_per_page - 1) // self.generals_per_page
-                    self.current_page = min(self.current_page + 1, total_pages - 1)
+                    self.change_page(1)
                 return
     
+    def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
+        """滚轮翻页"""
+        if scroll_y:
+            self.change_page(-1 if scroll_y > 0 else 1)
+    
     def on_key_press(self, key, modifiers):
         """处理键盘按键事件"""
         if key == arcade.key.ESCAPE:
@@ -1817,12 +1645,16 @@ class GeneralsView(arcade.View):
             self.window.show_view(main_menu_view)
         elif key == arcade.key.LEFT:
             # 上一页
-            self.current_page = max(0, self.current_page - 1)
+            self.change_page(-1)
         elif key == arcade.key.RIGHT:
             # 下一页
-            player_generals = self.get_player_generals()
-            total_pages = (len(player_generals) + self.generals_per_page - 1) // self.generals_per_page
-            self.current_page = min(self.current_page + 1, total_pages - 1)
+            self.change_page(1)
+        elif key == arcade.key.S:
+            self.cycle_sort()
+        elif key == arcade.key.K:
+            self.kingdom_filter = self.cycle_filter(self.kingdom_filter, self.roster.kingdoms())
+        elif key == arcade.key.F:
+            self.skill_filter = self.cycle_filter(self.skill_filter, self.roster.skills())
     
     def on_text(self, text):
         """处理文本输入事件"""
@@ -1836,6 +1668,10 @@ def main():
     
     # 启动游戏窗口
     window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, resizable=True)
+    startup.mark("window")
+    asset_manager().preload()
+    # 帧耗时分析：按F3显示，设置SANGUO_PROFILE=1时从启动开始记录
+    install_profiler(window)
     welcome_view = WelcomeView()
     window.show_view(welcome_view)
     arcade.run()
@@ -10,8 +10,12 @@ from models.army import Army, TroopType
 from models.kingdom import Kingdom
 from models.player import Player
 from modules.battle import Battle
-from modules.story import Story, Chapter
+from modules.story import Story, Chapter, ChapterLibrary
 from modules.game_data import load_game_data
+from modules.scenario import format_timing
+from modules.save_journal import SaveJournal, recover_world
+
+SAVE_DIRECTORY = "saves/autosave"  # 存档目录
 
 class ThreeKingdomsGame:
     def __init__(self):
@@ -21,33 +25,51 @@ class ThreeKingdomsGame:
         self.story = None
         self.chapter = 0
         self.game_running = True
+        self.journal = None  # 增量存档日志
+        
+    def initialize_game(self, scenario_path=None):
+        """初始化游戏数据
         
-    def initialize_game(self):
-        """初始化游戏数据"""
+        Args:
+            scenario_path: 剧本文件路径，为None时使用内置的三国数据
+        """
         print("正在加载三国演义世界...")
         time.sleep(1)
         
         # 加载游戏数据
-        game_data = load_game_data()
+        game_data = load_game_data(scenario_path)
+        scenario = game_data["scenario"]
         
-        # 初始化三个主要势力
-        self.kingdoms = [
-            Kingdom("魏国", "曹操", "蓝色"),
-            Kingdom("蜀国", "刘备", "绿色"),
-            Kingdom("吴国", "孙权", "红色")
-        ]
+        if scenario:
+            print(format_timing(game_data["timing"]))
+            self.kingdoms = [Kingdom(k["name"], k["leader"], k["color"]) for k in scenario.kingdoms]
+        else:
+            # 初始化三个主要势力
+            self.kingdoms = [
+                Kingdom("魏国", "曹操", "蓝色"),
+                Kingdom("蜀国", "刘备", "绿色"),
+                Kingdom("吴国", "孙权", "红色")
+            ]
         
-        # 加载将领数据
-        self.generals = game_data["generals"]
+        # 只为参战势力创建将领对象，剧本中的其他将领留在数据表中
+        tables = game_data["tables"]
+        self.generals = []
+        for kingdom in self.kingdoms:
+            for general in tables.generals_of_kingdom(kingdom.name):
+                kingdom.add_general(general)
+                self.generals.append(general)
         
-        # 分配将领到相应的势力
-        for general in self.generals:
-            for kingdom in self.kingdoms:
-                if general.kingdom_name == kingdom.name:
-                    kingdom.add_general(general)
+        # 剧本中开局就有归属的城市
+        if scenario:
+            kingdoms_by_name = {kingdom.name: kingdom for kingdom in self.kingdoms}
+            for city_index, owner in scenario.city_owners:
+                kingdoms_by_name[owner].add_city(tables.city(city_index))
         
-        # 初始化故事
-        self.story = Story()
+        # 初始化故事，剧本章节在播放到时才创建
+        if scenario and scenario.chapters:
+            self.story = Story(ChapterLibrary(scenario.chapters, Chapter.from_dict))
+        else:
+            self.story = Story()
         
     def display_welcome(self):
         """显示欢迎信息"""
@@ -216,10 +238,35 @@ class ThreeKingdomsGame:
     def save_game(self):
         """保存游戏"""
         print("正在保存游戏...")
-        time.sleep(1)
+        self.autosave()
         print("游戏已保存！")
         input("按回车键继续...")
     
+    def autosave(self):
+        """自动存档，只写入上次存档以来发生变化的实体"""
+        if self.journal is None:
+            # 首次存档写入完整快照，之后只追加变更日志
+            self.journal = SaveJournal(SAVE_DIRECTORY)
+            self.journal.attach(self.kingdoms + [self.player])
+            return 0
+        return self.journal.autosave()
+    
+    def load_game(self, directory=SAVE_DIRECTORY):
+        """读取存档：加载快照并回放变更日志"""
+        roots = recover_world(directory)
+        self.kingdoms = roots[:-1]
+        self.player = roots[-1]
+        self.generals = [general for kingdom in self.kingdoms for general in kingdom.generals]
+        
+        if self.story is None:
+            self.story = Story()
+        
+        # 继续在同一目录追加日志
+        if self.journal is not None:
+            self.journal.detach()
+        self.journal = SaveJournal(directory)
+        self.journal.attach(roots)
+    
     def run(self):
         """运行游戏"""
         self.display_welcome()